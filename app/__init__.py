@@ -3,36 +3,50 @@ from flask_sqlalchemy import SQLAlchemy
 from flasgger import Swagger
 from .config import Config
 from .config.cors import configure_cors
+from .config.database import configure_replicas
 from .swagger_config import template, swagger_config
+from .utils.db_routing import RoutingSession
 import pymysql
 
 # Replace MySQL driver
 pymysql.install_as_MySQLdb()
 
-db = SQLAlchemy()
+# Reads of GET requests may go to a read replica (see configure_replicas)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     
     # Initialize extensions
+    configure_replicas(app)
     db.init_app(app)
     
     # Import models
     with app.app_context():
-        from .models import User, Address, Order, OrderItem, Product, ProductImage, Seller, WishlistItem
-        db.create_all()
+        from .models import (User, Address, IdempotencyKey, MediaAsset, Order, OrderItem, OrderStatusHistory,
+                             OutboxEvent, Product, ProductImage, ProductListing, ProductRecommendation,
+                             Review, Seller, SellerDailySales, SellerOrder, SellerProductDailySales,
+                             UserOrderStats, WishlistItem)
+        # Only on the primary: replica binds have no models, and an unreachable one must not stop startup
+        db.create_all(bind_key=None)
     
     configure_cors(app)  # Configure CORS
     Swagger(app, template=template, config=swagger_config)
     
     # Register blueprints
-    from .routes import auth, products, sellers, orders, users
+    from .routes import auth, products, sellers, orders, users, search, media
     app.register_blueprint(auth.bp)
     app.register_blueprint(products.bp)
     app.register_blueprint(sellers.bp)
     app.register_blueprint(orders.bp)
     app.register_blueprint(users.bp)
+    app.register_blueprint(search.bp)
+    app.register_blueprint(media.bp)
+    
+    # Maintenance commands; also loads the services that maintain derived tables
+    from .commands import register_commands
+    register_commands(app)
     
     # API Documentation route
     @app.route('/')
@@ -0,0 +1,175 @@
+from datetime import date
+import time
+from urllib.parse import quote
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from .models import Order, Product, Seller
+from .services.analytics_service import analytics_service
+from .services.listing_service import listing_service
+from .services.outbox_service import outbox_service
+from .services.recommendation_service import recommendation_service
+from .services.seller_counter_service import seller_counter_service
+from .services.seller_order_service import seller_order_service
+from .services.user_order_stats_service import user_order_stats_service
+from .utils.idempotency import store as idempotency_store
+from .utils.index_advisor import advise
+from .utils.security import generate_token
+from . import db
+
+# Hot read paths checked by advise-indexes; {placeholders} are filled from sample rows
+ADVISOR_PATHS = (
+    '/api/products',
+    '/api/products?sort=rating',
+    '/api/products?category={category}&minPrice=10000&maxPrice=100000&sort=price_asc',
+    '/api/products?category={category}&sort=rating',
+    '/api/products?featured=true',
+    '/api/products/facets?category={category}',
+    '/api/products/{product_id}',
+    '/api/sellers?province={province}&min_rating=4',
+    '/api/sellers?category={category}&min_rating=4',
+    '/api/sellers?featured=true&province={province}',
+    '/api/sellers/{seller_id}',
+    '/api/sellers/{seller_id}/products?sort=rating',
+    '/api/sellers/{seller_id}/products?minPrice=10000&sort=price_asc',
+    '/api/orders',
+)
+
+def register_commands(app):
+    """Register the maintenance commands (run with ``flask <command>``)"""
+    app.cli.add_command(rebuild_product_listing)
+    app.cli.add_command(advise_indexes)
+    app.cli.add_command(build_recommendations)
+    app.cli.add_command(reconcile_seller_counters)
+    app.cli.add_command(backfill_seller_analytics)
+    app.cli.add_command(rebuild_seller_orders)
+    app.cli.add_command(rebuild_user_order_stats)
+    app.cli.add_command(purge_idempotency_keys)
+    app.cli.add_command(outbox_worker)
+
+@click.command('rebuild-product-listing')
+@click.option('--batch-size', default=500, show_default=True, help='Products recomputed per transaction')
+@with_appcontext
+def rebuild_product_listing(batch_size):
+    """Recompute the product_listing read model from the source tables"""
+    count = listing_service.rebuild(batch_size)
+    click.echo(f'Rebuilt {count} product listing rows')
+
+@click.command('reconcile-seller-counters')
+@click.option('--batch-size', default=500, show_default=True, help='Sellers recounted per transaction')
+@with_appcontext
+def reconcile_seller_counters(batch_size):
+    """Recount the product counters of every seller and fix the ones that drifted"""
+    result = seller_counter_service.reconcile(batch_size)
+    click.echo(f"Checked {result['sellers']} sellers, fixed {result['fixed']}")
+
+@click.command('rebuild-seller-orders')
+@click.option('--batch-size', default=1000, show_default=True, help='Orders recomputed per transaction')
+@with_appcontext
+def rebuild_seller_orders(batch_size):
+    """Recompute the seller_orders inbox rows (and missing order item sellers) from the order items"""
+    count = seller_order_service.rebuild(batch_size)
+    click.echo(f'Rebuilt the seller rows of {count} orders')
+
+@click.command('rebuild-user-order-stats')
+@click.option('--batch-size', default=1000, show_default=True, help='Users recomputed per transaction')
+@with_appcontext
+def rebuild_user_order_stats(batch_size):
+    """Recompute the per-user order counts and amounts from the orders"""
+    count = user_order_stats_service.rebuild(batch_size)
+    click.echo(f'Rebuilt the order stats of {count} users')
+
+@click.command('purge-idempotency-keys')
+@click.option('--batch-size', default=1000, show_default=True, help='Keys deleted per transaction')
+@with_appcontext
+def purge_idempotency_keys(batch_size):
+    """Delete the Idempotency-Key records that have expired"""
+    count = idempotency_store.purge(batch_size)
+    click.echo(f'Deleted {count} expired idempotency keys')
+
+@click.command('outbox-worker')
+@click.option('--workers', type=int, help='Worker threads  [default: OUTBOX_WORKERS]')
+@click.option('--once', is_flag=True, help='Handle the events that are due and exit')
+@click.option('--retry-failed', is_flag=True, help='Queue the failed events again first')
+@with_appcontext
+def outbox_worker(workers, once, retry_failed):
+    """Handle outbox events in this process (for OUTBOX_MODE=external)"""
+    if retry_failed:
+        click.echo(f'Queued {outbox_service.retry_failed()} failed events again')
+    if once:
+        click.echo(f'Handled {outbox_service.drain()} events')
+        return
+    workers = workers or current_app.config['OUTBOX_WORKERS']
+    outbox_service.run_workers(current_app._get_current_object(), workers)
+    click.echo(f'Handling outbox events with {workers} threads, press Ctrl+C to stop')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        outbox_service.shutdown()
+
+@click.command('backfill-seller-analytics')
+@click.option('--since', help='Only rebuild the days from this date (YYYY-MM-DD) on')
+@click.option('--chunk-size', default=1000, show_default=True, help='Orders read and committed per chunk')
+@with_appcontext
+def backfill_seller_analytics(since, chunk_size):
+    """Rebuild the seller sales rollups from the order history"""
+    try:
+        since = date.fromisoformat(since) if since else None
+    except ValueError:
+        raise click.BadParameter('expected YYYY-MM-DD', param_hint='--since')
+    result = analytics_service.backfill(since=since, chunk_size=chunk_size)
+    click.echo(f"Rolled up {result['orders']} orders")
+
+@click.command('build-recommendations')
+@click.option('--full', is_flag=True, help='Recount every order instead of only the new ones')
+@click.option('--chunk-size', default=5000, show_default=True, help='Orders read per query')
+@with_appcontext
+def build_recommendations(full, chunk_size):
+    """Update the "frequently bought together" recommendations from new orders"""
+    result = recommendation_service.build(full=full, chunk_size=chunk_size)
+    click.echo(f"Counted {result['orders']} orders, updated {result['products']} products")
+
+@click.command('advise-indexes')
+@click.argument('paths', nargs=-1)
+@click.option('--all', 'show_all', is_flag=True, help='Also list queries with a clean plan')
+@click.option('--fail', is_flag=True, help='Exit with status 1 when a plan has findings')
+@with_appcontext
+def advise_indexes(paths, show_all, fail):
+    """
+    Request the hot read paths (or PATHS), capture the SQL they run and
+    report full table scans, filesorts and temporary tables from EXPLAIN.
+    """
+    sample = _advisor_sample()
+    if not paths:
+        paths = [path.format(**sample) for path in ADVISOR_PATHS]
+    headers = {}
+    if sample.get('user_id'):
+        headers['Authorization'] = f"Bearer {generate_token(sample['user_id'])}"
+
+    queries = advise(current_app, paths, headers)
+    flagged = [query for query in queries if query.findings]
+    for query in queries:
+        if not query.findings and not show_all:
+            continue
+        click.echo('-' * 72)
+        for finding in query.findings:
+            click.echo(f"[{finding.problem}] {finding.table or ''}  {finding.detail}")
+        click.echo(f"ran {query.count}x from: {', '.join(query.sources)}")
+        click.echo(' '.join(query.statement.split()))
+    click.echo(f'{len(queries)} distinct queries, {len(flagged)} with full scans, filesorts or temporary tables')
+    if fail and flagged:
+        raise SystemExit(1)
+
+def _advisor_sample():
+    """Ids and values of existing rows to put in the advisor paths"""
+    product = db.session.query(Product.id, Product.category).first()
+    seller = db.session.query(Seller.id, Seller.province).first()
+    user_id = db.session.query(Order.user_id).limit(1).scalar()
+    return {
+        'product_id': product.id if product else 'none',
+        'category': quote(product.category or '') if product else '',
+        'seller_id': seller.id if seller else 'none',
+        'province': quote(seller.province or '') if seller else '',
+        'user_id': user_id,
+    }
@@ -1,4 +1,5 @@
 from .config import Config
 from .cors import configure_cors
+from .database import configure_replicas
 
-__all__ = ['Config', 'configure_cors']
+__all__ = ['Config', 'configure_cors', 'configure_replicas']
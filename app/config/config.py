@@ -14,6 +14,11 @@ class Config:
         f"{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Read replicas (comma-separated URIs); reads of GET requests go to them
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('DB_REPLICA_URIS', '').split(',') if uri]
+    REPLICA_HEALTH_CHECK_INTERVAL = 5  # seconds between replica pings
+    # How long a client reads from the primary after a write, to cover replication lag
+    REPLICA_PIN_SECONDS = 5
     
     # JWT settings
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
@@ -22,6 +27,57 @@ class Config:
     # Upload settings
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    # Resized copies of uploaded images: variant -> longest side in pixels
+    IMAGE_VARIANTS = {'thumbnail': 200, 'card': 600, 'full': 1600}
+    IMAGE_QUALITY = 82
+    # Processes resizing uploads in the background; 0 resizes during the upload request
+    IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 2))
+    IMAGE_CACHE_MAX_AGE = 365 * 24 * 60 * 60  # variants never change once written
+    
+    # Search settings
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'auto')  # auto, mysql or memory
+    SEARCH_MAX_RESULTS = 1000  # cap of a relevance ranking; other sorts see every match
+    
+    # Catalog cache settings (seconds)
+    FACETS_CACHE_TTL = 30
+    # Upper bound on the age of materialized results (featured lists) so other
+    # workers pick up changes they were not notified about
+    MATERIALIZED_RESULT_MAX_AGE = 300
+    # Autocomplete index: how often it re-reads catalog rows other workers
+    # changed, and when it is rebuilt (which also drops their deletions)
+    SUGGEST_SYNC_INTERVAL = 30
+    SUGGEST_MAX_AGE = 3600
+    
+    # "Frequently bought together" recommendations (flask build-recommendations)
+    RECOMMENDATIONS_TOP_K = 10
+    # Co-occurrence counts kept between incremental runs
+    RECOMMENDATIONS_STATE_PATH = os.getenv(
+        'RECOMMENDATIONS_STATE_PATH',
+        os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'cooccurrence.npz')
+    )
+    
+    # Idempotency-Key handling (seconds): how long keys and their responses are kept,
+    # how long a repeat waits for the first request, and when a claim counts as abandoned
+    IDEMPOTENCY_TTL = 24 * 60 * 60
+    IDEMPOTENCY_WAIT_TIMEOUT = 10
+    IDEMPOTENCY_LOCK_TIMEOUT = 60
+    
+    # Outbox events (side effects of writes, see OutboxService): handled by worker
+    # threads in each app process (thread), by `flask outbox-worker` (external), or
+    # at the end of the request that wrote them (inline, for tests). Nothing is
+    # written and no worker starts until a handler is registered for a topic
+    OUTBOX_MODE = os.getenv('OUTBOX_MODE', 'thread')
+    OUTBOX_WORKERS = int(os.getenv('OUTBOX_WORKERS', 2))
+    OUTBOX_BATCH_SIZE = 100
+    OUTBOX_POLL_INTERVAL = 1.0  # seconds between polls of an idle worker
+    OUTBOX_LEASE_SECONDS = 60  # a claimed event is retried if not handled by then
+    OUTBOX_MAX_ATTEMPTS = 8
+    OUTBOX_RETRY_BASE = 2  # seconds before the first retry, doubled for each further one
+    OUTBOX_RETRY_MAX = 600
+    
+    # Bulk product import
+    BULK_IMPORT_MAX_ROWS = 10000
+    BULK_IMPORT_BATCH_SIZE = 500
     
     # API settings
     API_TITLE = 'Local Food Market API'
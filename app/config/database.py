@@ -0,0 +1,45 @@
+import time
+
+from flask import g, request
+
+from ..utils.db_routing import ReplicaPool, replica_binds
+
+# Set after a write; while it is fresh the client's reads go to the primary
+PRIMARY_PIN_COOKIE = 'db_primary_until'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+def configure_replicas(app):
+    """
+    Configure read replicas from ``SQLALCHEMY_REPLICA_URIS``. Must run
+    before ``db.init_app``. GET/HEAD requests then read from a healthy
+    replica, unless the client wrote within the last ``REPLICA_PIN_SECONDS``
+    (tracked with a cookie) so it reads its own writes.
+    """
+    uris = app.config.get('SQLALCHEMY_REPLICA_URIS') or []
+    if not uris:
+        return
+
+    binds = replica_binds(uris)
+    app.config['SQLALCHEMY_BINDS'] = {**(app.config.get('SQLALCHEMY_BINDS') or {}), **binds}
+    app.extensions['db_replicas'] = ReplicaPool(
+        list(binds), app.config['REPLICA_HEALTH_CHECK_INTERVAL']
+    )
+
+    @app.before_request
+    def _route_reads():
+        g.db_read_only = request.method in SAFE_METHODS and not _pinned_to_primary()
+
+    @app.after_request
+    def _pin_after_write(response):
+        if g.get('db_wrote'):
+            pin_seconds = app.config['REPLICA_PIN_SECONDS']
+            response.set_cookie(PRIMARY_PIN_COOKIE, str(time.time() + pin_seconds),
+                                max_age=pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+def _pinned_to_primary():
+    try:
+        return float(request.cookies.get(PRIMARY_PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
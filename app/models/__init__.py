@@ -1,6 +1,13 @@
 from .user import User
 from .address import Address
-from .order import Order, OrderItem
+from .analytics import SellerDailySales, SellerProductDailySales
+from .idempotency import IdempotencyKey
+from .order import Order, OrderItem, OrderStatusHistory, SellerOrder, UserOrderStats
+from .media import MediaAsset
+from .outbox import OutboxEvent
 from .product import Product, ProductImage
+from .product_listing import ProductListing
+from .recommendation import ProductRecommendation
+from .review import Review
 from .seller import Seller
 from .wishlist import WishlistItem
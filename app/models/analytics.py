@@ -0,0 +1,25 @@
+from .. import db
+
+class SellerDailySales(db.Model):
+    """
+    A seller's sales on one day (UTC, by order date), excluding cancelled
+    orders. Maintained incrementally by AnalyticsService.
+    """
+    __tablename__ = 'seller_daily_sales'
+
+    seller_id = db.Column(db.String(36), db.ForeignKey('sellers.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class SellerProductDailySales(db.Model):
+    """The sales of one of a seller's products on one day, like SellerDailySales"""
+    __tablename__ = 'seller_product_daily_sales'
+
+    seller_id = db.Column(db.String(36), db.ForeignKey('sellers.id', ondelete='CASCADE'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.String(36), primary_key=True)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,23 @@
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+from .. import db
+
+class IdempotencyKey(db.Model):
+    """
+    A request made with an ``Idempotency-Key`` header and, once it has
+    finished, its response (see utils/idempotency.py). ``status_code`` is
+    NULL while the first request with the key is still running.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    id = db.Column(db.String(64), primary_key=True)  # SHA-256 of user, endpoint and key
+    fingerprint = db.Column(db.String(64), nullable=False)  # SHA-256 of method, path and body
+    status_code = db.Column(db.SmallInteger)
+    content_type = db.Column(db.String(100))
+    body = db.Column(db.LargeBinary().with_variant(mysql.MEDIUMBLOB(), 'mysql'))
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('idx_idempotency_keys_expires', 'expires_at'),
+    )
@@ -0,0 +1,21 @@
+from datetime import datetime
+from .. import db
+
+class MediaAsset(db.Model):
+    """
+    An uploaded image, stored once per distinct content under its SHA-256
+    digest (see MediaService). ``variants`` maps each resized variant to
+    its ``{width, height, size}`` once the background resize is done.
+    """
+    __tablename__ = 'media_assets'
+
+    id = db.Column(db.String(64), primary_key=True)  # SHA-256 of the original bytes
+    uploaded_by = db.Column(db.String(36), db.ForeignKey('users.id'))
+    content_type = db.Column(db.String(50), nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    status = db.Column(db.Enum('pending', 'ready', 'failed'), default='pending', nullable=False)
+    variants = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
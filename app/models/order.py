@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.dialects import mysql
 from .. import db
 
 class Order(db.Model):
@@ -13,6 +14,13 @@ class Order(db.Model):
     payment_method = db.Column(db.String(50))
 
     items = db.relationship('OrderItem', backref='order', lazy=True)
+
+    __table_args__ = (
+        # A user's order history, newest first
+        db.Index('idx_orders_user_created', 'user_id', 'created_at'),
+        # A user's orders in one status, newest first
+        db.Index('idx_orders_user_status_created', 'user_id', 'status', 'created_at'),
+    )
     
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
@@ -20,5 +28,72 @@ class OrderItem(db.Model):
     id = db.Column(db.String(36), primary_key=True)
     order_id = db.Column(db.String(36), db.ForeignKey('orders.id'))
     product_id = db.Column(db.String(36), db.ForeignKey('products.id'))
+    # Seller of the product when ordered (see SellerOrderService)
+    seller_id = db.Column(db.String(36), db.ForeignKey('sellers.id'))
     quantity = db.Column(db.Integer, nullable=False)
-    price_at_time = db.Column(db.Numeric(12,2), nullable=False)
\ No newline at end of file
+    price_at_time = db.Column(db.Numeric(12,2), nullable=False)
+
+    __table_args__ = (
+        # Items of a batch of orders
+        db.Index('idx_order_items_order', 'order_id'),
+        # A seller's items of a batch of orders
+        db.Index('idx_order_items_seller_order', 'seller_id', 'order_id'),
+    )
+
+class SellerOrder(db.Model):
+    """
+    The orders containing a seller's products, one row per seller and
+    order, with the order's status and date copied so a seller's inbox is
+    a range scan of one index (maintained by SellerOrderService).
+    """
+    __tablename__ = 'seller_orders'
+
+    seller_id = db.Column(db.String(36), db.ForeignKey('sellers.id', ondelete='CASCADE'), primary_key=True)
+    order_id = db.Column(db.String(36), db.ForeignKey('orders.id', ondelete='CASCADE'), primary_key=True)
+    status = db.Column(db.Enum('pending', 'processing', 'shipped', 'delivered', 'cancelled'))
+    # pending, processing or shipped: still needs the seller's attention
+    is_open = db.Column(db.Boolean, nullable=False, default=True)
+    created_at = db.Column(db.DateTime, nullable=False)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+    subtotal = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('idx_seller_orders_created', 'seller_id', 'created_at', 'order_id'),
+        db.Index('idx_seller_orders_status', 'seller_id', 'status', 'created_at', 'order_id'),
+        db.Index('idx_seller_orders_open', 'seller_id', 'is_open', 'created_at', 'order_id'),
+    )
+
+class OrderStatusHistory(db.Model):
+    """
+    Append-only log of an order's statuses: a row is added when the order
+    is placed and on every status change, and never updated (see
+    OrderService.update_order_status). ``orders.status`` holds the latest.
+    """
+    __tablename__ = 'order_status_history'
+
+    id = db.Column(db.String(36), primary_key=True)
+    order_id = db.Column(db.String(36), db.ForeignKey('orders.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.Enum('pending', 'processing', 'shipped', 'delivered', 'cancelled'), nullable=False)
+    note = db.Column(db.Text)
+    # Microseconds keep the changes of one second in order
+    created_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+                           nullable=False, default=datetime.utcnow)
+    updated_by = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+
+    __table_args__ = (
+        # An order's timeline, oldest first
+        db.Index('idx_order_status_history_order', 'order_id', 'created_at', 'id'),
+    )
+
+class UserOrderStats(db.Model):
+    """
+    Per-user, per-status order count and amount, so the summary of a
+    user's order history is a read of at most five rows (maintained by
+    UserOrderStatsService). Orders without a status count as pending.
+    """
+    __tablename__ = 'user_order_stats'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    status = db.Column(db.Enum('pending', 'processing', 'shipped', 'delivered', 'cancelled'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
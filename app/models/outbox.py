@@ -0,0 +1,28 @@
+from datetime import datetime
+from .. import db
+
+class OutboxEvent(db.Model):
+    """
+    An event written in the same transaction as the change it describes,
+    waiting to be handled by the outbox workers (see OutboxService).
+    Handled events are deleted; events that keep failing stay as
+    ``failed`` with their last error.
+    """
+    __tablename__ = 'outbox_events'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    topic = db.Column(db.String(100), nullable=False)
+    aggregate_id = db.Column(db.String(36))
+    payload = db.Column(db.JSON, nullable=False)
+    status = db.Column(db.Enum('pending', 'failed'), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    # Not handled before this time: the retry backoff, or the lease of the worker handling it
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(36))
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('idx_outbox_events_due', 'status', 'available_at', 'id'),
+        db.Index('idx_outbox_events_claimed', 'claimed_by'),
+    )
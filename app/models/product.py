@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.dialects import mysql
 from .. import db
 
 class Product(db.Model):
@@ -14,9 +15,23 @@ class Product(db.Model):
     type = db.Column(db.Enum('standard', 'premium'), default='standard')
     rating = db.Column(db.Numeric(3, 2), default=0)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Microsecond precision so HTTP validators change on every update
+    updated_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
 
     images = db.relationship('ProductImage', backref='product', lazy=True)
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
+
+    __table_args__ = (
+        db.Index('idx_products_updated_at', 'updated_at'),
+        # Category pages filtered by price; seller pages sorted by rating
+        db.Index('idx_products_category_price', 'category', 'price'),
+        db.Index('idx_products_seller_rating', 'seller_id', 'rating'),
+        db.Index('idx_products_rating', 'rating', 'id'),
+        # Backs product search on MySQL (see SearchService)
+        db.Index('ft_products_search', 'name', 'category', 'description',
+                 mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
     
 class ProductImage(db.Model):
     __tablename__ = 'product_images'
@@ -24,4 +39,9 @@ class ProductImage(db.Model):
     id = db.Column(db.String(36), primary_key=True)
     product_id = db.Column(db.String(36), db.ForeignKey('products.id'))
     image_url = db.Column(db.String(255), nullable=False)
-    is_primary = db.Column(db.Boolean, default=False)
\ No newline at end of file
+    is_primary = db.Column(db.Boolean, default=False)
+
+    __table_args__ = (
+        # Images of a batch of products
+        db.Index('idx_product_images_product', 'product_id'),
+    )
\ No newline at end of file
@@ -0,0 +1,49 @@
+from datetime import datetime
+from sqlalchemy.dialects import mysql
+from .. import db
+
+class ProductListing(db.Model):
+    """
+    Denormalized read model behind the product listings: one row per
+    product with its seller, images and counters, so a listing page is a
+    single indexed scan. Maintained by ListingService on every write to
+    the rows it copies; rebuild with ``flask rebuild-product-listing``.
+    """
+    __tablename__ = 'product_listing'
+
+    # Same id and column names as Product so listing queries work on either
+    id = db.Column(db.String(36), db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    seller_id = db.Column(db.String(36))
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.Text)
+    price = db.Column(db.Numeric(12, 2), nullable=False)
+    stock = db.Column(db.Integer, default=0)
+    category = db.Column(db.String(50))
+    type = db.Column(db.Enum('standard', 'premium'), default='standard')
+    rating = db.Column(db.Numeric(3, 2), default=0)
+    created_at = db.Column(db.DateTime)
+
+    seller_store_name = db.Column(db.String(100))
+    seller_province = db.Column(db.String(50))
+    primary_image_url = db.Column(db.String(255))
+    image_urls = db.Column(db.JSON)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    sales_count = db.Column(db.Integer, nullable=False, default=0)
+    # When the row was last refreshed; versions the listings for HTTP caching
+    updated_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # One index per listing sort (see ProductService.SORTS)
+        db.Index('idx_product_listing_newest', 'created_at', 'id'),
+        db.Index('idx_product_listing_rating', 'rating', 'id'),
+        db.Index('idx_product_listing_price', 'price', 'id'),
+        db.Index('idx_product_listing_seller', 'seller_id', 'created_at', 'id'),
+        db.Index('idx_product_listing_category', 'category', 'created_at', 'id'),
+        # Price ranges within a category or a seller, and seller pages by rating
+        db.Index('idx_product_listing_category_price', 'category', 'price', 'id'),
+        db.Index('idx_product_listing_category_rating', 'category', 'rating', 'id'),
+        db.Index('idx_product_listing_seller_price', 'seller_id', 'price', 'id'),
+        db.Index('idx_product_listing_seller_rating', 'seller_id', 'rating', 'id'),
+        db.Index('idx_product_listing_updated_at', 'updated_at'),
+    )
@@ -0,0 +1,14 @@
+from datetime import datetime
+from .. import db
+
+class ProductRecommendation(db.Model):
+    """
+    Precomputed "frequently bought together" neighbours of a product,
+    best first, as ``[[product_id, score], ...]`` (see RecommendationService).
+    One row per product so a lookup is a primary key read.
+    """
+    __tablename__ = 'product_recommendations'
+
+    product_id = db.Column(db.String(36), db.ForeignKey('products.id', ondelete='CASCADE'), primary_key=True)
+    neighbours = db.Column(db.JSON, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
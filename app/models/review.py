@@ -0,0 +1,17 @@
+from datetime import datetime
+from .. import db
+
+class Review(db.Model):
+    __tablename__ = 'reviews'
+
+    id = db.Column(db.String(36), primary_key=True)
+    product_id = db.Column(db.String(36), db.ForeignKey('products.id'), nullable=False)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
+    rating = db.Column(db.Integer, nullable=False)
+    comment = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.CheckConstraint('rating BETWEEN 1 AND 5', name='ck_reviews_rating'),
+        db.Index('idx_reviews_product', 'product_id'),
+    )
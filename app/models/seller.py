@@ -1,4 +1,5 @@
 from datetime import datetime
+from sqlalchemy.dialects import mysql
 from .. import db
 
 class Seller(db.Model):
@@ -14,5 +15,21 @@ class Seller(db.Model):
     rating = db.Column(db.Numeric(3, 2), default=0)
     category = db.Column(db.String(50))
     joined_date = db.Column(db.DateTime, default=datetime.utcnow)
+    # Maintained by SellerCounterService so listings never count products
+    total_products = db.Column(db.Integer, nullable=False, default=0)
+    in_stock_products = db.Column(db.Integer, nullable=False, default=0)
+    # Microsecond precision so HTTP validators change on every update
+    updated_at = db.Column(db.DateTime().with_variant(mysql.DATETIME(fsp=6), 'mysql'),
+                           default=datetime.utcnow, onupdate=datetime.utcnow)
 
-    products = db.relationship('Product', backref='seller', lazy=True)
\ No newline at end of file
+    products = db.relationship('Product', backref='seller', lazy=True)
+
+    __table_args__ = (
+        db.Index('idx_sellers_updated_at', 'updated_at'),
+        # Seller filters by province or category, ranked by rating
+        db.Index('idx_sellers_province_rating', 'province', 'rating', 'id'),
+        db.Index('idx_sellers_category_rating', 'category', 'rating', 'id'),
+        # Backs seller search on MySQL (see SearchService)
+        db.Index('ft_sellers_search', 'store_name', 'category', 'location', 'description',
+                 mysql_prefix='FULLTEXT').ddl_if(dialect='mysql'),
+    )
\ No newline at end of file
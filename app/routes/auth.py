@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import jwt_required, get_jwt_identity, unset_jwt_cookies
 from ..utils.security import token_required
+from ..utils.idempotency import idempotent
 from ..services.user_service import generate_user_id
 from ..models.user import User
 from ..utils.auth import generate_token
@@ -11,6 +12,7 @@ import uuid
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
 @bp.route('/register', methods=['POST'])
+@idempotent('auth.register', anonymous_scope=('email',))
 def register():
     """
     Register a new user
@@ -18,6 +20,11 @@ def register():
     tags:
       - Authentication
     parameters:
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Unique value per operation; retries with the same key get the first response replayed
       - in: body
         name: body
         schema:
@@ -44,6 +51,10 @@ def register():
     responses:
       201:
         description: User registered successfully
+      409:
+        description: A request with the same Idempotency-Key is still in progress
+      422:
+        description: The Idempotency-Key was already used for a different request
       400:
         description: Invalid input or email already exists
     """
@@ -0,0 +1,52 @@
+from flask import Blueprint, current_app, jsonify, send_file
+from ..services.media_service import media_service
+
+bp = Blueprint('media', __name__, url_prefix='/api/media')
+
+@bp.route('/images/<digest>/<variant>', methods=['GET'])
+def get_image(digest, variant):
+    """
+    Get a resized variant of an uploaded image
+    ---
+    tags:
+      - Media
+    produces:
+      - image/webp
+    parameters:
+      - name: digest
+        in: path
+        type: string
+        required: true
+        description: SHA-256 of the uploaded image, as returned in its URL
+      - name: variant
+        in: path
+        type: string
+        required: true
+        enum: [thumbnail, card, full]
+    responses:
+      200:
+        description: >
+          The image. Cached for a year once the variant is rendered; the
+          original is served (uncached) until then. Supports Range requests.
+      206:
+        description: The requested byte range
+      304:
+        description: Not modified since the ETag sent in If-None-Match
+      404:
+        description: Image or variant not found
+    """
+    try:
+        found = media_service.find_image(digest, variant)
+        if found is None:
+            return jsonify({'error': 'Image not found'}), 404
+        path, mimetype, final = found
+        response = send_file(path, mimetype=mimetype, conditional=True,
+                             etag=f'{digest}-{variant}' if final else True)
+        if final:
+            max_age = current_app.config['IMAGE_CACHE_MAX_AGE']
+            response.headers['Cache-Control'] = f'public, max-age={max_age}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,7 +1,10 @@
 
 from flask import Blueprint, request, jsonify
 from ..services.order_service import OrderService
+from ..utils.idempotency import idempotent
+from ..utils.pagination import parse_limit
 from ..utils.security import token_required
+from ..utils.streaming import ndjson_response, wants_stream
 
 bp = Blueprint('orders', __name__, url_prefix='/api/orders')
 order_service = OrderService()
@@ -10,21 +13,40 @@ order_service = OrderService()
 @token_required
 def get_orders(current_user):
     """
-    Get user's orders
+    Get user's orders, newest first
     ---
     tags:
       - Orders
     security:
       - Bearer: []
+    parameters:
+      - name: status
+        in: query
+        type: string
+        required: false
+        description: Only orders in this status (or comma-separated statuses)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: nextCursor of the previous page
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 20
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Stream all the orders as NDJSON (also selected by Accept application/x-ndjson)
     responses:
       200:
-        description: List of user's orders
+        description: A page of the user's orders and a summary of all of them
         schema:
-          type: array
-          items:
-            $ref: '#/definitions/Order'
+          $ref: '#/definitions/OrderHistoryPage'
       400:
-        description: Error retrieving orders
+        description: Invalid status, cursor or limit
         schema:
           type: object
           properties:
@@ -32,13 +54,25 @@ def get_orders(current_user):
               type: string
     """
     try:
-        orders = order_service.get_user_orders(current_user.id)
-        return jsonify(orders), 200
+        if wants_stream():
+            return ndjson_response(order_service.iter_user_orders(current_user.id))
+        orders, next_cursor = order_service.get_user_orders(
+            current_user.id,
+            status=request.args.get('status'),
+            cursor=request.args.get('cursor'),
+            limit=parse_limit(request.args.get('limit'))
+        )
+        return jsonify({
+            'items': orders,
+            'nextCursor': next_cursor,
+            'summary': order_service.get_order_summary(current_user.id)
+        }), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
 @bp.route('', methods=['POST'])
 @token_required
+@idempotent('orders.create')
 def create_order(current_user):
     """
     Create a new order
@@ -48,6 +82,11 @@ def create_order(current_user):
     security:
       - Bearer: []
     parameters:
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Unique value per operation; retries with the same key get the first response replayed
       - in: body
         name: body
         required: true
@@ -90,6 +129,10 @@ def create_order(current_user):
           properties:
             error:
               type: string
+      409:
+        description: A request with the same Idempotency-Key is still in progress
+      422:
+        description: The Idempotency-Key was already used for a different request
       400:
         description: Invalid input or insufficient stock
         schema:
@@ -148,15 +191,105 @@ def get_order(current_user, order_id):
         if not order:
             return jsonify({'error': 'Order not found'}), 404
             
-        # Verify order belongs to user or seller
+        # Verify order belongs to user or contains the seller's products
         if (current_user.role == 'consumer' and order['user_id'] != current_user.id) or \
-           (current_user.role == 'seller' and order['seller_id'] != current_user.id):
+           (current_user.role == 'seller' and not order_service.is_seller_order(current_user.id, order_id)):
             return jsonify({'error': 'Unauthorized access'}), 403
             
         return jsonify(order), 200
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/statuses', methods=['GET'])
+@token_required
+def get_order_statuses(current_user):
+    """
+    Get the current status of several orders
+    ---
+    tags:
+      - Orders
+    security:
+      - Bearer: []
+    parameters:
+      - name: ids
+        in: query
+        type: string
+        required: true
+        description: Comma-separated order ids (at most 100); orders the user cannot see are left out
+    responses:
+      200:
+        description: Current status and time of the latest change, by order id
+        schema:
+          type: object
+          properties:
+            statuses:
+              type: object
+              additionalProperties:
+                $ref: '#/definitions/OrderStatus'
+      400:
+        description: Too many ids
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+    """
+    try:
+        ids = [order_id.strip() for order_id in request.args.get('ids', '').split(',')]
+        statuses = order_service.get_order_statuses(current_user.id, current_user.role, ids)
+        return jsonify({'statuses': statuses}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/<order_id>/history', methods=['GET'])
+@token_required
+def get_order_history(current_user, order_id):
+    """
+    Get the status timeline of an order
+    ---
+    tags:
+      - Orders
+    security:
+      - Bearer: []
+    parameters:
+      - name: order_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: The order's current status and its status changes, oldest first
+        schema:
+          type: object
+          properties:
+            order_id:
+              type: string
+            status:
+              type: string
+            updated_at:
+              type: string
+              format: date-time
+            history:
+              type: array
+              items:
+                $ref: '#/definitions/OrderStatusChange'
+      404:
+        description: Order not found (or not the user's)
+        schema:
+          type: object
+          properties:
+            error:
+              type: string
+    """
+    try:
+        current = order_service.get_order_statuses(current_user.id, current_user.role, [order_id]).get(order_id)
+        if not current:
+            return jsonify({'error': 'Order not found'}), 404
+        return jsonify(dict(current, order_id=order_id,
+                            history=order_service.get_status_history(order_id))), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @bp.route('/<order_id>/status', methods=['PUT'])
 @token_required
 def update_order_status(current_user, order_id):
@@ -249,6 +382,8 @@ definitions:
         items:
           type: object
           properties:
+            id:
+              type: string
             product_id:
               type: string
             quantity:
@@ -258,15 +393,51 @@ definitions:
       status_history:
         type: array
         items:
-          type: object
-          properties:
-            status:
-              type: string
-            timestamp:
-              type: string
-              format: date-time
-            note:
-              type: string
-            updated_by:
-              type: string
+          $ref: '#/definitions/OrderStatusChange'
+  OrderStatusChange:
+    type: object
+    properties:
+      status:
+        type: string
+        enum: [pending, processing, shipped, delivered, cancelled]
+      timestamp:
+        type: string
+        format: date-time
+      note:
+        type: string
+      updated_by:
+        type: string
+  OrderHistoryPage:
+    type: object
+    properties:
+      items:
+        type: array
+        items:
+          $ref: '#/definitions/Order'
+      nextCursor:
+        type: string
+        description: Cursor of the next page, null on the last page
+      summary:
+        $ref: '#/definitions/OrderSummary'
+  OrderSummary:
+    type: object
+    properties:
+      total_orders:
+        type: integer
+      by_status:
+        type: object
+        additionalProperties:
+          type: integer
+      lifetime_spend:
+        type: number
+        description: Total of the orders that were not cancelled
+  OrderStatus:
+    type: object
+    properties:
+      status:
+        type: string
+        enum: [pending, processing, shipped, delivered, cancelled]
+      updated_at:
+        type: string
+        format: date-time
 """
@@ -1,12 +1,53 @@
 
-from flask import Blueprint, request, jsonify
-from ..models import Product, ProductImage, Seller
-from ..services.product_service import ProductService
+from flask import Blueprint, current_app, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
+from sqlalchemy.orm import load_only
+from ..models import Product, ProductImage, ProductListing, Seller
+from ..services.product_service import BulkValidationError, ProductService
+from ..services.recommendation_service import recommendation_service
+from ..utils.bulk_input import read_rows
+from ..utils.cache import MaterializedResult
+from ..utils.change_tracking import subscribe
+from ..utils.http_cache import collection_version, conditional_response, request_etag, make_etag
+from ..utils.idempotency import idempotent
 from ..utils.security import token_required
+from ..utils.pagination import parse_limit
+from ..services.media_service import media_service
+from ..utils.media import ImageTooLarge, media_url, upload_stream
+from ..utils.serializers import (DEFAULT_LISTING_FIELDS, DEFAULT_PRODUCT_FIELDS, LISTING_FIELDS, PRODUCT_FIELDS,
+                                 listing_columns, parse_fields, product_columns, serialize_listings,
+                                 serialize_products)
+from ..utils.streaming import ndjson_response, wants_stream
 
 bp = Blueprint('products', __name__, url_prefix='/api/products')
 product_service = ProductService()
 
+FEATURED_LIMIT = 3
+
+# Product page document (see get_product_detail)
+RELATED_LIMIT = 4
+MAX_RELATED_LIMIT = 20
+DETAIL_PRODUCT_FIELDS = DEFAULT_PRODUCT_FIELDS + ('primaryImage', 'reviewCount', 'salesCount')
+RELATED_PRODUCT_FIELDS = ('id', 'name', 'price', 'rating', 'primaryImage', 'thumbnail', 'sellerName')
+
+def _build_featured_products(_):
+    products = Product.query.order_by(Product.rating.desc(), Product.id.desc()).limit(FEATURED_LIMIT).all()
+    return format_products(products), [p.id for p in products] + [p.seller_id for p in products]
+
+def _invalidate_featured_products(changes):
+    """Drop the featured list when ranking changes or one of its rows changes"""
+    for change in changes:
+        if change.model is Product and change.touches('rating'):
+            featured_products.invalidate()
+            return
+    featured_products.invalidate_dependents(
+        change.values.get('product_id') if change.model is ProductImage else change.id
+        for change in changes
+    )
+
+featured_products = MaterializedResult(_build_featured_products)
+subscribe(_invalidate_featured_products, Product, ProductImage, Seller)
+
 @bp.route('', methods=['GET'])
 def get_products():
     """
@@ -23,15 +64,15 @@ def get_products():
         in: query
         type: string
         required: false
-      - name: min_price
+      - name: minPrice
         in: query
         type: number
         required: false
-      - name: max_price
+      - name: maxPrice
         in: query
         type: number
         required: false
-      - name: min_rating
+      - name: minRating
         in: query
         type: number
         required: false
@@ -39,45 +80,251 @@ def get_products():
         in: query
         type: string
         required: false
+      - name: sort
+        in: query
+        type: string
+        enum: [relevance, newest, rating, price_asc, price_desc]
+        required: false
+        description: Defaults to relevance when searching, newest otherwise
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default 20, max 100)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: Opaque cursor returned as nextCursor by the previous page
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Stream every matching product as NDJSON (also selected by Accept application/x-ndjson)
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. id,name,price,rating,primaryImage
     responses:
       200:
-        description: List of products
+        description: One page of products
         schema:
-          type: array
-          items:
-            $ref: '#/definitions/Product'
+          $ref: '#/definitions/ProductPage'
+      304:
+        description: Not modified since the ETag / date sent in If-None-Match / If-Modified-Since
+      400:
+        description: Invalid filter, sort or cursor
     """
     try:
-        query = Product.query
-
-        # Get featured products (top 3 by rating)
+        # Get featured products (top 3 by rating), served from the materialized result
         if request.args.get('featured') == 'true':
-            return jsonify([
-                format_product(p) for p in 
-                Product.query.order_by(Product.rating.desc()).limit(3).all()
-            ])
-
-        # Apply other filters
-        if request.args.get('category'):
-            query = query.filter(Product.category == request.args.get('category'))
-            
-        if request.args.get('minPrice'):
-            query = query.filter(Product.price >= float(request.args.get('minPrice')))
-            
-        if request.args.get('maxPrice'):
-            query = query.filter(Product.price <= float(request.args.get('maxPrice')))
-            
-        if request.args.get('search'):
-            search = f"%{request.args.get('search')}%"
-            query = query.filter(
-                db.or_(
-                    Product.name.ilike(search),
-                    Product.description.ilike(search)
-                )
+            payload = featured_products.get(max_age=current_app.config['MATERIALIZED_RESULT_MAX_AGE'])
+            return conditional_response(
+                make_etag(payload.decode('utf-8')), None,
+                lambda: current_app.response_class(payload, mimetype='application/json')
             )
 
-        products = query.all()
-        return jsonify([format_product(p) for p in products])
+        filters = {
+            'category': request.args.get('category'),
+            'type': request.args.get('type'),
+            'min_price': request.args.get('minPrice'),
+            'max_price': request.args.get('maxPrice'),
+            'min_rating': request.args.get('minRating'),
+            'search': request.args.get('search')
+        }
+
+        fields = parse_fields(request.args.get('fields'), LISTING_FIELDS)
+        columns = listing_columns(fields) if fields else None
+        fields = fields or DEFAULT_LISTING_FIELDS
+
+        # Listings read the denormalized product_listing table only
+        if wants_stream():
+            batches = product_service.iter_products(filters, sort=request.args.get('sort'),
+                                                    model=ProductListing, columns=columns)
+            return ndjson_response(record for batch in batches for record in serialize_listings(batch, fields))
+
+        def build():
+            products, next_cursor = product_service.list_products(
+                filters,
+                sort=request.args.get('sort'),
+                cursor=request.args.get('cursor'),
+                limit=parse_limit(request.args.get('limit')),
+                model=ProductListing,
+                columns=columns
+            )
+            return jsonify({
+                'items': serialize_listings(products, fields),
+                'nextCursor': next_cursor
+            })
+
+        version, last_modified = collection_version(ProductListing)
+        return conditional_response(request_etag(version), last_modified, build)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/facets', methods=['GET'])
+def get_product_facets():
+    """
+    Get filter facet counts for products
+    ---
+    tags:
+      - Products
+    parameters:
+      - name: category
+        in: query
+        type: string
+        required: false
+      - name: type
+        in: query
+        type: string
+        required: false
+      - name: minPrice
+        in: query
+        type: number
+        required: false
+      - name: maxPrice
+        in: query
+        type: number
+        required: false
+      - name: minRating
+        in: query
+        type: number
+        required: false
+      - name: search
+        in: query
+        type: string
+        required: false
+    responses:
+      200:
+        description: Product counts per category, type, price range and rating range
+        schema:
+          $ref: '#/definitions/ProductFacets'
+      400:
+        description: Invalid filter
+    """
+    try:
+        facets = product_service.get_facets({
+            'category': request.args.get('category'),
+            'type': request.args.get('type'),
+            'min_price': request.args.get('minPrice'),
+            'max_price': request.args.get('maxPrice'),
+            'min_rating': request.args.get('minRating'),
+            'search': request.args.get('search')
+        })
+        return jsonify(facets), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/<product_id>/detail', methods=['GET'])
+def get_product_detail(product_id):
+    """
+    Get everything a product page shows in one request
+    ---
+    tags:
+      - Products
+    parameters:
+      - name: product_id
+        in: path
+        type: string
+        required: true
+      - name: related
+        in: query
+        type: integer
+        required: false
+        description: Number of related products (same category, best rated first), default 4, max 20
+    responses:
+      200:
+        description: The product, its seller, a review summary and related products
+        schema:
+          $ref: '#/definitions/ProductDetail'
+      304:
+        description: Not modified since the ETag / date sent in If-None-Match / If-Modified-Since
+      404:
+        description: Product not found
+    """
+    try:
+        related_limit = parse_limit(request.args.get('related'), default=RELATED_LIMIT, maximum=MAX_RELATED_LIMIT)
+        version = product_service.get_product_detail_version(product_id)
+        if not version:
+            return jsonify({'error': 'Product not found'}), 404
+
+        def build():
+            detail = product_service.get_product_detail(product_id, related_limit)
+            if detail is None:
+                return jsonify({'error': 'Product not found'}), 404
+            return jsonify(format_product_detail(detail))
+
+        etag, last_modified = version
+        return conditional_response(request_etag(etag), last_modified, build)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/<product_id>/related', methods=['GET'])
+def get_related_products(product_id):
+    """
+    Get the products frequently bought together with a product
+    ---
+    tags:
+      - Products
+    parameters:
+      - name: product_id
+        in: path
+        type: string
+        required: true
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Default 10 (the number of neighbours stored per product)
+    responses:
+      200:
+        description: Related products, best first, with the share of the product's orders that also contained them
+        schema:
+          type: object
+          properties:
+            items:
+              type: array
+              items:
+                $ref: '#/definitions/Product'
+      304:
+        description: Not modified since the ETag / date sent in If-None-Match / If-Modified-Since
+      404:
+        description: Product not found
+    """
+    try:
+        limit = parse_limit(request.args.get('limit'), default=current_app.config['RECOMMENDATIONS_TOP_K'],
+                            maximum=current_app.config['RECOMMENDATIONS_TOP_K'])
+        recommendation = recommendation_service.get_related(product_id)
+        if recommendation is None:
+            if Product.query.get(product_id) is None:
+                return jsonify({'error': 'Product not found'}), 404
+            return jsonify({'items': []}), 200
+
+        def build():
+            neighbours = recommendation.neighbours[:limit]
+            listings = {listing.id: listing for listing in ProductListing.query.filter(
+                ProductListing.id.in_([neighbour_id for neighbour_id, _ in neighbours]))}
+            # Products deleted since the recommendations were built are skipped
+            found = [(listings[neighbour_id], score) for neighbour_id, score in neighbours
+                     if neighbour_id in listings]
+            items = serialize_listings([listing for listing, _ in found], RELATED_PRODUCT_FIELDS)
+            for item, (_, score) in zip(items, found):
+                item['score'] = score
+            return jsonify({'items': items})
+
+        return conditional_response(
+            request_etag(make_etag('related', product_id, recommendation.updated_at)),
+            recommendation.updated_at, build
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -93,43 +340,75 @@ def get_product(product_id):
         in: path
         type: string
         required: true
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. id,name,price,rating,primaryImage
     responses:
       200:
         description: Product details
         schema:
           $ref: '#/definitions/Product'
+      304:
+        description: Not modified since the ETag / date sent in If-None-Match / If-Modified-Since
       404:
         description: Product not found
     """
     try:
-        product = Product.query.get(product_id)
-        if not product:
+        fields = parse_fields(request.args.get('fields'), PRODUCT_FIELDS)
+        version = product_service.get_product_version(product_id)
+        if not version:
             return jsonify({'error': 'Product not found'}), 404
-            
-        return jsonify(format_product(product))
+
+        def build():
+            query = Product.query
+            if fields:
+                query = query.options(load_only(*[getattr(Product, c) for c in product_columns(fields)]))
+            return jsonify(format_product(query.get(product_id), fields or DEFAULT_PRODUCT_FIELDS))
+
+        etag, last_modified = version
+        return conditional_response(request_etag(etag), last_modified, build)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-def format_product(product):
+def format_product(product, fields=DEFAULT_PRODUCT_FIELDS):
     """Format product object for API response"""
-    seller = Seller.query.get(product.seller_id)
+    return format_products([product], fields)[0]
+
+def format_products(products, fields=DEFAULT_PRODUCT_FIELDS):
+    """Format a list of products, loading their sellers and images in batch"""
+    return serialize_products(products, fields)
+
+def format_product_detail(detail):
+    """Format the product page document built by ProductService.get_product_detail"""
+    seller = detail['seller']
     return {
-        'id': product.id,
-        'name': product.name,
-        'description': product.description,
-        'price': float(product.price),
-        'stock': product.stock,
-        'category': product.category,
-        'type': product.type,
-        'rating': float(product.rating),
-        'images': [img.image_url for img in product.images],
-        'sellerId': product.seller_id,
-        'sellerName': seller.store_name if seller else None,
-        'createdAt': product.created_at.isoformat()
+        'product': serialize_listings([detail['product']], DETAIL_PRODUCT_FIELDS)[0],
+        'seller': {
+            'id': seller.id,
+            'name': seller.store_name,
+            'description': seller.description,
+            'image': seller.image_url,
+            'location': seller.location,
+            'province': seller.province,
+            'rating': float(seller.rating) if seller.rating else 0,
+            'joinedDate': seller.joined_date.isoformat() if seller.joined_date else None,
+            'totalProducts': detail['seller_product_count']
+        } if seller else None,
+        'reviews': {
+            'count': detail['reviews']['count'],
+            'average': detail['reviews']['average'],
+            'histogram': {str(rating): count for rating, count in detail['reviews']['histogram'].items()}
+        },
+        'related': serialize_listings(detail['related'], RELATED_PRODUCT_FIELDS)
     }
 
 @bp.route('', methods=['POST'])
 @token_required
+@idempotent('products.create')
 def create_product(current_user):
     """
     Create a new product (Seller only)
@@ -139,6 +418,11 @@ def create_product(current_user):
     security:
       - Bearer: []
     parameters:
+      - in: header
+        name: Idempotency-Key
+        type: string
+        required: false
+        description: Unique value per operation; retries with the same key get the first response replayed
       - in: body
         name: body
         required: true
@@ -156,6 +440,10 @@ def create_product(current_user):
           properties:
             error:
               type: string
+      409:
+        description: A request with the same Idempotency-Key is still in progress
+      422:
+        description: The Idempotency-Key was already used for a different request
       400:
         description: Invalid input
         schema:
@@ -174,6 +462,125 @@ def create_product(current_user):
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/bulk', methods=['POST'])
+@token_required
+def bulk_upsert_products(current_user):
+    """
+    Create or update many products at once (Seller only)
+    ---
+    tags:
+      - Products
+    security:
+      - Bearer: []
+    consumes:
+      - application/json
+      - application/x-ndjson
+      - text/csv
+      - multipart/form-data
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: >
+          A JSON array or NDJSON stream of ProductInput rows, or a CSV with a
+          header row (images separated by '|'); also accepted as a multipart
+          'file'. Rows with an id update that product, others create one.
+        schema:
+          type: array
+          items:
+            $ref: '#/definitions/ProductInput'
+    responses:
+      200:
+        description: All rows imported in one transaction
+        schema:
+          $ref: '#/definitions/BulkImportResult'
+      400:
+        description: Malformed upload or invalid rows (nothing imported)
+        schema:
+          $ref: '#/definitions/BulkImportResult'
+      403:
+        description: Only sellers can create products
+    """
+    if current_user.role != 'seller':
+        return jsonify({'error': 'Only sellers can create products'}), 403
+
+    try:
+        rows = read_rows(current_app.config['BULK_IMPORT_MAX_ROWS'])
+        result = product_service.bulk_upsert_products(
+            current_user.id, rows, batch_size=current_app.config['BULK_IMPORT_BATCH_SIZE']
+        )
+        return jsonify(result), 200
+    except BulkValidationError as e:
+        return jsonify({'error': str(e), 'results': e.results}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@bp.route('/<product_id>/images', methods=['POST'])
+@token_required
+def upload_product_image(current_user, product_id):
+    """
+    Upload an image for a product (Seller only)
+    ---
+    tags:
+      - Products
+    security:
+      - Bearer: []
+    consumes:
+      - image/jpeg
+      - image/png
+      - image/webp
+      - image/gif
+      - multipart/form-data
+    parameters:
+      - name: product_id
+        in: path
+        type: string
+        required: true
+      - name: primary
+        in: query
+        type: boolean
+        required: false
+        description: Make this the primary image (the product's first image always is)
+      - in: body
+        name: body
+        required: true
+        description: The image as the request body, or as a multipart 'file'
+        schema:
+          type: string
+          format: binary
+    responses:
+      201:
+        description: >
+          Image added. Its URL serves resized variants, rendered in the
+          background: replace the trailing /full with /card or /thumbnail.
+        schema:
+          $ref: '#/definitions/Product'
+      400:
+        description: Not an image, or unknown product
+      413:
+        description: The image is larger than MAX_CONTENT_LENGTH
+      403:
+        description: Only sellers can upload product images
+    """
+    if current_user.role != 'seller':
+        return jsonify({'error': 'Only sellers can upload product images'}), 403
+
+    try:
+        # Check ownership before accepting the upload
+        product_service.get_seller_product(current_user.id, product_id)
+        asset = media_service.upload_image(current_user.id, upload_stream())
+        product = product_service.add_product_image(
+            current_user.id, product_id, media_url(asset.id, 'full'),
+            primary=request.args.get('primary', '').lower() in ('1', 'true')
+        )
+        return jsonify(product), 201
+    except (ImageTooLarge, RequestEntityTooLarge):
+        return jsonify({'error': f"Image is larger than {current_app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/<product_id>', methods=['PUT'])
 @token_required
 def update_product(current_user, product_id):
@@ -215,6 +622,38 @@ def update_product(current_user, product_id):
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/<product_id>', methods=['DELETE'])
+@token_required
+def delete_product(current_user, product_id):
+    """
+    Delete a product (Seller only)
+    ---
+    tags:
+      - Products
+    security:
+      - Bearer: []
+    parameters:
+      - name: product_id
+        in: path
+        type: string
+        required: true
+    responses:
+      204:
+        description: Product deleted
+      400:
+        description: Product not found, or it has been ordered
+      403:
+        description: Only sellers can delete products
+    """
+    if current_user.role != 'seller':
+        return jsonify({'error': 'Only sellers can delete products'}), 403
+
+    try:
+        product_service.delete_product(current_user.id, product_id)
+        return '', 204
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 """
 definitions:
   ProductInput:
@@ -252,6 +691,74 @@ definitions:
           type: string
           example: "https://example.com/image1.jpg"
 
+  ProductDetail:
+    type: object
+    properties:
+      product:
+        $ref: '#/definitions/Product'
+      seller:
+        type: object
+        properties:
+          id:
+            type: string
+          name:
+            type: string
+          description:
+            type: string
+          image:
+            type: string
+          location:
+            type: string
+          province:
+            type: string
+          rating:
+            type: number
+          joinedDate:
+            type: string
+          totalProducts:
+            type: integer
+      reviews:
+        type: object
+        properties:
+          count:
+            type: integer
+          average:
+            type: number
+          histogram:
+            type: object
+            description: Number of reviews per star rating ("1" to "5")
+            example: {"1": 0, "2": 1, "3": 2, "4": 5, "5": 12}
+      related:
+        type: array
+        items:
+          $ref: '#/definitions/Product'
+
+  BulkImportResult:
+    type: object
+    properties:
+      created:
+        type: integer
+      updated:
+        type: integer
+      error:
+        type: string
+      results:
+        type: array
+        items:
+          type: object
+          properties:
+            row:
+              type: integer
+            id:
+              type: string
+            status:
+              type: string
+              enum: [created, updated, valid, invalid]
+            errors:
+              type: array
+              items:
+                type: string
+
   Product:
     type: object
     properties:
@@ -284,6 +791,25 @@ definitions:
         items:
           type: string
           example: "https://example.com/image1.jpg"
+      primaryImage:
+        type: string
+        description: Only returned when requested with ?fields=
+        example: "https://example.com/image1.jpg"
+      thumbnail:
+        type: string
+        description: >
+          Small variant of the primary image for uploaded images (the
+          primary image URL itself otherwise); returned in listings
+        example: "/api/media/images/9f86d081884c7d659a2feaa0c55ad015a3bf4f1b2b0b822cd15d6c15b0f00a08/thumbnail"
+      sellerProvince:
+        type: string
+        description: Listings only, when requested with ?fields=
+      reviewCount:
+        type: integer
+        description: Listings only, when requested with ?fields=
+      salesCount:
+        type: integer
+        description: Listings only, when requested with ?fields=
       seller_id:
         type: string
         example: "seller-uuid"
@@ -291,4 +817,56 @@ definitions:
         type: string
         format: date-time
         example: "2024-06-01T12:00:00"
+
+  ProductPage:
+    type: object
+    properties:
+      items:
+        type: array
+        items:
+          $ref: '#/definitions/Product'
+      nextCursor:
+        type: string
+        description: Cursor of the next page, null on the last page
+
+  FacetValue:
+    type: object
+    properties:
+      value:
+        type: string
+      count:
+        type: integer
+
+  FacetRange:
+    type: object
+    properties:
+      min:
+        type: number
+      max:
+        type: number
+        description: Exclusive upper bound, null for the last range
+      count:
+        type: integer
+
+  ProductFacets:
+    type: object
+    properties:
+      total:
+        type: integer
+      categories:
+        type: array
+        items:
+          $ref: '#/definitions/FacetValue'
+      types:
+        type: array
+        items:
+          $ref: '#/definitions/FacetValue'
+      price_ranges:
+        type: array
+        items:
+          $ref: '#/definitions/FacetRange'
+      ratings:
+        type: array
+        items:
+          $ref: '#/definitions/FacetRange'
 """
@@ -0,0 +1,63 @@
+from flask import Blueprint, request, jsonify
+from ..services.suggest_service import suggest_service
+from ..utils.pagination import parse_limit
+
+bp = Blueprint('search', __name__, url_prefix='/api/search')
+
+SUGGEST_LIMIT = 8
+MAX_SUGGEST_LIMIT = 20
+
+@bp.route('/suggest', methods=['GET'])
+def suggest():
+    """
+    Autocomplete suggestions for the search box
+    ---
+    tags:
+      - Search
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: What the user typed so far; matches the start of any word of a product name, store name or category
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Default 8, max 20
+    responses:
+      200:
+        description: Suggestions, best rated and most popular first
+        schema:
+          type: object
+          properties:
+            query:
+              type: string
+            suggestions:
+              type: array
+              items:
+                type: object
+                properties:
+                  type:
+                    type: string
+                    enum: [product, seller, category]
+                  id:
+                    type: string
+                    description: Product or seller id, or the category name
+                  text:
+                    type: string
+      400:
+        description: Invalid limit
+    """
+    try:
+        query = request.args.get('q', '')
+        limit = parse_limit(request.args.get('limit'), default=SUGGEST_LIMIT, maximum=MAX_SUGGEST_LIMIT)
+        suggestions = suggest_service.suggest(query, limit)
+        return jsonify({
+            'query': query,
+            'suggestions': [{'type': s['type'], 'id': s['id'], 'text': s['text']} for s in suggestions]
+        }), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,10 +1,75 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
+from werkzeug.exceptions import RequestEntityTooLarge
 from ..services.seller_service import SellerService
+from ..services.product_service import ProductService
+from ..services.media_service import media_service
+from ..services.analytics_service import analytics_service
+from ..services.order_service import EXPORT_COLUMNS, OrderService
+from ..utils.cache import MaterializedResult, TTLCache
+from ..utils.change_tracking import subscribe
+from ..utils.http_cache import collection_version, conditional_response, request_etag, make_etag
+from ..utils.media import ImageTooLarge, media_url, upload_stream
 from ..utils.security import token_required
-from ..models import Seller, Product, ProductImage
+from ..utils.pagination import parse_limit
+from ..utils.serializers import (DEFAULT_LISTING_FIELDS, LISTING_FIELDS, SELLER_FIELDS,
+                                 listing_columns, parse_fields, serialize_listings)
+from ..utils.streaming import XLSX_AVAILABLE, csv_response, ndjson_response, wants_stream, xlsx_response
+from ..models import Seller, Product, ProductImage, ProductListing
+import math
 
 bp = Blueprint('sellers', __name__, url_prefix='/api/sellers')
 seller_service = SellerService()
+product_service = ProductService()
+order_service = OrderService()
+
+TOP_SELLERS_LIMIT = 3
+
+# Seller product listings leave out the seller name, which is the same on every row
+SELLER_PRODUCT_FIELDS = tuple(field for field in DEFAULT_LISTING_FIELDS if field != 'sellerName')
+
+def _build_top_sellers(province):
+    sellers = seller_service.get_top_sellers(province, TOP_SELLERS_LIMIT)
+    return sellers, [s['id'] for s in sellers]
+
+def _featured_province(value):
+    """
+    The stored spelling of a requested province, or None (all provinces)
+    for values no seller has, so arbitrary query strings never become
+    top seller cache keys
+    """
+    value = (value or '').strip()
+    if not value:
+        return None
+    provinces = known_provinces.get_or_set(
+        None, lambda: {province.casefold(): province for province in seller_service.get_provinces()}
+    )
+    return provinces.get(value.casefold())
+
+def _parse_min_rating(value):
+    """The ``min_rating`` filter as a number; raises ValueError for anything else"""
+    if value in (None, ''):
+        return None
+    try:
+        rating = float(value)
+    except ValueError:
+        raise ValueError('min_rating must be a number')
+    if not math.isfinite(rating):
+        raise ValueError('min_rating must be a number')
+    return rating
+
+def _invalidate_top_sellers(changes):
+    """Drop the top seller lists when ranking changes or one of their sellers changes"""
+    for change in changes:
+        if change.model is Seller and change.touches('rating', 'province'):
+            known_provinces.clear()
+            top_sellers.invalidate()
+            return
+    # Includes product counter updates
+    top_sellers.invalidate_dependents(change.id for change in changes)
+
+top_sellers = MaterializedResult(_build_top_sellers)
+known_provinces = TTLCache(ttl=300, maxsize=1)
+subscribe(_invalidate_top_sellers, Seller)
 
 @bp.route('', methods=['GET'])
 def get_sellers():
@@ -30,6 +95,21 @@ def get_sellers():
         in: query
         type: string
         required: false
+      - name: featured
+        in: query
+        type: boolean
+        required: false
+        description: Return the top rated sellers (optionally of one province)
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Stream every matching seller as NDJSON (also selected by Accept application/x-ndjson)
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. id,store_name,rating,province
     responses:
       200:
         description: List of sellers
@@ -37,15 +117,39 @@ def get_sellers():
           type: array
           items:
             $ref: '#/definitions/Seller'
+      304:
+        description: Not modified since the ETag / date sent in If-None-Match / If-Modified-Since
+      400:
+        description: Invalid min_rating or fields
     """
-    filters = {
-        'category': request.args.get('category'),
-        'province': request.args.get('province'),
-        'min_rating': request.args.get('min_rating'),
-        'search': request.args.get('search')
-    }
-    sellers = seller_service.get_sellers(filters)
-    return jsonify(sellers), 200
+    # Top sellers by rating per province, served from the materialized result
+    if request.args.get('featured') == 'true':
+        payload = top_sellers.get(_featured_province(request.args.get('province')),
+                                  max_age=current_app.config['MATERIALIZED_RESULT_MAX_AGE'])
+        return conditional_response(
+            make_etag(payload.decode('utf-8')), None,
+            lambda: current_app.response_class(payload, mimetype='application/json')
+        )
+
+    try:
+        filters = {
+            'category': request.args.get('category'),
+            'province': request.args.get('province'),
+            'min_rating': _parse_min_rating(request.args.get('min_rating')),
+            'search': request.args.get('search')
+        }
+        fields = parse_fields(request.args.get('fields'), SELLER_FIELDS)
+        if wants_stream():
+            return ndjson_response(seller_service.iter_sellers(filters, fields=fields))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Product counters live on the seller rows, so the sellers table alone versions the listing
+    version, last_modified = collection_version(Seller)
+    return conditional_response(
+        request_etag(version), last_modified,
+        lambda: (jsonify(seller_service.get_sellers(filters, fields)), 200)
+    )
 
 @bp.route('/<seller_id>', methods=['GET'])
 def get_seller(seller_id):
@@ -59,18 +163,240 @@ def get_seller(seller_id):
         in: path
         type: string
         required: true
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. id,store_name,rating,total_products
     responses:
       200:
         description: Seller details
         schema:
           $ref: '#/definitions/Seller'
+      304:
+        description: Not modified since the ETag / date sent in If-None-Match / If-Modified-Since
       404:
         description: Seller not found
     """
-    seller = seller_service.get_seller_by_id(seller_id)
-    if not seller:
+    try:
+        fields = parse_fields(request.args.get('fields'), SELLER_FIELDS)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    version = seller_service.get_seller_version(seller_id)
+    if not version:
         return jsonify({'error': 'Seller not found'}), 404
-    return jsonify(seller), 200
+
+    etag, last_modified = version
+    return conditional_response(
+        request_etag(etag), last_modified,
+        lambda: (jsonify(seller_service.get_seller_by_id(seller_id, fields)), 200)
+    )
+
+@bp.route('/me/orders', methods=['GET'])
+@token_required
+def get_my_orders(current_user):
+    """
+    Order inbox of the current seller (Seller only)
+    ---
+    tags:
+      - Sellers
+    security:
+      - Bearer: []
+    parameters:
+      - name: status
+        in: query
+        type: string
+        enum: [open, pending, processing, shipped, delivered, cancelled]
+        required: false
+        description: Order status; open means pending, processing or shipped
+      - name: from
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Orders placed on or after this day (YYYY-MM-DD, UTC)
+      - name: to
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Orders placed on or before this day (YYYY-MM-DD, UTC)
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: nextCursor of the previous page
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Default 20, max 100
+    responses:
+      200:
+        description: Orders containing the seller's products, newest first, with only the seller's items
+        schema:
+          type: object
+          properties:
+            items:
+              type: array
+              items:
+                $ref: '#/definitions/Order'
+            nextCursor:
+              type: string
+      400:
+        description: Invalid filter or cursor
+      403:
+        description: Only sellers have an order inbox
+    """
+    if current_user.role != 'seller':
+        return jsonify({'error': 'Only sellers have an order inbox'}), 403
+
+    try:
+        orders, next_cursor = order_service.get_seller_orders(
+            current_user.id,
+            {'status': request.args.get('status'), 'from': request.args.get('from'), 'to': request.args.get('to')},
+            cursor=request.args.get('cursor'),
+            limit=parse_limit(request.args.get('limit'))
+        )
+        return jsonify({'items': orders, 'nextCursor': next_cursor}), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/me/orders/export', methods=['GET'])
+@token_required
+def export_my_orders(current_user):
+    """
+    Export the current seller's order lines as CSV or XLSX (Seller only)
+    ---
+    tags:
+      - Sellers
+    security:
+      - Bearer: []
+    produces:
+      - text/csv
+      - application/vnd.openxmlformats-officedocument.spreadsheetml.sheet
+    parameters:
+      - name: from
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Orders placed on or after this day (YYYY-MM-DD, UTC); default 30 days before to
+      - name: to
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Orders placed on or before this day (YYYY-MM-DD, UTC); default today
+      - name: status
+        in: query
+        type: string
+        enum: [open, pending, processing, shipped, delivered, cancelled]
+        required: false
+      - name: format
+        in: query
+        type: string
+        enum: [csv, xlsx]
+        required: false
+        default: csv
+    responses:
+      200:
+        description: >
+          One row per order item of the seller, oldest order first, streamed as it is read.
+          Columns are order_id, order_date, status, payment_method, shipping_address_id,
+          product_id, product_name, quantity, unit_price and line_total
+      400:
+        description: Invalid filter or a range over 366 days
+      403:
+        description: Only sellers can export orders
+      501:
+        description: XLSX export is not available on this server
+    """
+    if current_user.role != 'seller':
+        return jsonify({'error': 'Only sellers can export orders'}), 403
+
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    if export_format == 'xlsx' and not XLSX_AVAILABLE:
+        return jsonify({'error': 'XLSX export is not available'}), 501
+
+    try:
+        rows = order_service.export_seller_orders(current_user.id, {
+            'status': request.args.get('status'), 'from': request.args.get('from'), 'to': request.args.get('to')
+        })
+        filename = f"orders-{request.args.get('from') or 'start'}-{request.args.get('to') or 'today'}"
+        if export_format == 'xlsx':
+            return xlsx_response(EXPORT_COLUMNS, rows, f'{filename}.xlsx', title='Orders')
+        return csv_response(EXPORT_COLUMNS, rows, f'{filename}.csv')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/me/analytics', methods=['GET'])
+@token_required
+def get_my_analytics(current_user):
+    """
+    Sales analytics of the current seller (Seller only)
+    ---
+    tags:
+      - Sellers
+    security:
+      - Bearer: []
+    parameters:
+      - name: from
+        in: query
+        type: string
+        format: date
+        required: false
+        description: First day (YYYY-MM-DD, UTC), default 29 days before 'to'
+      - name: to
+        in: query
+        type: string
+        format: date
+        required: false
+        description: Last day (YYYY-MM-DD, UTC), default today; at most 731 days after 'from'
+      - name: granularity
+        in: query
+        type: string
+        enum: [day, week, month]
+        required: false
+        description: Period of each point of the series (weeks start on Monday), default day
+      - name: top
+        in: query
+        type: integer
+        required: false
+        description: Number of top products by revenue, default 10, max 50
+    responses:
+      200:
+        description: Units, revenue and orders (excluding cancelled ones) over the range, per period and per product
+        schema:
+          $ref: '#/definitions/SellerAnalytics'
+      400:
+        description: Invalid range or granularity
+      403:
+        description: Only sellers have analytics
+    """
+    if current_user.role != 'seller':
+        return jsonify({'error': 'Only sellers have analytics'}), 403
+
+    try:
+        analytics = analytics_service.get_seller_analytics(
+            current_user.id,
+            request.args.get('from'),
+            request.args.get('to'),
+            granularity=request.args.get('granularity', 'day'),
+            top=parse_limit(request.args.get('top'), default=10, maximum=50)
+        )
+        return jsonify(analytics), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @bp.route('/<seller_id>/products', methods=['GET'])
 def get_seller_products(seller_id):
@@ -84,52 +410,83 @@ def get_seller_products(seller_id):
         in: path
         type: string
         required: true
+      - name: sort
+        in: query
+        type: string
+        enum: [relevance, newest, rating, price_asc, price_desc]
+        required: false
+        description: Defaults to relevance when searching, newest otherwise
+      - name: limit
+        in: query
+        type: integer
+        required: false
+      - name: cursor
+        in: query
+        type: string
+        required: false
+      - name: stream
+        in: query
+        type: boolean
+        required: false
+        description: Stream every matching product as NDJSON (also selected by Accept application/x-ndjson)
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: Comma-separated fields to return, e.g. id,name,price,rating,primaryImage
     responses:
       200:
-        description: List of seller's products
+        description: One page of the seller's products
         schema:
-          type: array
-          items:
-            $ref: '#/definitions/Product'
+          $ref: '#/definitions/ProductPage'
+      304:
+        description: Not modified since the ETag / date sent in If-None-Match / If-Modified-Since
+      400:
+        description: Invalid filter, sort or cursor
     """
     try:
         # First verify seller exists
         seller = Seller.query.get_or_404(seller_id)
         
-        # Build query for seller's products
-        query = Product.query.filter_by(seller_id=seller_id)
-
-        # Apply filters if provided
-        if request.args.get('minPrice'):
-            query = query.filter(Product.price >= float(request.args.get('minPrice')))
-            
-        if request.args.get('maxPrice'):
-            query = query.filter(Product.price <= float(request.args.get('maxPrice')))
-            
-        if request.args.get('categories'):
-            categories = request.args.get('categories').split(',')
-            query = query.filter(Product.category.in_(categories))
-            
-        if request.args.get('types'):
-            types = request.args.get('types').split(',')
-            query = query.filter(Product.type.in_(types))
-            
-        if request.args.get('minRating'):
-            query = query.filter(Product.rating >= float(request.args.get('minRating')))
-            
-        if request.args.get('search'):
-            search = f"%{request.args.get('search')}%"
-            query = query.filter(
-                db.or_(
-                    Product.name.ilike(search),
-                    Product.description.ilike(search)
-                )
+        filters = {
+            'seller_id': seller_id,
+            'min_price': request.args.get('minPrice'),
+            'max_price': request.args.get('maxPrice'),
+            'categories': request.args.get('categories'),
+            'types': request.args.get('types'),
+            'min_rating': request.args.get('minRating'),
+            'search': request.args.get('search')
+        }
+
+        fields = parse_fields(request.args.get('fields'), LISTING_FIELDS)
+        columns = listing_columns(fields) if fields else None
+        fields = fields or SELLER_PRODUCT_FIELDS
+
+        # Listings read the denormalized product_listing table only
+        if wants_stream():
+            batches = product_service.iter_products(filters, sort=request.args.get('sort'),
+                                                    model=ProductListing, columns=columns)
+            return ndjson_response(record for batch in batches for record in serialize_listings(batch, fields))
+
+        def build():
+            products, next_cursor = product_service.list_products(
+                filters,
+                sort=request.args.get('sort'),
+                cursor=request.args.get('cursor'),
+                limit=parse_limit(request.args.get('limit')),
+                model=ProductListing,
+                columns=columns
             )
+            return jsonify({
+                'items': serialize_listings(products, fields),
+                'nextCursor': next_cursor
+            })
 
-        # Execute query and format results
-        products = query.all()
-        return jsonify([format_product(p) for p in products])
+        version, last_modified = collection_version(ProductListing)
+        return conditional_response(request_etag(version), last_modified, build)
 
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -145,27 +502,10 @@ def format_seller(seller):
         'rating': float(seller.rating) if seller.rating else 0,
         'category': seller.category,
         'joinedDate': seller.joined_date.isoformat() if seller.joined_date else None,
-        'totalProducts': len(seller.products),
+        'totalProducts': seller.total_products or 0,
         'badges': ['Verified'] if seller.rating and seller.rating >= 4.5 else []
     }
 
-def format_product(product):
-    """Format product object for API response"""
-    return {
-        'id': product.id,
-        'name': product.name,
-        'description': product.description,
-        'price': float(product.price) if product.price else 0,
-        'stock': product.stock or 0,
-        'category': product.category,
-        'type': product.type,
-        'rating': float(product.rating) if product.rating else 0,
-        'images': [img.image_url for img in product.images],
-        'sellerId': product.seller_id,
-        'createdAt': product.created_at.isoformat() if product.created_at else None
-    }
-
-
 @bp.route('/profile', methods=['PUT'])
 @token_required
 def update_profile(current_user):
@@ -201,6 +541,58 @@ def update_profile(current_user):
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
 
+@bp.route('/profile/image', methods=['PUT'])
+@token_required
+def upload_profile_image(current_user):
+    """
+    Upload the store image (Seller only)
+    ---
+    tags:
+      - Sellers
+    security:
+      - Bearer: []
+    consumes:
+      - image/jpeg
+      - image/png
+      - image/webp
+      - image/gif
+      - multipart/form-data
+    parameters:
+      - in: body
+        name: body
+        required: true
+        description: The image as the request body, or as a multipart 'file'
+        schema:
+          type: string
+          format: binary
+    responses:
+      200:
+        description: >
+          Profile updated. The image URL serves resized variants, rendered
+          in the background: replace the trailing /full with /card or /thumbnail.
+        schema:
+          $ref: '#/definitions/Seller'
+      400:
+        description: Not an image
+      413:
+        description: The image is larger than MAX_CONTENT_LENGTH
+      403:
+        description: Only sellers can update their profile
+    """
+    if current_user.role != 'seller':
+        return jsonify({'error': 'Only sellers can update their profile'}), 403
+
+    try:
+        asset = media_service.upload_image(current_user.id, upload_stream())
+        profile = seller_service.update_seller_profile(current_user.id, {'image_url': media_url(asset.id, 'full')})
+        return jsonify(profile), 200
+    except (ImageTooLarge, RequestEntityTooLarge):
+        return jsonify({'error': f"Image is larger than {current_app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Add Swagger definitions
 """
 definitions:
@@ -254,4 +646,50 @@ definitions:
       image_url:
         type: string
         example: "https://example.com/image.jpg"
+
+  SellerAnalytics:
+    type: object
+    properties:
+      from:
+        type: string
+        format: date
+      to:
+        type: string
+        format: date
+      granularity:
+        type: string
+      totals:
+        $ref: '#/definitions/SalesFigures'
+      series:
+        type: array
+        items:
+          allOf:
+            - $ref: '#/definitions/SalesFigures'
+            - type: object
+              properties:
+                period:
+                  type: string
+                  format: date
+                  description: First day of the period
+      top_products:
+        type: array
+        items:
+          allOf:
+            - $ref: '#/definitions/SalesFigures'
+            - type: object
+              properties:
+                product_id:
+                  type: string
+                name:
+                  type: string
+
+  SalesFigures:
+    type: object
+    properties:
+      units:
+        type: integer
+      revenue:
+        type: number
+      orders:
+        type: integer
 """
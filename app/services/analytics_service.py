@@ -0,0 +1,227 @@
+from typing import Any, Dict, List, Optional, Tuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from sqlalchemy.orm import load_only
+from ..models.analytics import SellerDailySales, SellerProductDailySales
+from ..models.order import Order, OrderItem
+from ..models.product import Product
+from ..models.seller import Seller
+from ..utils.change_tracking import subscribe_in_transaction
+from ..utils.pagination import iter_batches
+from ..utils.upsert import increment_rows
+from .. import db
+
+GRANULARITIES = ('day', 'week', 'month')
+MAX_RANGE_DAYS = 731
+DEFAULT_RANGE_DAYS = 30
+
+
+class AnalyticsService:
+    """
+    Seller sales analytics served from daily rollups.
+
+    ``seller_daily_sales`` and ``seller_product_daily_sales`` hold units,
+    revenue and order counts per seller (and product) per order day,
+    excluding cancelled orders. They are updated inside the transaction
+    that places an order or moves it in or out of ``cancelled``, with
+    relative upserts, so reports never read ``orders`` or ``order_items``.
+    ``backfill`` rebuilds them from the order history.
+    """
+
+    def __init__(self):
+        subscribe_in_transaction(self._apply_changes, Order, OrderItem)
+
+    def get_seller_analytics(self, user_id: str, start: Optional[str], end: Optional[str],
+                             granularity: str = 'day', top: int = 10) -> Dict[str, Any]:
+        seller = Seller.query.filter_by(user_id=user_id).first()
+        if not seller:
+            raise ValueError('Seller profile not found')
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        end_day = self._parse_day(end, 'to') if end else datetime.utcnow().date()
+        start_day = self._parse_day(start, 'from') if start else end_day - timedelta(days=DEFAULT_RANGE_DAYS - 1)
+        if start_day > end_day:
+            raise ValueError("'from' must not be after 'to'")
+        if (end_day - start_day).days >= MAX_RANGE_DAYS:
+            raise ValueError(f'The range cannot exceed {MAX_RANGE_DAYS} days')
+
+        buckets: Dict[date, Dict[str, Any]] = {}
+        for row in SellerDailySales.query.filter(
+            SellerDailySales.seller_id == seller.id,
+            SellerDailySales.day.between(start_day, end_day)
+        ):
+            bucket = buckets.setdefault(self._period(row.day, granularity),
+                                        {'units': 0, 'revenue': Decimal(0), 'orders': 0})
+            bucket['units'] += row.units
+            bucket['revenue'] += row.revenue
+            bucket['orders'] += row.order_count
+
+        series = [{'period': period.isoformat(), 'units': bucket['units'],
+                   'revenue': float(bucket['revenue']), 'orders': bucket['orders']}
+                  for period, bucket in sorted(buckets.items())]
+        return {
+            'from': start_day.isoformat(),
+            'to': end_day.isoformat(),
+            'granularity': granularity,
+            'totals': {
+                'units': sum(point['units'] for point in series),
+                'revenue': float(sum(bucket['revenue'] for bucket in buckets.values())),
+                'orders': sum(point['orders'] for point in series)
+            },
+            'series': series,
+            'top_products': self._top_products(seller.id, start_day, end_day, top)
+        }
+
+    def _top_products(self, seller_id: str, start_day: date, end_day: date, limit: int) -> List[Dict[str, Any]]:
+        revenue = db.func.sum(SellerProductDailySales.revenue)
+        rows = db.session.query(
+            SellerProductDailySales.product_id,
+            db.func.sum(SellerProductDailySales.units).label('units'),
+            revenue.label('revenue'),
+            db.func.sum(SellerProductDailySales.order_count).label('orders')
+        ).filter(
+            SellerProductDailySales.seller_id == seller_id,
+            SellerProductDailySales.day.between(start_day, end_day)
+        ).group_by(SellerProductDailySales.product_id) \
+            .order_by(revenue.desc(), SellerProductDailySales.product_id).limit(limit).all()
+        names = {}
+        if rows:
+            names = dict(db.session.query(Product.id, Product.name)
+                         .filter(Product.id.in_([row.product_id for row in rows])))
+        return [{'product_id': row.product_id, 'name': names.get(row.product_id), 'units': int(row.units),
+                 'revenue': float(row.revenue), 'orders': int(row.orders)}
+                for row in rows]
+
+    def backfill(self, since: Optional[date] = None, chunk_size: int = 1000) -> Dict[str, int]:
+        """
+        Rebuild the rollups (from ``since`` on, or entirely) by streaming
+        the orders in chunks, committing once per chunk. Run it while no
+        orders are placed for those days, or their rollups may double count.
+        """
+        for model in (SellerDailySales, SellerProductDailySales):
+            query = db.session.query(model)
+            if since is not None:
+                query = query.filter(model.day >= since)
+            query.delete(synchronize_session=False)
+        db.session.commit()
+
+        query = Order.query.options(load_only(Order.id, Order.status, Order.created_at)) \
+            .filter(db.or_(Order.status.is_(None), Order.status != 'cancelled'))
+        if since is not None:
+            query = query.filter(Order.created_at >= datetime.combine(since, datetime.min.time()))
+        order_count = 0
+        for orders in iter_batches(query, [(Order.created_at, False), (Order.id, False)], chunk_size):
+            created = {order.id: order.created_at for order in orders}
+            items = db.session.query(OrderItem.order_id, OrderItem.product_id, OrderItem.seller_id,
+                                     OrderItem.quantity, OrderItem.price_at_time) \
+                .filter(OrderItem.order_id.in_(list(created))).all()
+            self._add(db.session, [(created[item.order_id], item) for item in items], 1)
+            db.session.commit()
+            order_count += len(orders)
+        return {'orders': order_count}
+
+    def _apply_changes(self, session, changes) -> None:
+        added, removed = [], []
+        counted_orders, uncounted_orders = set(), set()
+        for change in changes:
+            if change.model is Order:
+                if change.action == 'update' and change.touches('status'):
+                    was = self._counted(change.previous.get('status'))
+                    now = self._counted(change.values.get('status'))
+                    if was != now:
+                        (counted_orders if now else uncounted_orders).add(change.id)
+            elif change.action in ('insert', 'delete'):
+                (added if change.action == 'insert' else removed).append(change.values)
+
+        items = [item for item in added + removed if item.get('order_id')]
+        orders = {}
+        if items:
+            orders = {row.id: row for row in session.query(Order.id, Order.status, Order.created_at)
+                      .filter(Order.id.in_({item['order_id'] for item in items}))}
+
+        def counted_items(values_list):
+            result = []
+            for values in values_list:
+                order = orders.get(values.get('order_id'))
+                # Items of orders that change state in this transaction are handled with the order
+                if order is None or order.id in counted_orders or order.id in uncounted_orders:
+                    continue
+                if self._counted(order.status):
+                    result.append((order.created_at, _ItemRow(values)))
+            return result
+
+        self._add(session, counted_items(added), 1)
+        self._add(session, counted_items(removed), -1)
+        for order_ids, sign in ((counted_orders, 1), (uncounted_orders, -1)):
+            if order_ids:
+                rows = session.query(Order.created_at, OrderItem.order_id, OrderItem.product_id,
+                                     OrderItem.seller_id, OrderItem.quantity, OrderItem.price_at_time) \
+                    .join(Order, Order.id == OrderItem.order_id).filter(OrderItem.order_id.in_(order_ids)).all()
+                self._add(session, [(row.created_at, row) for row in rows], sign)
+
+    def _add(self, session, items: List[Tuple[datetime, Any]], sign: int) -> None:
+        """Add (or with ``sign`` -1, subtract) order items to the rollups of their order day"""
+        if not items:
+            return
+        # Items written before order_items.seller_id existed fall back to the product's seller
+        unknown = {item.product_id for _, item in items if not item.seller_id}
+        sellers = {}
+        if unknown:
+            sellers = dict(session.query(Product.id, Product.seller_id).filter(Product.id.in_(unknown)))
+
+        by_seller: Dict[Tuple[str, date], Dict[str, Any]] = {}
+        by_product: Dict[Tuple[str, date, str], Dict[str, Any]] = {}
+        for created_at, item in items:
+            seller_id = item.seller_id or sellers.get(item.product_id)
+            if seller_id is None:
+                continue
+            day = (created_at or datetime.utcnow()).date()
+            revenue = Decimal(str(item.price_at_time)) * item.quantity
+            for totals, key in ((by_seller, (seller_id, day)), (by_product, (seller_id, day, item.product_id))):
+                total = totals.setdefault(key, {'units': 0, 'revenue': Decimal(0), 'orders': set()})
+                total['units'] += item.quantity
+                total['revenue'] += revenue
+                total['orders'].add(item.order_id)
+
+        self._increment(session, SellerDailySales, ('seller_id', 'day'), by_seller, sign)
+        self._increment(session, SellerProductDailySales, ('seller_id', 'day', 'product_id'), by_product, sign)
+
+    @staticmethod
+    def _increment(session, model, keys: Tuple[str, ...], totals: Dict[tuple, Dict[str, Any]], sign: int) -> None:
+        increment_rows(session, model, keys, ('units', 'revenue', 'order_count'), [
+            dict(zip(keys, key), units=sign * total['units'], revenue=sign * total['revenue'],
+                 order_count=sign * len(total['orders']))
+            for key, total in totals.items()
+        ])
+
+    @staticmethod
+    def _counted(status: Optional[str]) -> bool:
+        return status != 'cancelled'
+
+    @staticmethod
+    def _period(day: date, granularity: str) -> date:
+        if granularity == 'week':
+            return day - timedelta(days=day.weekday())
+        if granularity == 'month':
+            return day.replace(day=1)
+        return day
+
+    @staticmethod
+    def _parse_day(value: str, name: str) -> date:
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise ValueError(f"'{name}' must be a date (YYYY-MM-DD)")
+
+
+class _ItemRow:
+    """Attribute access to the column values of a tracked order item change"""
+
+    __slots__ = ('order_id', 'product_id', 'seller_id', 'quantity', 'price_at_time')
+
+    def __init__(self, values: Dict[str, Any]):
+        for name in self.__slots__:
+            setattr(self, name, values.get(name))
+
+
+analytics_service = AnalyticsService()
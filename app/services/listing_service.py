@@ -0,0 +1,150 @@
+from typing import Any, Dict, Iterable, List, Set
+from datetime import datetime
+from ..models.order import Order, OrderItem
+from ..models.product import Product, ProductImage
+from ..models.product_listing import ProductListing
+from ..models.review import Review
+from ..models.seller import Seller
+from ..utils.change_tracking import subscribe_in_transaction
+from .. import db
+
+# Product columns copied as-is into the listing
+PRODUCT_COLUMNS = ('id', 'seller_id', 'name', 'description', 'price', 'stock',
+                   'category', 'type', 'rating', 'created_at')
+
+
+class ListingService:
+    """
+    Maintains the ``product_listing`` read model.
+
+    Listing rows are refreshed inside the transaction that changes a
+    product, its seller, images, reviews or orders, so listings never
+    disagree with the committed data. Affected products are recomputed in
+    batches with one IN query per source table.
+    """
+
+    def __init__(self, batch_size: int = 500):
+        self.batch_size = batch_size
+        subscribe_in_transaction(self._apply_changes, Product, Seller, ProductImage,
+                                 Review, OrderItem, Order)
+
+    def rebuild(self, batch_size: int = None) -> int:
+        """Recompute every listing row, committing batch by batch; returns the product count"""
+        batch_size = batch_size or self.batch_size
+        table = ProductListing.__table__
+        count, last_id = 0, None
+        while True:
+            query = db.session.query(Product.id)
+            if last_id is not None:
+                query = query.filter(Product.id > last_id)
+            ids = [row[0] for row in query.order_by(Product.id).limit(batch_size)]
+            if not ids:
+                break
+            self.refresh(ids)
+            db.session.commit()
+            count += len(ids)
+            last_id = ids[-1]
+
+        # Drop rows of products deleted outside the application
+        db.session.execute(table.delete().where(
+            ~table.c.id.in_(db.session.query(Product.id).scalar_subquery())
+        ))
+        db.session.commit()
+        return count
+
+    def refresh(self, product_ids: Iterable[str]) -> None:
+        """Recompute the listing rows of ``product_ids`` in the current transaction"""
+        ids = sorted({product_id for product_id in product_ids if product_id})
+        for start in range(0, len(ids), self.batch_size):
+            self._refresh_batch(ids[start:start + self.batch_size])
+
+    def _refresh_batch(self, ids: List[str]) -> None:
+        table = ProductListing.__table__
+        products = [dict(row) for row in db.session.execute(
+            Product.__table__.select().where(Product.__table__.c.id.in_(ids))
+        ).mappings()]
+
+        seller_ids = {product['seller_id'] for product in products if product['seller_id']}
+        sellers = {}
+        if seller_ids:
+            sellers = {row.id: row for row in db.session.query(
+                Seller.id, Seller.store_name, Seller.province
+            ).filter(Seller.id.in_(seller_ids))}
+
+        images: Dict[str, List[str]] = {}
+        primary: Dict[str, str] = {}
+        for product_id, image_url, is_primary in db.session.query(
+            ProductImage.product_id, ProductImage.image_url, ProductImage.is_primary
+        ).filter(ProductImage.product_id.in_(ids)):
+            images.setdefault(product_id, []).append(image_url)
+            if is_primary or product_id not in primary:
+                primary[product_id] = image_url
+
+        review_counts = dict(db.session.query(Review.product_id, db.func.count(Review.id))
+                             .filter(Review.product_id.in_(ids)).group_by(Review.product_id))
+        sales_counts = dict(db.session.query(OrderItem.product_id, db.func.sum(OrderItem.quantity))
+                            .join(Order, Order.id == OrderItem.order_id)
+                            .filter(OrderItem.product_id.in_(ids), Order.status != 'cancelled')
+                            .group_by(OrderItem.product_id))
+
+        now = datetime.utcnow()
+        rows = []
+        for product in products:
+            seller = sellers.get(product['seller_id'])
+            row = {column: product[column] for column in PRODUCT_COLUMNS}
+            row.update(
+                seller_store_name=seller.store_name if seller else None,
+                seller_province=seller.province if seller else None,
+                primary_image_url=primary.get(product['id']),
+                image_urls=images.get(product['id'], []),
+                review_count=review_counts.get(product['id'], 0),
+                sales_count=int(sales_counts.get(product['id']) or 0),
+                updated_at=now
+            )
+            rows.append(row)
+
+        db.session.execute(table.delete().where(table.c.id.in_(ids)))
+        if rows:
+            db.session.execute(table.insert(), rows)
+
+    def _apply_changes(self, session, changes) -> None:
+        stale: Set[str] = set()
+        deleted: Set[str] = set()
+        sellers: Dict[str, Dict[str, Any]] = {}
+        orders: Set[str] = set()
+
+        for change in changes:
+            if change.model is Product:
+                (deleted if change.action == 'delete' else stale).add(change.id)
+            elif change.model is Seller:
+                if change.action == 'update' and change.touches('store_name', 'province'):
+                    if 'store_name' in change.values and 'province' in change.values:
+                        sellers[change.id] = change.values
+                    else:
+                        stale.update(row[0] for row in session.query(Product.id)
+                                     .filter(Product.seller_id == change.id))
+            elif change.model is Order:
+                if change.action == 'update' and change.touches('status'):
+                    orders.add(change.id)
+            else:
+                # Images, reviews and order items of one product
+                stale.add(change.values.get('product_id') or change.previous.get('product_id'))
+                if change.previous.get('product_id'):
+                    stale.add(change.previous['product_id'])
+
+        table = ProductListing.__table__
+        if orders:
+            stale.update(row[0] for row in session.query(OrderItem.product_id)
+                         .filter(OrderItem.order_id.in_(orders)).distinct())
+        if deleted:
+            session.execute(table.delete().where(table.c.id.in_(deleted)))
+        for seller_id, values in sellers.items():
+            session.execute(table.update().where(table.c.seller_id == seller_id).values(
+                seller_store_name=values.get('store_name'),
+                seller_province=values.get('province'),
+                updated_at=datetime.utcnow()
+            ))
+        self.refresh(stale - deleted)
+
+
+listing_service = ListingService()
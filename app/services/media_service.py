@@ -0,0 +1,134 @@
+from typing import BinaryIO, Optional, Tuple
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from ..models.media import MediaAsset
+from ..utils.media import (DIGEST_PATTERN, VARIANT_MIMETYPE, inspect_image, original_path,
+                           render_variants, store_stream, variant_path)
+from .. import db
+
+
+class MediaService:
+    """
+    Uploaded images.
+
+    Uploads are streamed to disk and stored under the SHA-256 of their
+    bytes, so the same image uploaded twice is stored (and resized) once.
+    The resized variants (``IMAGE_VARIANTS``) are rendered by a pool of
+    worker processes after the upload returns; until a variant exists its
+    URL serves the original, so image URLs work immediately and never
+    change.
+    """
+
+    def __init__(self):
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def upload_image(self, user_id: str, stream: BinaryIO) -> MediaAsset:
+        """
+        Store an uploaded image and queue its variants; returns the (possibly
+        existing) asset. Variants that failed to render are queued again.
+        """
+        config = current_app.config
+        root = config['UPLOAD_FOLDER']
+        digest, size, created = store_stream(root, stream, config['MAX_CONTENT_LENGTH'])
+        asset = db.session.get(MediaAsset, digest)
+        if asset is not None:
+            if asset.status == 'failed':
+                # Uploading a failed image again retries its variants; only one concurrent upload requeues it
+                retried = db.session.query(MediaAsset).filter_by(id=digest, status='failed') \
+                    .update({'status': 'pending'}, synchronize_session='fetch')
+                db.session.commit()
+                if retried:
+                    self._schedule(digest)
+            return asset
+
+        try:
+            info = inspect_image(original_path(root, digest))
+        except ValueError:
+            if created:
+                os.remove(original_path(root, digest))
+            raise
+        asset = MediaAsset(id=digest, uploaded_by=user_id, size=size, status='pending', **info)
+        db.session.add(asset)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # The same image was uploaded concurrently
+            db.session.rollback()
+            return db.session.get(MediaAsset, digest)
+        self._schedule(digest)
+        return asset
+
+    def find_image(self, digest: str, variant: str) -> Optional[Tuple[str, str, bool]]:
+        """
+        The file to serve for a variant of an image as ``(path, mimetype,
+        final)``; the original (not ``final``) while the variant is being
+        rendered, ``None`` for unknown images or variants.
+        """
+        if not DIGEST_PATTERN.match(digest) or variant not in current_app.config['IMAGE_VARIANTS']:
+            return None
+        root = current_app.config['UPLOAD_FOLDER']
+        path = variant_path(root, digest, variant)
+        if os.path.exists(path):
+            return path, VARIANT_MIMETYPE, True
+        asset = db.session.get(MediaAsset, digest)
+        if asset is None or not os.path.exists(original_path(root, digest)):
+            return None
+        return original_path(root, digest), asset.content_type, False
+
+    def _schedule(self, digest: str) -> None:
+        config = current_app.config
+        arguments = (config['UPLOAD_FOLDER'], digest, dict(config['IMAGE_VARIANTS']), config['IMAGE_QUALITY'])
+        if not config['IMAGE_WORKERS']:
+            try:
+                self._finish(digest, render_variants(*arguments))
+            except Exception as e:
+                self._fail(digest, e)
+            return
+
+        app = current_app._get_current_object()
+        try:
+            future = self._executor(config['IMAGE_WORKERS']).submit(render_variants, *arguments)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed while decoding); start a new pool
+            with self._lock:
+                self._pool = None
+            future = self._executor(config['IMAGE_WORKERS']).submit(render_variants, *arguments)
+        future.add_done_callback(lambda done: self._on_rendered(app, digest, done))
+
+    def _executor(self, workers: int) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=workers)
+            return self._pool
+
+    def _on_rendered(self, app, digest: str, future) -> None:
+        with app.app_context():
+            try:
+                self._finish(digest, future.result())
+            except Exception as e:
+                self._fail(digest, e)
+
+    def _finish(self, digest: str, variants) -> None:
+        db.session.query(MediaAsset).filter_by(id=digest).update({'status': 'ready', 'variants': variants})
+        db.session.commit()
+
+    def _fail(self, digest: str, error: Exception) -> None:
+        current_app.logger.warning('Resizing image %s failed: %s', digest, error)
+        db.session.rollback()
+        db.session.query(MediaAsset).filter_by(id=digest).update({'status': 'failed'})
+        db.session.commit()
+
+    def shutdown(self) -> None:
+        """Wait for queued resizes and stop the worker processes"""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+media_service = MediaService()
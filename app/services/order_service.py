@@ -1,74 +1,406 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import date, datetime, timedelta
 import uuid
-from ..models.order import Order, OrderItem
+from ..models.order import Order, OrderItem, OrderStatusHistory, SellerOrder
 from ..models.product import Product
+from ..models.seller import Seller
+from ..utils.change_tracking import record_change
+from ..utils.pagination import DEFAULT_LIMIT, iter_batches, paginate
+from .outbox_service import outbox_service
+from .user_order_stats_service import user_order_stats_service
 from .. import db
 
+# Status -> the statuses an order may move to from it
+ORDER_TRANSITIONS = {
+    'pending': ('processing', 'cancelled'),
+    'processing': ('shipped', 'cancelled'),
+    'shipped': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+}
+# The allowed (from, to) pairs, checked with one set lookup
+ALLOWED_TRANSITIONS = frozenset((old, new) for old, targets in ORDER_TRANSITIONS.items() for new in targets)
+MAX_STATUS_LOOKUP = 100
+# Seller order exports: one row per order item
+EXPORT_COLUMNS = ('order_id', 'order_date', 'status', 'payment_method', 'shipping_address_id',
+                  'product_id', 'product_name', 'quantity', 'unit_price', 'line_total')
+EXPORT_DEFAULT_DAYS = 30
+EXPORT_MAX_DAYS = 366
+EXPORT_BATCH_SIZE = 1000
+
 class OrderService:
     def create_order(self, user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
-        # Calculate total and validate stock
-        total_amount = 0
-        order_items = []
-        
-        for item in data['items']:
-            product = Product.query.get(item['product_id'])
-            if not product:
-                raise ValueError(f"Product {item['product_id']} not found")
-                
-            if product.stock < item['quantity']:
-                raise ValueError(f"Insufficient stock for {product.name}")
-                
-            total_amount += float(product.price) * item['quantity']
-            order_items.append({
-                'product': product,
-                'quantity': item['quantity'],
-                'price': float(product.price)
-            })
-            
-        # Create order
-        order = Order(
-            id=str(uuid.uuid4()),
-            user_id=user_id,
-            status='pending',
-            total_amount=total_amount,
-            shipping_address_id=data['shipping_address_id'],
-            payment_method=data['payment_method']
-        )
-        
-        # Create order items and update stock
-        for item in order_items:
-            order_item = OrderItem(
+        """
+        Place an order, reserving its stock in one short transaction.
+
+        The line-item products are read with one IN query, then all of the
+        stock is reserved by a single conditional ``UPDATE ... SET stock =
+        stock - q WHERE id IN (...) AND stock >= q``. It either takes every
+        line's stock or, when fewer rows matched, the transaction is rolled
+        back. Concurrent checkouts therefore never oversell or lose
+        updates, and they lock product rows in primary key order, so they
+        cannot deadlock each other.
+        """
+        quantities = self._line_quantities(data.get('items'))
+        ids = sorted(quantities)
+        products = {row.id: row for row in db.session.query(
+            Product.id, Product.name, Product.price, Product.seller_id
+        ).filter(Product.id.in_(ids))}
+        for product_id in ids:
+            if product_id not in products:
+                raise ValueError(f"Product {product_id} not found")
+
+        try:
+            self._reserve_stock(products, quantities)
+
+            order = Order(
                 id=str(uuid.uuid4()),
-                order_id=order.id,
-                product_id=item['product'].id,
-                quantity=item['quantity'],
-                price_at_time=item['price']
+                user_id=user_id,
+                status='pending',
+                total_amount=sum(products[product_id].price * quantity
+                                 for product_id, quantity in quantities.items()),
+                shipping_address_id=data['shipping_address_id'],
+                payment_method=data['payment_method']
             )
-            order.items.append(order_item)
-            
-            # Update product stock
-            item['product'].stock -= item['quantity']
-            
-        db.session.add(order)
-        db.session.commit()
-        
+            for product_id, quantity in quantities.items():
+                order.items.append(OrderItem(
+                    id=str(uuid.uuid4()),
+                    order_id=order.id,
+                    product_id=product_id,
+                    seller_id=products[product_id].seller_id,
+                    quantity=quantity,
+                    price_at_time=products[product_id].price
+                ))
+            db.session.add(order)
+            db.session.add(OrderStatusHistory(id=str(uuid.uuid4()), order_id=order.id, status=order.status,
+                                              updated_by=user_id))
+            outbox_service.publish(db.session, 'order.created', {
+                'order_id': order.id,
+                'user_id': user_id,
+                'seller_ids': sorted({product.seller_id for product in products.values() if product.seller_id}),
+                'product_ids': ids,
+                'total_amount': str(order.total_amount)
+            }, aggregate_id=order.id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
         return self._format_order(order)
+
+    @staticmethod
+    def _line_quantities(items) -> Dict[str, int]:
+        """Validate the order lines and merge lines of the same product, keeping their order"""
+        if not isinstance(items, list) or not items:
+            raise ValueError('An order needs at least one item')
+        quantities: Dict[str, int] = {}
+        for item in items:
+            product_id = item.get('product_id') if isinstance(item, dict) else None
+            quantity = item.get('quantity') if isinstance(item, dict) else None
+            if not product_id or isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+                raise ValueError('Each item needs a product_id and a positive integer quantity')
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return quantities
+
+    def _reserve_stock(self, products: Dict[str, Any], quantities: Dict[str, int]) -> None:
+        """Take the stock of every line with one conditional UPDATE; raises ValueError if one is short"""
+        table = Product.__table__
+        ids = sorted(quantities)
+        needed = db.case(quantities, value=table.c.id)
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id.in_(ids), table.c.stock >= needed)
+            .values(stock=table.c.stock - needed, updated_at=datetime.utcnow())
+        )
+        if result.rowcount != len(ids):
+            db.session.rollback()
+            stock = dict(db.session.query(Product.id, Product.stock).filter(Product.id.in_(ids)))
+            short = [product_id for product_id in ids if (stock.get(product_id) or 0) < quantities[product_id]]
+            name = products[short[0]].name if short else products[ids[0]].name
+            raise ValueError(f"Insufficient stock for {name}")
+
+        # Read back the reserved rows (locked until commit) so stock-derived data can follow
+        for row in db.session.query(Product.id, Product.seller_id, Product.stock).filter(Product.id.in_(ids)):
+            record_change(db.session, Product, 'update', row.id,
+                          {'id': row.id, 'seller_id': row.seller_id, 'stock': row.stock},
+                          {'stock': row.stock + quantities[row.id]})
+
+    def _release_stock(self, order_id: str) -> None:
+        """Put the stock of a cancelled order's lines back with one relative UPDATE"""
+        quantities = {product_id: int(quantity) for product_id, quantity in db.session.query(
+            OrderItem.product_id, db.func.sum(OrderItem.quantity)
+        ).filter(OrderItem.order_id == order_id, OrderItem.product_id.isnot(None)).group_by(OrderItem.product_id)}
+        if not quantities:
+            return
+        table = Product.__table__
+        ids = sorted(quantities)
+        returned = db.case(quantities, value=table.c.id)
+        db.session.execute(table.update().where(table.c.id.in_(ids))
+                           .values(stock=table.c.stock + returned, updated_at=datetime.utcnow()))
+        for row in db.session.query(Product.id, Product.seller_id, Product.stock).filter(Product.id.in_(ids)):
+            record_change(db.session, Product, 'update', row.id,
+                          {'id': row.id, 'seller_id': row.seller_id, 'stock': row.stock},
+                          {'stock': row.stock - quantities[row.id]})
+
+    def get_order_by_id(self, order_id: str) -> Optional[Dict[str, Any]]:
+        order = Order.query.get(order_id)
+        if not order:
+            return None
+        return dict(self._format_order(order), user_id=order.user_id,
+                    status_history=self.get_status_history(order_id))
+
+    def update_order_status(self, order_id: str, seller_id: str, new_status: Optional[str],
+                            note: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Move an order containing the products of the seller (a user id) to
+        ``new_status`` and append the change to its history. The order row
+        is locked while the transition is checked, so concurrent changes
+        apply one after the other. Cancelling puts the order's stock back.
+        """
+        if new_status not in ORDER_TRANSITIONS:
+            raise ValueError(f"Invalid status '{new_status}'")
+        if not self.is_seller_order(seller_id, order_id):
+            raise ValueError('Order not found')
+
+        try:
+            order = Order.query.filter_by(id=order_id).with_for_update().first()
+            if not order:
+                raise ValueError('Order not found')
+            current = order.status or 'pending'
+            if (current, new_status) not in ALLOWED_TRANSITIONS:
+                raise ValueError(f"Cannot change the status of a {current} order to {new_status}")
+
+            order.status = new_status
+            if new_status == 'cancelled':
+                self._release_stock(order_id)
+            db.session.add(OrderStatusHistory(id=str(uuid.uuid4()), order_id=order_id, status=new_status,
+                                              note=note or None, updated_by=seller_id))
+            outbox_service.publish(db.session, 'order.status_changed', {
+                'order_id': order_id,
+                'user_id': order.user_id,
+                'from': current,
+                'to': new_status,
+                'updated_by': seller_id
+            }, aggregate_id=order_id)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return self.get_order_by_id(order_id)
+
+    def get_status_history(self, order_id: str) -> List[Dict[str, Any]]:
+        """An order's status changes, oldest first, from one range of the history index"""
+        rows = db.session.query(
+            OrderStatusHistory.status, OrderStatusHistory.note, OrderStatusHistory.created_at,
+            OrderStatusHistory.updated_by
+        ).filter(OrderStatusHistory.order_id == order_id) \
+            .order_by(OrderStatusHistory.created_at, OrderStatusHistory.id).all()
+        return [{
+            'status': row.status,
+            'timestamp': row.created_at.isoformat() if row.created_at else None,
+            'note': row.note,
+            'updated_by': row.updated_by
+        } for row in rows]
+
+    def get_order_statuses(self, user_id: str, role: str, order_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        The current status of each of the user's orders (bought, or
+        containing the seller's products) among ``order_ids``, with the
+        time of its latest change. Statuses are read from the orders by
+        primary key and the times from the newest end of each order's
+        history index range, so the history is never scanned.
+        """
+        ids = sorted({order_id for order_id in order_ids if order_id})
+        if len(ids) > MAX_STATUS_LOOKUP:
+            raise ValueError(f'At most {MAX_STATUS_LOOKUP} orders can be looked up at once')
+        if not ids:
+            return {}
+
+        query = db.session.query(Order.id, Order.status, Order.created_at).filter(Order.id.in_(ids))
+        if role == 'seller':
+            query = query.join(SellerOrder, SellerOrder.order_id == Order.id) \
+                .join(Seller, Seller.id == SellerOrder.seller_id).filter(Seller.user_id == user_id)
+        else:
+            query = query.filter(Order.user_id == user_id)
+        orders = query.all()
+        if not orders:
+            return {}
+
+        changed = dict(db.session.query(OrderStatusHistory.order_id, db.func.max(OrderStatusHistory.created_at))
+                       .filter(OrderStatusHistory.order_id.in_([order.id for order in orders]))
+                       .group_by(OrderStatusHistory.order_id))
+        result = {}
+        for order in orders:
+            updated_at = changed.get(order.id) or order.created_at
+            result[order.id] = {'status': order.status or 'pending',
+                                'updated_at': updated_at.isoformat() if updated_at else None}
+        return result
+
+    def is_seller_order(self, user_id: str, order_id: str) -> bool:
+        """Whether the order contains products of the user's store"""
+        return db.session.query(SellerOrder.order_id).join(Seller, Seller.id == SellerOrder.seller_id) \
+            .filter(Seller.user_id == user_id, SellerOrder.order_id == order_id).first() is not None
+
+    def get_seller_orders(self, user_id: str, filters: Dict[str, Any], cursor: Optional[str] = None,
+                          limit: int = DEFAULT_LIMIT) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of the orders containing the seller's products, newest
+        first, with only the seller's items. ``status`` is a status or
+        ``open`` (pending, processing or shipped); ``from``/``to`` bound the
+        order date. Each filter combination is a range scan of one
+        ``seller_orders`` index.
+        """
+        seller = Seller.query.filter_by(user_id=user_id).first()
+        if not seller:
+            raise ValueError('Seller profile not found')
+
+        query = SellerOrder.query.filter(SellerOrder.seller_id == seller.id)
+        status = filters.get('status')
+        if status == 'open':
+            query = query.filter(SellerOrder.is_open.is_(True))
+        elif status:
+            if status not in SellerOrder.status.type.enums:
+                raise ValueError(f"Invalid status '{status}'")
+            query = query.filter(SellerOrder.status == status)
+        if filters.get('from'):
+            query = query.filter(SellerOrder.created_at >= self._parse_day(filters['from'], 'from'))
+        if filters.get('to'):
+            query = query.filter(SellerOrder.created_at < self._parse_day(filters['to'], 'to') + timedelta(days=1))
+
+        rows, next_cursor = paginate(query, 'newest', [(SellerOrder.created_at, True), (SellerOrder.order_id, True)],
+                                     cursor, limit)
+        ids = [row.order_id for row in rows]
+        orders = {order.id: order for order in Order.query.filter(Order.id.in_(ids))} if ids else {}
+        items: Dict[str, list] = {}
+        if ids:
+            for item in db.session.query(
+                OrderItem.id, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity,
+                OrderItem.price_at_time
+            ).filter(OrderItem.seller_id == seller.id, OrderItem.order_id.in_(ids)):
+                items.setdefault(item.order_id, []).append(item)
+        return [dict(self._format_order(orders[row.order_id], items.get(row.order_id, [])),
+                     user_id=orders[row.order_id].user_id, subtotal=float(row.subtotal))
+                for row in rows if row.order_id in orders], next_cursor
+
+    def export_seller_orders(self, user_id: str, filters: Dict[str, Any]) -> Iterator[tuple]:
+        """
+        The seller's order lines placed between ``from`` and ``to`` (default:
+        the last 30 days), oldest first, one tuple per item in the order of
+        ``EXPORT_COLUMNS``. Filters are checked before returning; the rows
+        are then read through a server-side cursor (``yield_per``) while
+        they are consumed, so the export is never held in memory.
+        """
+        seller = Seller.query.filter_by(user_id=user_id).first()
+        if not seller:
+            raise ValueError('Seller profile not found')
+        end = self._parse_day(filters['to'], 'to') if filters.get('to') else \
+            datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        start = self._parse_day(filters['from'], 'from') if filters.get('from') else \
+            end - timedelta(days=EXPORT_DEFAULT_DAYS - 1)
+        if start > end:
+            raise ValueError("'from' must not be after 'to'")
+        if (end - start).days >= EXPORT_MAX_DAYS:
+            raise ValueError(f'The range cannot exceed {EXPORT_MAX_DAYS} days')
+        status = filters.get('status')
+        if status and status != 'open' and status not in ORDER_TRANSITIONS:
+            raise ValueError(f"Invalid status '{status}'")
+
+        # seller_orders narrows the range to the seller's orders; items come from their seller index
+        query = db.session.query(
+            Order.id, Order.created_at, SellerOrder.status, Order.payment_method, Order.shipping_address_id,
+            OrderItem.product_id, Product.name, OrderItem.quantity, OrderItem.price_at_time
+        ).select_from(SellerOrder) \
+            .join(Order, Order.id == SellerOrder.order_id) \
+            .join(OrderItem, db.and_(OrderItem.order_id == SellerOrder.order_id,
+                                     OrderItem.seller_id == SellerOrder.seller_id)) \
+            .outerjoin(Product, Product.id == OrderItem.product_id) \
+            .filter(SellerOrder.seller_id == seller.id,
+                    SellerOrder.created_at >= start, SellerOrder.created_at < end + timedelta(days=1))
+        if status == 'open':
+            query = query.filter(SellerOrder.is_open.is_(True))
+        elif status:
+            query = query.filter(SellerOrder.status == status)
+        query = query.order_by(SellerOrder.created_at, SellerOrder.order_id, OrderItem.id) \
+            .yield_per(EXPORT_BATCH_SIZE)
+
+        def rows():
+            for row in query:
+                yield (row.id, row.created_at.isoformat(sep=' ', timespec='seconds'), row.status or 'pending',
+                       row.payment_method, row.shipping_address_id, row.product_id, row.name, row.quantity,
+                       row.price_at_time, row.price_at_time * row.quantity)
+        return rows()
+
+    @staticmethod
+    def _parse_day(value: str, name: str) -> datetime:
+        try:
+            return datetime.combine(date.fromisoformat(value), datetime.min.time())
+        except ValueError:
+            raise ValueError(f"'{name}' must be a date (YYYY-MM-DD)")
+
+    def get_user_orders(self, user_id: str, status: Optional[str] = None, cursor: Optional[str] = None,
+                        limit: int = DEFAULT_LIMIT) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of a user's orders, newest first, with their items loaded
+        by one IN query for the page. ``status`` is a status or a
+        comma-separated list of them; a single status is a range scan of
+        ``idx_orders_user_status_created``.
+        """
+        query = Order.query.filter(Order.user_id == user_id)
+        if status:
+            statuses = {value.strip() for value in status.split(',') if value.strip()}
+            invalid = sorted(statuses - set(ORDER_TRANSITIONS))
+            if invalid:
+                raise ValueError(f"Invalid status '{invalid[0]}'")
+            condition = Order.status.in_(sorted(statuses))
+            if 'pending' in statuses:
+                # Orders written without a status are pending
+                condition = db.or_(condition, Order.status.is_(None))
+            query = query.filter(condition)
+
+        orders, next_cursor = paginate(query, 'newest', [(Order.created_at, True), (Order.id, True)], cursor, limit)
+        items = self._load_items(order.id for order in orders)
+        return [self._format_order(order, items.get(order.id, [])) for order in orders], next_cursor
+
+    def get_order_summary(self, user_id: str) -> Dict[str, Any]:
+        """Order counts per status and lifetime spend, from the maintained per-user counters"""
+        return user_order_stats_service.get_summary(user_id)
+
+    def iter_user_orders(self, user_id: str, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+        """Yield all of a user's orders, newest first, loading orders and items per batch"""
+        query = Order.query.filter_by(user_id=user_id)
+        batches = iter_batches(query, [(Order.created_at, True), (Order.id, True)], batch_size)
+        for batch in batches:
+            items = self._load_items(o.id for o in batch)
+            for order in batch:
+                yield self._format_order(order, items.get(order.id, []))
+
+    def _load_items(self, order_ids) -> Dict[str, list]:
+        """Load the items of a batch of orders with a single IN query (as plain rows)"""
+        ids = list(order_ids)
+        items: Dict[str, list] = {}
+        if ids:
+            rows = db.session.query(
+                OrderItem.id, OrderItem.order_id, OrderItem.product_id, OrderItem.quantity,
+                OrderItem.price_at_time
+            ).filter(OrderItem.order_id.in_(ids))
+            for item in rows:
+                items.setdefault(item.order_id, []).append(item)
+        return items
         
-    def get_user_orders(self, user_id: str) -> List[Dict[str, Any]]:
-        orders = Order.query.filter_by(user_id=user_id).all()
-        return [self._format_order(o) for o in orders]
-        
-    def _format_order(self, order: Order) -> Dict[str, Any]:
+    def _format_order(self, order: Order, items: Optional[list] = None) -> Dict[str, Any]:
+        if items is None:
+            items = order.items
         return {
             'id': order.id,
             'status': order.status,
             'total_amount': float(order.total_amount),
             'created_at': order.created_at.isoformat(),
             'items': [{
+                'id': item.id,
                 'product_id': item.product_id,
                 'quantity': item.quantity,
                 'price': float(item.price_at_time)
-            } for item in order.items],
+            } for item in items],
             'shipping_address_id': order.shipping_address_id,
             'payment_method': order.payment_method
         }
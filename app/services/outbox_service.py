@@ -0,0 +1,185 @@
+from typing import Any, Callable, Dict, List, Optional
+from datetime import datetime, timedelta
+import random
+import threading
+import uuid
+from flask import after_this_request, current_app, g, has_request_context
+from ..models.outbox import OutboxEvent
+from ..utils.change_tracking import subscribe
+from .. import db
+
+Handler = Callable[[Any], None]
+
+
+class OutboxService:
+    """
+    Transactional outbox for side effects of writes.
+
+    ``publish`` adds an event to the session of the write, so the event is
+    committed (or rolled back) with it. Worker threads claim due events in
+    batches, run the handlers registered for their topic and delete them.
+    A failing event is retried with exponential backoff and marked
+    ``failed`` after ``OUTBOX_MAX_ATTEMPTS``. Delivery is at least once, so
+    handlers must be idempotent.
+
+    Events are only written for topics with a registered handler, so
+    without consumers the outbox stays empty and no worker is started.
+    ``OUTBOX_MODE`` picks where events are handled: ``thread`` runs
+    ``OUTBOX_WORKERS`` threads in each app process, started when it first
+    commits an event; ``external`` leaves them to ``flask outbox-worker``
+    processes; ``inline`` (for tests) handles them at the end of the
+    request that committed them, or when ``drain()`` is called.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._threads: List[threading.Thread] = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        subscribe(self._on_committed, OutboxEvent)
+
+    def register(self, topic: str, handler: Optional[Handler] = None):
+        """Run ``handler(event)`` for every event of ``topic``; usable as a decorator"""
+        def add(handler: Handler) -> Handler:
+            self._handlers.setdefault(topic, []).append(handler)
+            return handler
+        return add(handler) if handler is not None else add
+
+    def publish(self, session, topic: str, payload: Dict[str, Any], aggregate_id: Optional[str] = None) -> None:
+        """
+        Add an event to ``session``; it is handled once the session commits.
+        Topics without a registered handler are not written at all.
+        """
+        if not self._handlers.get(topic):
+            return
+        session.add(OutboxEvent(topic=topic, aggregate_id=aggregate_id, payload=payload,
+                                available_at=datetime.utcnow()))
+
+    def process_batch(self, batch_size: Optional[int] = None) -> int:
+        """Claim and handle one batch of due events; returns how many were claimed"""
+        config = current_app.config
+        table = OutboxEvent.__table__
+        now = datetime.utcnow()
+        ids = [row[0] for row in db.session.query(OutboxEvent.id).filter(
+            OutboxEvent.status == 'pending', OutboxEvent.available_at <= now
+        ).order_by(OutboxEvent.id).limit(batch_size or config['OUTBOX_BATCH_SIZE'])]
+        if not ids:
+            db.session.commit()
+            return 0
+
+        # Conditional claim: of workers that read the same ids, each row goes to the first one
+        token = str(uuid.uuid4())
+        db.session.execute(table.update().where(
+            table.c.id.in_(ids), table.c.status == 'pending', table.c.available_at <= now
+        ).values(
+            claimed_by=token, attempts=table.c.attempts + 1,
+            available_at=now + timedelta(seconds=config['OUTBOX_LEASE_SECONDS'])
+        ))
+        db.session.commit()
+        events = db.session.execute(table.select().where(table.c.claimed_by == token)
+                                    .order_by(table.c.id)).all()
+        db.session.commit()
+
+        for event in events:
+            try:
+                for handler in self._handlers.get(event.topic, ()):
+                    handler(event)
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                self._retry(event, e)
+                continue
+            db.session.execute(table.delete().where(table.c.id == event.id, table.c.claimed_by == token))
+            db.session.commit()
+        return len(events)
+
+    def drain(self, max_batches: Optional[int] = None) -> int:
+        """Handle due events in this thread until none are left; returns how many were claimed"""
+        total = batches = 0
+        while max_batches is None or batches < max_batches:
+            count = self.process_batch()
+            if not count:
+                break
+            total += count
+            batches += 1
+        return total
+
+    def retry_failed(self) -> int:
+        """Queue the events marked failed again; returns how many"""
+        table = OutboxEvent.__table__
+        result = db.session.execute(table.update().where(table.c.status == 'failed').values(
+            status='pending', attempts=0, available_at=datetime.utcnow()
+        ))
+        db.session.commit()
+        return result.rowcount
+
+    def run_workers(self, app, workers: int) -> None:
+        """Start ``workers`` worker threads for ``app`` unless they are running"""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            if self._threads:
+                return
+            self._stop.clear()
+            for number in range(workers):
+                thread = threading.Thread(target=self._work, args=(app,), name=f'outbox-worker-{number}',
+                                          daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def shutdown(self, timeout: Optional[float] = None) -> None:
+        """Stop the worker threads after their current batch"""
+        self._stop.set()
+        self._wake.set()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join(timeout)
+
+    def _work(self, app) -> None:
+        with app.app_context():
+            while not self._stop.is_set():
+                try:
+                    count = self.process_batch()
+                except Exception as e:
+                    app.logger.warning('Outbox batch failed: %s', e)
+                    db.session.rollback()
+                    count = 0
+                finally:
+                    db.session.remove()
+                if count < app.config['OUTBOX_BATCH_SIZE']:
+                    self._wake.wait(app.config['OUTBOX_POLL_INTERVAL'])
+                    self._wake.clear()
+
+    def _retry(self, event, error: Exception) -> None:
+        config = current_app.config
+        table = OutboxEvent.__table__
+        failed = event.attempts >= config['OUTBOX_MAX_ATTEMPTS']
+        delay = min(config['OUTBOX_RETRY_BASE'] * 2 ** (event.attempts - 1), config['OUTBOX_RETRY_MAX'])
+        current_app.logger.warning('Outbox event %s (%s) failed on attempt %s: %s',
+                                   event.id, event.topic, event.attempts, error)
+        # Jitter spreads the retries of events that failed together
+        retry_at = datetime.utcnow() + timedelta(seconds=delay * random.uniform(1, 1.25))
+        db.session.execute(table.update().where(table.c.id == event.id, table.c.claimed_by == event.claimed_by)
+                           .values(status='failed' if failed else 'pending', claimed_by=None,
+                                   last_error=f'{type(error).__name__}: {error}'[:2000], available_at=retry_at))
+        db.session.commit()
+
+    def _on_committed(self, changes) -> None:
+        if not self._handlers or not any(change.action == 'insert' for change in changes):
+            return
+        mode = current_app.config['OUTBOX_MODE']
+        if mode == 'thread':
+            self.run_workers(current_app._get_current_object(), current_app.config['OUTBOX_WORKERS'])
+            self._wake.set()
+        elif mode == 'inline' and has_request_context() and not g.get('outbox_drain_scheduled'):
+            # In-process mode: handle the events once the view has returned
+            g.outbox_drain_scheduled = True
+
+            @after_this_request
+            def handle_events(response):
+                self.drain()
+                return response
+
+
+outbox_service = OutboxService()
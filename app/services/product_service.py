@@ -1,49 +1,276 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import uuid
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.orm import aliased, load_only
+from ..models.order import OrderItem
 from ..models.product import Product, ProductImage
+from ..models.product_listing import ProductListing
+from ..models.review import Review
+from ..models.seller import Seller
+from ..utils.pagination import (DEFAULT_LIMIT, iter_batches, iter_ranked_batches,
+                                paginate, paginate_ranked)
+from ..utils.cache import TTLCache
+from ..utils.change_tracking import record_change
+from ..utils.http_cache import make_etag
+from ..utils.serializers import load_images
+from ..utils.validators import validate_product
+from .search_service import search_service
 from .. import db
 
+class BulkValidationError(ValueError):
+    """Raised when rows of a bulk import are invalid; ``results`` has the per-row errors"""
+
+    def __init__(self, message: str, results: List[Dict[str, Any]]):
+        super().__init__(message)
+        self.results = results
+
+
 class ProductService:
-    def get_products(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
-        query = Product.query
-        
+    # Stable orderings usable with keyset pagination; each ends with the primary key
+    SORTS = {
+        'newest': (('created_at', True), ('id', True)),
+        'rating': (('rating', True), ('id', True)),
+        'price_asc': (('price', False), ('id', False)),
+        'price_desc': (('price', True), ('id', True)),
+    }
+
+    # Lower bounds of the price and rating facet buckets
+    PRICE_BUCKETS = (0, 25000, 50000, 100000, 250000)
+    RATING_BUCKETS = (0, 1, 2, 3, 4)
+
+    _facets_cache = TTLCache(ttl=30, maxsize=512)
+
+    def build_query(self, filters: Dict[str, Any], model=Product,
+                    ranking: Optional[List[Tuple[str, float]]] = None):
+        """Build the filtered product query shared by every product listing"""
+        query = model.query
+
+        if filters.get('seller_id'):
+            query = query.filter(model.seller_id == filters['seller_id'])
         if filters.get('category'):
-            query = query.filter(Product.category == filters['category'])
+            query = query.filter(model.category == filters['category'])
+        if filters.get('categories'):
+            query = query.filter(model.category.in_(filters['categories'].split(',')))
         if filters.get('type'):
-            query = query.filter(Product.type == filters['type'])
+            query = query.filter(model.type == filters['type'])
+        if filters.get('types'):
+            query = query.filter(model.type.in_(filters['types'].split(',')))
         if filters.get('min_price'):
-            query = query.filter(Product.price >= float(filters['min_price']))
+            query = query.filter(model.price >= float(filters['min_price']))
         if filters.get('max_price'):
-            query = query.filter(Product.price <= float(filters['max_price']))
+            query = query.filter(model.price <= float(filters['max_price']))
         if filters.get('min_rating'):
-            query = query.filter(Product.rating >= float(filters['min_rating']))
+            query = query.filter(model.rating >= float(filters['min_rating']))
         if filters.get('search'):
-            search = f"%{filters['search']}%"
-            query = query.filter(
-                db.or_(
-                    Product.name.ilike(search),
-                    Product.description.ilike(search)
-                )
-            )
-            
-        products = query.all()
-        return [self._format_product(p) for p in products]
+            # A relevance ranking is capped at SEARCH_MAX_RESULTS; other orders filter on every match
+            if ranking is None:
+                query = query.filter(search_service.match_products(filters['search'], model))
+            else:
+                query = query.filter(model.id.in_([product_id for product_id, _ in ranking]))
+        return query
+
+    def paginate_products(self, query, sort: str = 'newest', cursor: Optional[str] = None,
+                          limit: int = DEFAULT_LIMIT, model=Product) -> Tuple[List[Product], Optional[str]]:
+        """Return one page of ``query`` and the cursor of the next page"""
+        if sort not in self.SORTS:
+            raise ValueError(f"Invalid sort '{sort}'")
+        columns = [(getattr(model, name), descending) for name, descending in self.SORTS[sort]]
+        return paginate(query, sort, columns, cursor, limit)
+
+    def list_products(self, filters: Dict[str, Any], sort: Optional[str] = None,
+                      cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+                      model=Product, columns: Optional[List[str]] = None) -> Tuple[list, Optional[str]]:
+        """
+        Return one page of filtered products and the next cursor. Searches
+        are ordered by relevance unless another sort is requested. When
+        ``columns`` is given only those columns (plus the sort key) are selected.
+        """
+        sort, ranking = self._ranking(filters, sort)
+        query = self._project(self.build_query(filters, model, ranking), sort, columns, model)
+
+        if ranking is not None:
+            return paginate_ranked(query, model.id, ranking, cursor, limit)
+        return self.paginate_products(query, sort, cursor, limit, model)
+
+    def iter_products(self, filters: Dict[str, Any], sort: Optional[str] = None,
+                      batch_size: int = 500, model=Product, columns: Optional[List[str]] = None):
+        """Yield every filtered product in batches, for streamed listings and exports"""
+        sort, ranking = self._ranking(filters, sort)
+        query = self._project(self.build_query(filters, model, ranking), sort, columns, model)
+
+        if ranking is not None:
+            return iter_ranked_batches(query, model.id, ranking, batch_size)
+        if sort not in self.SORTS:
+            raise ValueError(f"Invalid sort '{sort}'")
+        columns = [(getattr(model, name), descending) for name, descending in self.SORTS[sort]]
+        return iter_batches(query, columns, batch_size)
+
+    @staticmethod
+    def _ranking(filters: Dict[str, Any], sort: Optional[str]):
+        """The effective sort, and the search ranking when results are ordered by relevance"""
+        sort = sort or ('relevance' if filters.get('search') else 'newest')
+        if sort != 'relevance':
+            return sort, None
+        if not filters.get('search'):
+            raise ValueError('Sorting by relevance requires a search term')
+        return sort, search_service.search_products(filters['search'])
+
+    def _project(self, query, sort: str, columns: Optional[List[str]], model=Product):
+        """Restrict ``query`` to ``columns`` and the columns the sort's keyset reads"""
+        if not columns:
+            return query
+        names = set(columns) | {'id'} | {name for name, _ in self.SORTS.get(sort, ())}
+        return query.options(load_only(*[getattr(model, name) for name in sorted(names)]))
+
+    def get_products(self, filters: Dict[str, Any], sort: Optional[str] = None,
+                     cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+        products, next_cursor = self.list_products(filters, sort, cursor, limit)
+        return {
+            'items': self._format_products(products),
+            'next_cursor': next_cursor
+        }
         
+    def get_facets(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Count products per category, type, price bucket and rating bucket for
+        a filter set, using one grouped aggregate query. Results are cached
+        briefly per normalized filter set.
+        """
+        key = tuple(sorted(
+            (name, ' '.join(str(value).lower().split()) if name == 'search' else str(value).strip())
+            for name, value in filters.items() if value not in (None, '')
+        ))
+        return self._facets_cache.get_or_set(
+            key, lambda: self._compute_facets(filters), ttl=current_app.config['FACETS_CACHE_TTL']
+        )
+
+    def _compute_facets(self, filters: Dict[str, Any]) -> Dict[str, Any]:
+        price_bucket = self._bucket(Product.price, self.PRICE_BUCKETS).label('price_bucket')
+        rating_bucket = self._bucket(Product.rating, self.RATING_BUCKETS).label('rating_bucket')
+        rows = self.build_query(filters).with_entities(
+            Product.category, Product.type, price_bucket, rating_bucket, db.func.count(Product.id)
+        ).group_by(Product.category, Product.type, price_bucket, rating_bucket)
+
+        categories: Dict[str, int] = {}
+        types: Dict[str, int] = {}
+        prices = [0] * len(self.PRICE_BUCKETS)
+        ratings = [0] * len(self.RATING_BUCKETS)
+        total = 0
+        for category, product_type, price_index, rating_index, count in rows:
+            total += count
+            categories[category] = categories.get(category, 0) + count
+            types[product_type] = types.get(product_type, 0) + count
+            prices[price_index] += count
+            ratings[rating_index] += count
+
+        return {
+            'total': total,
+            'categories': [{'value': value, 'count': count}
+                           for value, count in sorted(categories.items(), key=lambda item: -item[1])],
+            'types': [{'value': value, 'count': count}
+                      for value, count in sorted(types.items(), key=lambda item: -item[1])],
+            'price_ranges': self._bucket_counts(self.PRICE_BUCKETS, prices, None),
+            'ratings': self._bucket_counts(self.RATING_BUCKETS, ratings, 5)
+        }
+
+    @staticmethod
+    def _bucket(column, bounds):
+        """SQL expression mapping ``column`` to the index of its bucket"""
+        return db.case(
+            *[(column >= bound, index) for index, bound in reversed(list(enumerate(bounds))) if index],
+            else_=0
+        )
+
+    @staticmethod
+    def _bucket_counts(bounds, counts, upper):
+        return [{
+            'min': bound,
+            'max': bounds[index + 1] if index + 1 < len(bounds) else upper,
+            'count': counts[index]
+        } for index, bound in enumerate(bounds)]
+
+    def get_product_version(self, product_id: str) -> Optional[Tuple[str, datetime]]:
+        """ETag and Last-Modified of a product, read from the version columns only"""
+        row = db.session.query(Product.updated_at, Seller.updated_at) \
+            .outerjoin(Seller, Seller.id == Product.seller_id) \
+            .filter(Product.id == product_id).first()
+        if not row:
+            return None
+        timestamps = [value for value in row if value is not None]
+        return make_etag('product', product_id, *row), max(timestamps) if timestamps else None
+
+    def get_product_detail_version(self, product_id: str) -> Optional[Tuple[str, datetime]]:
+        """
+        ETag and Last-Modified of a product detail page: its listing row
+        (refreshed on product, image, review and sales changes), its seller
+        and the listings of its category (the related products).
+        """
+        related = aliased(ProductListing)
+        same_category = related.category == ProductListing.category
+        row = db.session.query(
+            ProductListing.updated_at, Seller.updated_at,
+            db.session.query(db.func.max(related.updated_at)).filter(same_category).scalar_subquery(),
+            db.session.query(db.func.count(related.id)).filter(same_category).scalar_subquery()
+        ).outerjoin(Seller, Seller.id == ProductListing.seller_id) \
+            .filter(ProductListing.id == product_id).first()
+        if not row:
+            return None
+        timestamps = [value for value in row[:3] if value is not None]
+        return make_etag('product-detail', product_id, *row), max(timestamps) if timestamps else None
+
+    def get_product_detail(self, product_id: str, related_limit: int = 4) -> Optional[Dict[str, Any]]:
+        """
+        Everything a product page shows, in four queries: the product's
+        listing row with its seller, the seller's product count, the review
+        histogram and the best rated products of the same category.
+        """
+        row = db.session.query(ProductListing, Seller) \
+            .outerjoin(Seller, Seller.id == ProductListing.seller_id) \
+            .filter(ProductListing.id == product_id).first()
+        if not row:
+            return None
+        listing, seller = row
+
+        histogram = {rating: 0 for rating in range(1, 6)}
+        for rating, count in db.session.query(Review.rating, db.func.count(Review.id)) \
+                .filter(Review.product_id == product_id).group_by(Review.rating):
+            histogram[rating] = count
+        total = sum(histogram.values())
+        average = sum(rating * count for rating, count in histogram.items()) / total if total else 0
+
+        related = []
+        if related_limit:
+            related = ProductListing.query \
+                .filter(ProductListing.category == listing.category, ProductListing.id != product_id) \
+                .order_by(ProductListing.rating.desc(), ProductListing.id.desc()) \
+                .limit(related_limit).all()
+
+        return {
+            'product': listing,
+            'seller': seller,
+            'seller_product_count': seller.total_products if seller is not None else 0,
+            'reviews': {'count': total, 'average': round(average, 2), 'histogram': histogram},
+            'related': related
+        }
+
     def get_product_by_id(self, product_id: str) -> Dict[str, Any]:
         product = Product.query.get(product_id)
         if not product:
             return None
         return self._format_product(product)
         
-    def create_product(self, seller_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    def create_product(self, user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         # Validasi input
         if data['price'] <= 0 or data['stock'] < 0:
             raise ValueError("Price must be positive and stock cannot be negative")
 
+        seller = self._get_seller(user_id)
+
         # Buat produk baru
         product = Product(
             id=str(uuid.uuid4()),
-            seller_id=seller_id,
+            seller_id=seller.id,
             name=data['name'],
             description=data['description'],
             price=data['price'],
@@ -66,9 +293,206 @@ class ProductService:
         db.session.commit()
 
         return self._format_product(product)
+
+    def update_product(self, user_id: str, product_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        product = self.get_seller_product(user_id, product_id)
+
+        if 'price' in data and data['price'] <= 0:
+            raise ValueError("Price must be positive")
+        if 'stock' in data and data['stock'] < 0:
+            raise ValueError("Stock cannot be negative")
+
+        for field in ['name', 'description', 'price', 'stock', 'category', 'type']:
+            if field in data:
+                setattr(product, field, data[field])
+
+        # Ganti semua gambar jika daftar gambar baru dikirim
+        if 'images' in data:
+            product.updated_at = datetime.utcnow()
+            ProductImage.query.filter_by(product_id=product.id).delete()
+            for index, image_url in enumerate(data['images']):
+                db.session.add(ProductImage(
+                    id=str(uuid.uuid4()),
+                    product_id=product.id,
+                    image_url=image_url,
+                    is_primary=index == 0
+                ))
+
+        db.session.commit()
+        return self._format_product(product)
+
+    def delete_product(self, user_id: str, product_id: str) -> None:
+        """Delete one of the seller's products with its images; products that were ordered are kept"""
+        product = self.get_seller_product(user_id, product_id)
+        if db.session.query(OrderItem.id).filter_by(product_id=product.id).first() is not None:
+            raise ValueError('Products that have been ordered cannot be deleted; set their stock to 0 instead')
+        for image in ProductImage.query.filter_by(product_id=product.id):
+            db.session.delete(image)
+        db.session.delete(product)
+        db.session.commit()
+
+    def add_product_image(self, user_id: str, product_id: str, image_url: str,
+                          primary: bool = False) -> Dict[str, Any]:
+        """Append an image to one of the seller's products; the first image becomes primary"""
+        product = self.get_seller_product(user_id, product_id)
+        images = ProductImage.query.filter_by(product_id=product.id).all()
+        if primary:
+            for image in images:
+                image.is_primary = False
+        product.updated_at = datetime.utcnow()
+        db.session.add(ProductImage(
+            id=str(uuid.uuid4()),
+            product_id=product.id,
+            image_url=image_url,
+            is_primary=primary or not images
+        ))
+        db.session.commit()
+        return self._format_product(product)
+
+    def get_seller_product(self, user_id: str, product_id: str) -> Product:
+        """The product if it belongs to the user's store"""
+        seller = self._get_seller(user_id)
+        product = Product.query.get(product_id)
+        if not product or product.seller_id != seller.id:
+            raise ValueError('Product not found')
+        return product
+
+    def bulk_upsert_products(self, user_id: str, rows: List[Dict[str, Any]],
+                             batch_size: int = 500) -> Dict[str, Any]:
+        """
+        Create or update many products of a seller in one transaction. Rows
+        with an ``id`` update that product (only the fields given, images
+        replaced when given); rows without one create a product. Every row is
+        validated before anything is written; if one is invalid nothing is
+        written and ``BulkValidationError`` carries the per-row errors.
+        Writes are batched executemany statements of ``batch_size`` rows.
+        """
+        seller = self._get_seller(user_id)
+        existing = self._load_existing_products(
+            [row['id'] for row in rows if isinstance(row, dict) and row.get('id')], batch_size
+        )
+
+        results, inserts, updates, seen = [], [], [], set()
+        for index, row in enumerate(rows):
+            product_id = row.get('id') if isinstance(row, dict) else None
+            current = existing.get(product_id) if product_id else None
+            check = validate_product(row, partial=bool(product_id))
+            errors = check['errors']
+            if product_id:
+                if current is None or current['seller_id'] != seller.id:
+                    errors.append('Product not found')
+                elif product_id in seen:
+                    errors.append('Duplicate product id')
+                seen.add(product_id)
+            results.append({'row': index, 'id': product_id, 'errors': errors})
+            if not errors:
+                (updates if product_id else inserts).append((index, product_id, check['values']))
+
+        if any(result['errors'] for result in results):
+            raise BulkValidationError('Some rows are invalid; nothing was imported', [
+                {'row': r['row'], 'id': r['id'], 'status': 'invalid' if r['errors'] else 'valid',
+                 **({'errors': r['errors']} if r['errors'] else {})}
+                for r in results
+            ])
+
+        try:
+            images = []
+            for index, _, values in inserts:
+                product_id = str(uuid.uuid4())
+                results[index]['id'] = product_id
+                images.extend(self._image_rows(product_id, values.pop('images', [])))
+                values.update(id=product_id, seller_id=seller.id)
+            replaced = [product_id for _, product_id, values in updates if 'images' in values]
+            for _, product_id, values in updates:
+                images.extend(self._image_rows(product_id, values.pop('images', [])))
+
+            self._insert_products([values for _, _, values in inserts], batch_size)
+            self._update_products([(product_id, values) for _, product_id, values in updates],
+                                  existing, batch_size)
+            self._replace_images(replaced, images, batch_size)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        created = {index for index, _, _ in inserts}
+        return {
+            'created': len(inserts),
+            'updated': len(updates),
+            'results': [{'row': r['row'], 'id': r['id'],
+                         'status': 'created' if r['row'] in created else 'updated'}
+                        for r in results]
+        }
+
+    def _load_existing_products(self, product_ids: List[str], batch_size: int) -> Dict[str, Dict[str, Any]]:
+        """Current column values of the products a bulk upload updates, by id"""
+        existing = {}
+        table = Product.__table__
+        ids = sorted({product_id for product_id in product_ids if isinstance(product_id, str)})
+        for start in range(0, len(ids), batch_size):
+            chunk = ids[start:start + batch_size]
+            for row in db.session.execute(table.select().where(table.c.id.in_(chunk))).mappings():
+                existing[row['id']] = dict(row)
+        return existing
+
+    @staticmethod
+    def _image_rows(product_id: str, image_urls: List[str]) -> List[Dict[str, Any]]:
+        return [{'id': str(uuid.uuid4()), 'product_id': product_id, 'image_url': url,
+                 'is_primary': index == 0}
+                for index, url in enumerate(image_urls)]
+
+    def _insert_products(self, rows: List[Dict[str, Any]], batch_size: int) -> None:
+        table = Product.__table__
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(table.insert(), rows[start:start + batch_size])
+        for values in rows:
+            record_change(db.session, Product, 'insert', values['id'], values)
+
+    def _update_products(self, rows: List[Tuple[str, Dict[str, Any]]],
+                         existing: Dict[str, Dict[str, Any]], batch_size: int) -> None:
+        table = Product.__table__
+        # executemany needs the same columns in every parameter set
+        by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        for product_id, values in rows:
+            params = dict(values, product_id=product_id)
+            by_columns.setdefault(tuple(sorted(values)), []).append(params)
+        for columns, params in by_columns.items():
+            statement = table.update().where(table.c.id == db.bindparam('product_id')) \
+                .values({column: db.bindparam(column) for column in columns}
+                        if columns else {'updated_at': datetime.utcnow()})
+            for start in range(0, len(params), batch_size):
+                db.session.execute(statement, params[start:start + batch_size])
+
+        for product_id, values in rows:
+            current = existing[product_id]
+            previous = {key: current[key] for key, value in values.items() if current[key] != value}
+            record_change(db.session, Product, 'update', product_id,
+                          dict(current, **values), previous or {'updated_at': current['updated_at']})
+
+    def _replace_images(self, product_ids: List[str], rows: List[Dict[str, Any]], batch_size: int) -> None:
+        table = ProductImage.__table__
+        for start in range(0, len(product_ids), batch_size):
+            chunk = product_ids[start:start + batch_size]
+            db.session.execute(table.delete().where(table.c.product_id.in_(chunk)))
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(table.insert(), rows[start:start + batch_size])
+        for product_id in product_ids:
+            record_change(db.session, ProductImage, 'delete', None, {'product_id': product_id})
+        for values in rows:
+            record_change(db.session, ProductImage, 'insert', values['id'], values)
+
+    def _get_seller(self, user_id: str) -> Seller:
+        seller = Seller.query.filter_by(user_id=user_id).first()
+        if not seller:
+            raise ValueError('Seller profile not found')
+        return seller
         
     def _format_product(self, product: Product) -> Dict[str, Any]:
-        return {
+        return self._format_products([product])[0]
+
+    def _format_products(self, products: List[Product]) -> List[Dict[str, Any]]:
+        images = load_images(p.id for p in products)
+        return [{
             'id': product.id,
             'name': product.name,
             'description': product.description,
@@ -77,7 +501,7 @@ class ProductService:
             'category': product.category,
             'type': product.type,
             'rating': float(product.rating),
-            'images': [img.image_url for img in product.images],
+            'images': images.get(product.id, []),
             'seller_id': product.seller_id,
             'created_at': product.created_at.isoformat()
-        }
\ No newline at end of file
+        } for product in products]
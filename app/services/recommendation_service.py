@@ -0,0 +1,156 @@
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import json
+import os
+from datetime import datetime
+from flask import current_app
+from ..models.order import Order, OrderItem
+from ..models.recommendation import ProductRecommendation
+from .. import db
+
+
+class RecommendationService:
+    """
+    "Frequently bought together" recommendations.
+
+    ``build`` is an offline job: it counts how often every pair of products
+    appears in the same (non-cancelled) order, as a sparse co-occurrence
+    matrix ``C = Bᵀ·B`` where ``B`` is the binary order × product matrix,
+    and stores the top-K neighbours of each product ranked by
+    ``C[i, j] / C[i, i]``: the share of the orders containing the product
+    that also contain the neighbour. Counts are kept in a state file with
+    a watermark, so later runs only add the orders placed since; a row's
+    scores only depend on its own counts, so updating the rows of the
+    products in new orders is exact. Cancellations after an order was
+    counted are only taken into account by a ``full`` rebuild.
+    """
+
+    def get_related(self, product_id: str) -> Optional[ProductRecommendation]:
+        """The stored neighbours of a product (a primary key lookup)"""
+        return db.session.get(ProductRecommendation, product_id)
+
+    def build(self, full: bool = False, chunk_size: int = 5000) -> Dict[str, int]:
+        """Fold new orders into the co-occurrence counts and refresh the affected neighbour lists"""
+        import numpy as np
+        from scipy import sparse
+
+        path = current_app.config['RECOMMENDATIONS_STATE_PATH']
+        state = None if full else self._load_state(path)
+        if state is None:
+            matrix, product_ids, watermark = sparse.csr_matrix((0, 0), dtype=np.int64), [], None
+        else:
+            matrix, product_ids, watermark = state
+        columns = {product_id: index for index, product_id in enumerate(product_ids)}
+
+        touched = set()
+        order_count = 0
+        for orders, items in self._iter_new_orders(watermark, chunk_size):
+            watermark = [orders[-1].created_at.isoformat(), orders[-1].id]
+            order_count += len(orders)
+            if not items:
+                continue
+
+            rows = {order.id: index for index, order in enumerate(orders)}
+            for product_id in {product_id for _, product_id in items}:
+                if product_id not in columns:
+                    columns[product_id] = len(product_ids)
+                    product_ids.append(product_id)
+
+            order_index = np.fromiter((rows[order_id] for order_id, _ in items), dtype=np.int64, count=len(items))
+            product_index = np.fromiter((columns[product_id] for _, product_id in items),
+                                        dtype=np.int64, count=len(items))
+            baskets = sparse.csr_matrix((np.ones(len(items), dtype=np.int64), (order_index, product_index)),
+                                        shape=(len(orders), len(product_ids)))
+            # A product listed twice in one order counts once
+            baskets.data[:] = 1
+
+            matrix.resize((len(product_ids), len(product_ids)))
+            matrix = (matrix + baskets.T @ baskets).tocsr()
+            touched.update(np.unique(product_index).tolist())
+
+        self._store_neighbours(matrix, product_ids, sorted(touched), full)
+        db.session.commit()
+        if watermark is not None:
+            self._save_state(path, matrix, product_ids, watermark)
+        elif full and os.path.exists(path):
+            os.remove(path)
+        return {'orders': order_count, 'products': len(touched)}
+
+    def _iter_new_orders(self, watermark: Optional[List[Any]], chunk_size: int) -> Iterator[Tuple[list, list]]:
+        """Yield ``(orders, [(order_id, product_id), ...])`` for the orders after ``watermark``, oldest first"""
+        last = None
+        if watermark is not None:
+            last = (datetime.fromisoformat(watermark[0]), watermark[1])
+        while True:
+            query = db.session.query(Order.id, Order.created_at).filter(Order.status != 'cancelled')
+            if last is not None:
+                query = query.filter(db.or_(Order.created_at > last[0],
+                                            db.and_(Order.created_at == last[0], Order.id > last[1])))
+            orders = query.order_by(Order.created_at, Order.id).limit(chunk_size).all()
+            if not orders:
+                return
+            items = db.session.query(OrderItem.order_id, OrderItem.product_id) \
+                .filter(OrderItem.order_id.in_([order.id for order in orders])).all()
+            yield orders, [(item.order_id, item.product_id) for item in items]
+            if len(orders) < chunk_size:
+                return
+            last = (orders[-1].created_at, orders[-1].id)
+
+    def _store_neighbours(self, matrix, product_ids: List[str], rows: List[int], full: bool) -> None:
+        import numpy as np
+
+        top_k = current_app.config['RECOMMENDATIONS_TOP_K']
+        table = ProductRecommendation.__table__
+        if full:
+            db.session.execute(table.delete())
+
+        counts = matrix.diagonal()
+        now = datetime.utcnow()
+        for start in range(0, len(rows), 500):
+            values = []
+            for row in rows[start:start + 500]:
+                begin, end = matrix.indptr[row], matrix.indptr[row + 1]
+                neighbours, together = matrix.indices[begin:end], matrix.data[begin:end]
+                keep = neighbours != row
+                neighbours, together = neighbours[keep], together[keep]
+                if len(neighbours) > top_k:
+                    best = np.argpartition(-together, top_k - 1)[:top_k]
+                    neighbours, together = neighbours[best], together[best]
+                order = np.lexsort((neighbours, -together))
+                scores = together[order] / counts[row]
+                values.append({
+                    'product_id': product_ids[row],
+                    'neighbours': [[product_ids[j], round(float(score), 4)]
+                                   for j, score in zip(neighbours[order], scores)],
+                    'updated_at': now
+                })
+            ids = [value['product_id'] for value in values]
+            db.session.execute(table.delete().where(table.c.product_id.in_(ids)))
+            if values:
+                db.session.execute(table.insert(), values)
+
+    @staticmethod
+    def _load_state(path: str):
+        import numpy as np
+        from scipy import sparse
+
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as state:
+            size = len(state['product_ids'])
+            matrix = sparse.csr_matrix((state['data'], state['indices'], state['indptr']), shape=(size, size))
+            return matrix, state['product_ids'].tolist(), json.loads(str(state['watermark']))
+
+    @staticmethod
+    def _save_state(path: str, matrix, product_ids: List[str], watermark: List[Any]) -> None:
+        import numpy as np
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + '.tmp.npz'
+        np.savez_compressed(temporary, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                            product_ids=np.array(product_ids, dtype=str),
+                            watermark=np.array(json.dumps(watermark)))
+        # Replace atomically so a crash never leaves a half-written state
+        os.replace(temporary, path)
+
+
+recommendation_service = RecommendationService()
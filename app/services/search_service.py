@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional, Tuple
+import threading
+from flask import current_app
+from ..models.product import Product
+from ..models.seller import Seller
+from ..utils.change_tracking import subscribe
+from ..utils.text_index import InvertedIndex, tokenize
+from .. import db
+
+# Indexed text of each searchable model as (column, weight) pairs
+SEARCH_FIELDS = {
+    Product: (('name', 3), ('category', 1), ('description', 1)),
+    Seller: (('store_name', 3), ('category', 1), ('location', 1), ('description', 1)),
+}
+
+
+class SearchService:
+    """
+    Ranked full-text search over products and sellers.
+
+    On MySQL the FULLTEXT indexes ``ft_products_search`` and
+    ``ft_sellers_search`` are queried in boolean mode. Other databases (local
+    SQLite, tests) use an in-process BM25 inverted index, built lazily on the
+    first search and kept current from committed product/seller changes.
+    """
+
+    def __init__(self):
+        self._indexes = {model: InvertedIndex() for model in SEARCH_FIELDS}
+        self._built = set()
+        self._build_lock = threading.Lock()
+        subscribe(self._apply_changes, *SEARCH_FIELDS)
+
+    def search_products(self, text: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Return ``(product_id, score)`` pairs, best match first"""
+        return self._search(Product, text, limit)
+
+    def search_sellers(self, text: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """Return ``(seller_id, score)`` pairs, best match first"""
+        return self._search(Seller, text, limit)
+
+    def match_products(self, text: str, model=Product):
+        """
+        A filter criterion on ``model.id`` (``Product`` or a model sharing
+        its ids, such as ``ProductListing``) for every product matching
+        ``text``, uncapped, for non-relevance sorts
+        """
+        return self._match_filter(Product, text, model.id)
+
+    def rebuild(self, model=None) -> None:
+        """Drop and rebuild the in-process index of ``model`` (all models by default)"""
+        for indexed_model in ([model] if model else SEARCH_FIELDS):
+            with self._build_lock:
+                self._built.discard(indexed_model)
+            self._ensure_built(indexed_model)
+
+    def _search(self, model, text: str, limit: Optional[int]) -> List[Tuple[str, float]]:
+        limit = limit or current_app.config['SEARCH_MAX_RESULTS']
+        if self._use_fulltext():
+            return self._fulltext_search(model, text, limit)
+        self._ensure_built(model)
+        return self._indexes[model].search(text, limit)
+
+    def _match_filter(self, model, text: str, id_column):
+        if self._use_fulltext():
+            tokens = tokenize(text)
+            if not tokens:
+                return db.false()
+            matches = self._fulltext_score(model, tokens) > 0
+            if id_column is model.id:
+                return matches
+            # The FULLTEXT index lives on the indexed table; other tables filter on its matching ids
+            return id_column.in_(db.select(model.id).where(matches))
+        self._ensure_built(model)
+        return id_column.in_([doc_id for doc_id, _ in self._indexes[model].search(text)])
+
+    def _use_fulltext(self) -> bool:
+        backend = current_app.config['SEARCH_BACKEND']
+        if backend == 'auto':
+            return db.engine.dialect.name == 'mysql'
+        return backend == 'mysql'
+
+    def _fulltext_search(self, model, text: str, limit: int) -> List[Tuple[str, float]]:
+        tokens = tokenize(text)
+        if not tokens:
+            return []
+        score = self._fulltext_score(model, tokens)
+        rows = db.session.query(model.id, score).filter(score > 0) \
+            .order_by(score.desc(), model.id.desc()).limit(limit)
+        return [(doc_id, float(doc_score)) for doc_id, doc_score in rows]
+
+    @staticmethod
+    def _fulltext_score(model, tokens: List[str]):
+        from sqlalchemy.dialects.mysql import match
+
+        # Boolean mode so the last, possibly half-typed, word matches as a prefix
+        against = ' '.join(tokens[:-1] + [tokens[-1] + '*'])
+        columns = [getattr(model, name) for name, _ in SEARCH_FIELDS[model]]
+        return match(*columns, against=against).in_boolean_mode()
+
+    def _ensure_built(self, model) -> None:
+        if model in self._built:
+            return
+        with self._build_lock:
+            if model in self._built:
+                return
+            index = self._indexes[model]
+            index.clear()
+            names = [name for name, _ in SEARCH_FIELDS[model]]
+            columns = [getattr(model, name) for name in names]
+            for row in db.session.query(model.id, *columns).yield_per(1000):
+                index.add(row[0], self._fields(model, dict(zip(names, row[1:]))))
+            self._built.add(model)
+
+    def _apply_changes(self, changes) -> None:
+        for change in changes:
+            if change.model not in self._built:
+                continue
+            index = self._indexes[change.model]
+            names = [name for name, _ in SEARCH_FIELDS[change.model]]
+            if change.action == 'delete':
+                index.remove(change.id)
+            elif not change.touches(*names):
+                continue
+            elif all(name in change.values for name in names):
+                index.add(change.id, self._fields(change.model, change.values))
+            else:
+                # Partially loaded row: rebuild on the next search
+                with self._build_lock:
+                    self._built.discard(change.model)
+
+    @staticmethod
+    def _fields(model, values: Dict[str, Optional[str]]):
+        return [(values.get(name), weight) for name, weight in SEARCH_FIELDS[model]]
+
+
+search_service = SearchService()
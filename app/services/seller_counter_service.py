@@ -0,0 +1,96 @@
+from typing import Dict, List
+from datetime import datetime
+from ..models.product import Product
+from ..models.seller import Seller
+from ..utils.change_tracking import record_change, subscribe_in_transaction
+from .. import db
+
+
+class SellerCounterService:
+    """
+    Maintains the ``total_products`` and ``in_stock_products`` counters of
+    sellers.
+
+    Product inserts, deletes and updates of ``seller_id`` or ``stock`` are
+    turned into per-seller deltas and applied inside the same transaction
+    as relative ``UPDATE`` statements, in seller id order, so concurrent
+    writers neither lose increments nor deadlock. ``reconcile`` recounts
+    from the products table to repair drift from writes made outside the
+    application.
+    """
+
+    def __init__(self):
+        subscribe_in_transaction(self._apply_changes, Product)
+
+    def reconcile(self, batch_size: int = 500) -> Dict[str, int]:
+        """Recount the products of every seller batch by batch, fixing the counters that drifted"""
+        checked, fixed, last_id = 0, 0, None
+        while True:
+            query = db.session.query(Seller.id, Seller.total_products, Seller.in_stock_products)
+            if last_id is not None:
+                query = query.filter(Seller.id > last_id)
+            sellers = query.order_by(Seller.id).limit(batch_size).all()
+            if not sellers:
+                break
+
+            ids = [seller.id for seller in sellers]
+            counts = {row.seller_id: row for row in db.session.query(
+                Product.seller_id,
+                db.func.count(Product.id).label('total'),
+                db.func.coalesce(db.func.sum(db.case((Product.stock > 0, 1), else_=0)), 0).label('in_stock')
+            ).filter(Product.seller_id.in_(ids)).group_by(Product.seller_id)}
+
+            for seller in sellers:
+                row = counts.get(seller.id)
+                total, in_stock = (row.total, int(row.in_stock)) if row else (0, 0)
+                if (seller.total_products, seller.in_stock_products) != (total, in_stock):
+                    self._set(seller.id, total, in_stock)
+                    fixed += 1
+            db.session.commit()
+            checked += len(sellers)
+            last_id = ids[-1]
+        return {'sellers': checked, 'fixed': fixed}
+
+    def _apply_changes(self, session, changes) -> None:
+        # seller id -> [total delta, in stock delta]
+        deltas: Dict[str, List[int]] = {}
+
+        def add(seller_id, stock, sign):
+            if seller_id:
+                delta = deltas.setdefault(seller_id, [0, 0])
+                delta[0] += sign
+                delta[1] += sign if (stock or 0) > 0 else 0
+
+        for change in changes:
+            if not change.touches('seller_id', 'stock'):
+                continue
+            if change.action != 'insert':
+                old = change.values if change.action == 'delete' else dict(change.values, **change.previous)
+                add(old.get('seller_id'), old.get('stock'), -1)
+            if change.action != 'delete':
+                add(change.values.get('seller_id'), change.values.get('stock'), 1)
+
+        table = Seller.__table__
+        now = datetime.utcnow()
+        for seller_id in sorted(deltas):
+            total, in_stock = deltas[seller_id]
+            if not total and not in_stock:
+                continue
+            session.execute(table.update().where(table.c.id == seller_id).values(
+                total_products=table.c.total_products + total,
+                in_stock_products=table.c.in_stock_products + in_stock,
+                updated_at=now
+            ))
+            record_change(session, Seller, 'update', seller_id, {'id': seller_id},
+                          {'total_products': None, 'in_stock_products': None})
+
+    def _set(self, seller_id: str, total: int, in_stock: int) -> None:
+        table = Seller.__table__
+        db.session.execute(table.update().where(table.c.id == seller_id).values(
+            total_products=total, in_stock_products=in_stock, updated_at=datetime.utcnow()
+        ))
+        record_change(db.session, Seller, 'update', seller_id, {'id': seller_id},
+                      {'total_products': None, 'in_stock_products': None})
+
+
+seller_counter_service = SellerCounterService()
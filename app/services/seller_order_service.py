@@ -0,0 +1,125 @@
+from typing import Any, Dict, List, Optional, Tuple
+from decimal import Decimal
+from ..models.order import Order, OrderItem, SellerOrder
+from ..models.product import Product
+from ..utils.change_tracking import subscribe_in_transaction
+from ..utils.upsert import increment_rows
+from .. import db
+
+OPEN_STATUSES = ('pending', 'processing', 'shipped')
+
+
+def is_open(status: Optional[str]) -> bool:
+    return status is None or status in OPEN_STATUSES
+
+
+class SellerOrderService:
+    """
+    Maintains the seller dimension of orders: ``order_items.seller_id`` and
+    the ``seller_orders`` link table.
+
+    Inside the transaction that writes order items, items written without
+    a seller get the seller of their product, and each seller's row for
+    the order is upserted with relative item count and subtotal deltas.
+    Order status changes are copied to the link rows.
+    """
+
+    def __init__(self):
+        subscribe_in_transaction(self._apply_changes, Order, OrderItem)
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """Recompute every link row from the order items, batch of orders by batch; returns the order count"""
+        db.session.execute(SellerOrder.__table__.delete())
+        db.session.commit()
+        count, last_id = 0, None
+        while True:
+            query = db.session.query(Order.id)
+            if last_id is not None:
+                query = query.filter(Order.id > last_id)
+            ids = [row[0] for row in query.order_by(Order.id).limit(batch_size)]
+            if not ids:
+                return count
+            self._fill_sellers(db.session, db.session.query(OrderItem.id, OrderItem.product_id).filter(
+                OrderItem.order_id.in_(ids), OrderItem.seller_id.is_(None)).all())
+            items = db.session.query(OrderItem.order_id, OrderItem.seller_id, OrderItem.quantity,
+                                     OrderItem.price_at_time).filter(OrderItem.order_id.in_(ids)).all()
+            self._add(db.session, items, 1)
+            db.session.commit()
+            count += len(ids)
+            last_id = ids[-1]
+
+    def _apply_changes(self, session, changes) -> None:
+        inserted, deleted, statuses = [], [], {}
+        for change in changes:
+            if change.model is Order:
+                if change.action == 'update' and change.touches('status'):
+                    statuses[change.id] = change.values.get('status')
+            elif change.action == 'insert':
+                inserted.append(change.values)
+            elif change.action == 'delete':
+                deleted.append(change.values)
+
+        missing = [(values['id'], values.get('product_id')) for values in inserted if not values.get('seller_id')]
+        sellers = self._fill_sellers(session, missing)
+        items = [_Item(values, sellers) for values in inserted]
+        self._add(session, items, 1)
+        removed = [_Item(values, {}) for values in deleted]
+        self._add(session, removed, -1)
+        if removed:
+            table = SellerOrder.__table__
+            session.execute(table.delete().where(
+                table.c.order_id.in_({item.order_id for item in removed}), table.c.item_count <= 0
+            ))
+
+        table = SellerOrder.__table__
+        for order_id, status in sorted(statuses.items()):
+            session.execute(table.update().where(table.c.order_id == order_id)
+                            .values(status=status, is_open=is_open(status)))
+
+    @staticmethod
+    def _fill_sellers(session, items: List[Tuple[str, str]]) -> Dict[str, str]:
+        """Set the seller of items written without one; returns item id -> seller id"""
+        if not items:
+            return {}
+        products = dict(session.query(Product.id, Product.seller_id)
+                        .filter(Product.id.in_({product_id for _, product_id in items})))
+        sellers = {item_id: products[product_id] for item_id, product_id in items if products.get(product_id)}
+        table = OrderItem.__table__
+        for item_id, seller_id in sorted(sellers.items()):
+            session.execute(table.update().where(table.c.id == item_id).values(seller_id=seller_id))
+        return sellers
+
+    @staticmethod
+    def _add(session, items, sign: int) -> None:
+        totals: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for item in items:
+            if item.seller_id and item.order_id:
+                total = totals.setdefault((item.seller_id, item.order_id), {'count': 0, 'subtotal': Decimal(0)})
+                total['count'] += 1
+                total['subtotal'] += Decimal(str(item.price_at_time)) * item.quantity
+        if not totals:
+            return
+        orders = {row.id: row for row in session.query(Order.id, Order.status, Order.created_at)
+                  .filter(Order.id.in_({order_id for _, order_id in totals}))}
+        increment_rows(session, SellerOrder, ('seller_id', 'order_id'), ('item_count', 'subtotal'), [
+            {'seller_id': seller_id, 'order_id': order_id,
+             'status': orders[order_id].status, 'is_open': is_open(orders[order_id].status),
+             'created_at': orders[order_id].created_at,
+             'item_count': sign * total['count'], 'subtotal': sign * total['subtotal']}
+            for (seller_id, order_id), total in totals.items() if order_id in orders
+        ])
+
+
+class _Item:
+    """The columns of a tracked order item change that the link rows need"""
+
+    __slots__ = ('order_id', 'seller_id', 'quantity', 'price_at_time')
+
+    def __init__(self, values: Dict[str, Any], sellers: Dict[str, str]):
+        self.order_id = values.get('order_id')
+        self.seller_id = values.get('seller_id') or sellers.get(values.get('id'))
+        self.quantity = values.get('quantity') or 0
+        self.price_at_time = values.get('price_at_time') or 0
+
+
+seller_order_service = SellerOrderService()
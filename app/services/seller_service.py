@@ -1,12 +1,39 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime
 import uuid
+from sqlalchemy.orm import load_only
 from ..models.seller import Seller
 from ..models.product import Product
+from ..utils.http_cache import make_etag
+from ..utils.pagination import iter_batches, iter_ranked_batches
+from ..utils.serializers import (DEFAULT_SELLER_FIELDS, load_images, seller_columns,
+                                 serialize_sellers)
+from .search_service import search_service
 from .. import db
 
 class SellerService:
-    def get_sellers(self, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
-        query = Seller.query
+    def get_sellers(self, filters: Dict[str, Any],
+                    fields: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        query, ranking = self._build_query(filters, fields)
+        sellers = query.all()
+        if ranking is not None:
+            # Keep the search engine's relevance order
+            positions = {seller_id: position for position, (seller_id, _) in enumerate(ranking)}
+            sellers.sort(key=lambda s: positions[s.id])
+        return self._format_sellers(sellers, fields)
+
+    def iter_sellers(self, filters: Dict[str, Any], batch_size: int = 500,
+                     fields: Optional[Tuple[str, ...]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield every filtered seller, formatted, loading them in batches"""
+        query, ranking = self._build_query(filters, fields)
+        if ranking is not None:
+            batches = iter_ranked_batches(query, Seller.id, ranking, batch_size)
+        else:
+            batches = iter_batches(query, [(Seller.id, False)], batch_size)
+        return (seller for batch in batches for seller in self._format_sellers(batch, fields))
+
+    def _build_query(self, filters: Dict[str, Any], fields: Optional[Tuple[str, ...]] = None):
+        query = self._project(Seller.query, fields)
         
         if filters.get('category'):
             query = query.filter(Seller.category == filters['category'])
@@ -14,26 +41,40 @@ class SellerService:
             query = query.filter(Seller.province == filters['province'])
         if filters.get('min_rating'):
             query = query.filter(Seller.rating >= float(filters['min_rating']))
+        ranking = None
         if filters.get('search'):
-            search = f"%{filters['search']}%"
-            query = query.filter(
-                db.or_(
-                    Seller.store_name.ilike(search),
-                    Seller.description.ilike(search)
-                )
-            )
-            
-        sellers = query.all()
-        return [self._format_seller(s) for s in sellers]
+            ranking = search_service.search_sellers(filters['search'])
+            query = query.filter(Seller.id.in_([seller_id for seller_id, _ in ranking]))
+        return query, ranking
+        
+    def get_top_sellers(self, province: Optional[str] = None, limit: int = 3) -> List[Dict[str, Any]]:
+        query = Seller.query
+        if province:
+            query = query.filter(Seller.province == province)
+        sellers = query.order_by(Seller.rating.desc(), Seller.id.desc()).limit(limit).all()
+        return self._format_sellers(sellers)
+        
+    def get_provinces(self) -> List[str]:
+        """The distinct provinces of sellers (read from the province index)"""
+        return [row[0] for row in db.session.query(Seller.province).filter(Seller.province.isnot(None)).distinct()]
+
+    def get_seller_version(self, seller_id: str) -> Optional[Tuple[str, datetime]]:
+        """ETag and Last-Modified of a seller: its version column (bumped by product counter changes too)"""
+        row = db.session.query(Seller.updated_at).filter(Seller.id == seller_id).first()
+        if not row:
+            return None
+        return make_etag('seller', seller_id, row[0]), row[0]
         
-    def get_seller_by_id(self, seller_id: str) -> Dict[str, Any]:
-        seller = Seller.query.get(seller_id)
+    def get_seller_by_id(self, seller_id: str,
+                         fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        seller = self._project(Seller.query, fields).get(seller_id)
         if not seller:
             return None
-        return self._format_seller(seller)
+        return self._format_seller(seller, fields)
         
     def get_seller_products(self, seller_id: str) -> List[Dict[str, Any]]:
         products = Product.query.filter_by(seller_id=seller_id).all()
+        images = load_images(p.id for p in products)
         return [{
             'id': p.id,
             'name': p.name,
@@ -43,7 +84,7 @@ class SellerService:
             'category': p.category,
             'type': p.type,
             'rating': float(p.rating),
-            'images': [img.image_url for img in p.images]
+            'images': images.get(p.id, [])
         } for p in products]
         
     def update_seller_profile(self, user_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
@@ -63,17 +104,15 @@ class SellerService:
         db.session.commit()
         return self._format_seller(seller)
         
-    def _format_seller(self, seller: Seller) -> Dict[str, Any]:
-        return {
-            'id': seller.id,
-            'user_id': seller.user_id,
-            'store_name': seller.store_name,
-            'description': seller.description,
-            'image_url': seller.image_url,
-            'location': seller.location,
-            'province': seller.province,
-            'rating': float(seller.rating),
-            'category': seller.category,
-            'joined_date': seller.joined_date.isoformat(),
-            'total_products': len(seller.products)
-        }
+    def _project(self, query, fields: Optional[Tuple[str, ...]]):
+        """Select only the seller columns a sparse fieldset needs"""
+        if not fields:
+            return query
+        return query.options(load_only(*[getattr(Seller, name) for name in seller_columns(fields)]))
+
+    def _format_seller(self, seller: Seller, fields: Optional[Tuple[str, ...]] = None) -> Dict[str, Any]:
+        return self._format_sellers([seller], fields)[0]
+
+    def _format_sellers(self, sellers: List[Seller],
+                        fields: Optional[Tuple[str, ...]] = None) -> List[Dict[str, Any]]:
+        return serialize_sellers(sellers, fields or DEFAULT_SELLER_FIELDS)
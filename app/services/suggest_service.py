@@ -0,0 +1,199 @@
+from typing import Any, Dict, Iterable, List, Optional, Set
+from datetime import datetime, timedelta
+import math
+import threading
+import time
+from flask import current_app
+from ..models.order import Order, OrderItem
+from ..models.product import Product
+from ..models.product_listing import ProductListing
+from ..models.seller import Seller
+from ..utils.cache import TTLCache
+from ..utils.change_tracking import subscribe
+from ..utils.prefix_index import PrefixIndex, normalize
+from .. import db
+
+# Added to category scores: a category is a broad but useful completion
+CATEGORY_BOOST = 2.0
+# Re-read rows changed this long before the previous sync too, to cover
+# transactions that committed late and replication lag
+SYNC_OVERLAP = timedelta(seconds=10)
+
+
+class SuggestService:
+    """
+    Search box autocomplete over product names, seller store names and
+    categories.
+
+    Suggestions come from an in-process ``PrefixIndex`` built on first use
+    from the product listing read model and kept current from committed
+    product, seller and order changes: changed rows are marked stale and
+    re-read in one query each before the next lookup. Changes committed
+    by other workers are picked up every ``SUGGEST_SYNC_INTERVAL`` seconds
+    by re-reading the listing and seller rows whose ``updated_at`` passed
+    the last sync, and the index is rebuilt after ``SUGGEST_MAX_AGE``
+    seconds, which also drops rows other workers deleted. Entries rank by
+    rating plus log popularity (units sold for products, product count for
+    sellers and categories). Answers are also cached per query until the
+    next change.
+    """
+
+    def __init__(self):
+        self._index = PrefixIndex()
+        self._built = False
+        self._built_at = self._synced_at = 0.0
+        self._watermark: Optional[datetime] = None
+        self._stale_products: Set[str] = set()
+        self._stale_sellers: Set[str] = set()
+        self._stale_orders: Set[str] = set()
+        self._results = TTLCache(ttl=300, maxsize=4096)
+        self._lock = threading.Lock()
+        subscribe(self._mark_stale, Product, Seller, Order, OrderItem)
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict[str, Any]]:
+        """Return up to ``limit`` suggestions for a partially typed query, best first"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        self._ensure_current()
+        return self._results.get_or_set((prefix, limit), lambda: [
+            dict(payload, text=text) for _, _, text, payload in self._index.search(prefix, limit)
+        ])
+
+    def rebuild(self) -> None:
+        """Drop and rebuild the index on the next lookup"""
+        with self._lock:
+            self._built = False
+
+    def _mark_stale(self, changes) -> None:
+        with self._lock:
+            for change in changes:
+                if change.model is Seller:
+                    self._stale_sellers.add(change.id)
+                elif change.model is Product:
+                    self._stale_products.add(change.id)
+                elif change.model is Order:
+                    # Cancellations change the popularity of the order's products
+                    if change.action == 'update' and change.touches('status'):
+                        self._stale_orders.add(change.id)
+                elif change.values.get('product_id'):
+                    # New order items change products' popularity
+                    self._stale_products.add(change.values['product_id'])
+
+    def _ensure_current(self) -> None:
+        config = current_app.config
+        with self._lock:
+            now = time.monotonic()
+            if not self._built or now - self._built_at >= config['SUGGEST_MAX_AGE']:
+                started = datetime.utcnow()
+                self._build()
+                self._built = True
+                self._built_at = self._synced_at = now
+                self._watermark = started - SYNC_OVERLAP
+                self._stale_products.clear()
+                self._stale_sellers.clear()
+                self._stale_orders.clear()
+                self._results.clear()
+                return
+            products, self._stale_products = self._stale_products, set()
+            sellers, self._stale_sellers = self._stale_sellers, set()
+            orders, self._stale_orders = self._stale_orders, set()
+            if now - self._synced_at >= config['SUGGEST_SYNC_INTERVAL']:
+                # Rows changed by other workers, which this one was not notified about
+                started = datetime.utcnow()
+                products.update(row[0] for row in db.session.query(ProductListing.id)
+                                .filter(ProductListing.updated_at >= self._watermark))
+                sellers.update(row[0] for row in db.session.query(Seller.id)
+                               .filter(Seller.updated_at >= self._watermark))
+                self._synced_at = now
+                self._watermark = started - SYNC_OVERLAP
+            if not (products or sellers or orders):
+                return
+            if orders:
+                products.update(row[0] for row in db.session.query(OrderItem.product_id)
+                                .filter(OrderItem.order_id.in_(orders)).distinct())
+            self._refresh_products(products)
+            self._refresh_sellers(sellers)
+            self._results.clear()
+
+    def _build(self) -> None:
+        entries = []
+        categories: Dict[str, int] = {}
+        for row in db.session.query(ProductListing.id, ProductListing.name, ProductListing.rating,
+                                    ProductListing.sales_count, ProductListing.category).yield_per(1000):
+            entries.append(self._product_entry(row))
+            if row.category:
+                categories[row.category] = categories.get(row.category, 0) + 1
+        entries.extend(self._seller_entries(
+            db.session.query(Seller.id, Seller.store_name, Seller.rating, Seller.total_products).yield_per(1000)
+        ))
+        entries.extend(self._category_entry(name, count) for name, count in categories.items())
+        self._index.load(entries)
+
+    def _refresh_products(self, product_ids: Iterable[str]) -> None:
+        ids = list(product_ids)
+        if not ids:
+            return
+        # Categories the products left or joined need recounting
+        categories = set()
+        for product_id in ids:
+            entry = self._index.get(f'product:{product_id}')
+            if entry:
+                categories.add(entry[2].get('category'))
+        rows = {row.id: row for row in db.session.query(
+            ProductListing.id, ProductListing.name, ProductListing.rating,
+            ProductListing.sales_count, ProductListing.category
+        ).filter(ProductListing.id.in_(ids))}
+        for product_id in ids:
+            row = rows.get(product_id)
+            if row is None:
+                self._index.remove(f'product:{product_id}')
+                continue
+            self._index.add(*self._product_entry(row))
+            categories.add(row.category)
+        self._refresh_categories(category for category in categories if category)
+
+    def _refresh_sellers(self, seller_ids: Iterable[str]) -> None:
+        ids = list(seller_ids)
+        if not ids:
+            return
+        rows = db.session.query(Seller.id, Seller.store_name, Seller.rating, Seller.total_products) \
+            .filter(Seller.id.in_(ids)).all()
+        found = {row.id for row in rows}
+        for seller_id in ids:
+            if seller_id not in found:
+                self._index.remove(f'seller:{seller_id}')
+        for entry in self._seller_entries(rows):
+            self._index.add(*entry)
+
+    def _refresh_categories(self, names: Iterable[str]) -> None:
+        names = list(names)
+        if not names:
+            return
+        counts = dict(db.session.query(ProductListing.category, db.func.count(ProductListing.id))
+                      .filter(ProductListing.category.in_(names)).group_by(ProductListing.category))
+        for name in names:
+            if counts.get(name):
+                self._index.add(*self._category_entry(name, counts[name]))
+            else:
+                self._index.remove(f'category:{name}')
+
+    @staticmethod
+    def _seller_entries(rows) -> List[tuple]:
+        return [(f'seller:{row.id}', row.store_name,
+                 float(row.rating or 0) + math.log1p(row.total_products or 0),
+                 {'type': 'seller', 'id': row.id})
+                for row in rows]
+
+    @staticmethod
+    def _product_entry(row) -> tuple:
+        return (f'product:{row.id}', row.name,
+                float(row.rating or 0) + math.log1p(row.sales_count or 0),
+                {'type': 'product', 'id': row.id, 'category': row.category})
+
+    @staticmethod
+    def _category_entry(name: str, count: int) -> tuple:
+        return f'category:{name}', name, CATEGORY_BOOST + math.log1p(count), {'type': 'category', 'id': name}
+
+
+suggest_service = SuggestService()
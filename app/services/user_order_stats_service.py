@@ -0,0 +1,97 @@
+from typing import Any, Dict, Tuple
+from decimal import Decimal
+from ..models.order import Order, UserOrderStats
+from ..utils.change_tracking import subscribe_in_transaction
+from ..utils.upsert import increment_rows
+from .. import db
+
+ORDER_STATUSES = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+
+
+class UserOrderStatsService:
+    """
+    Maintains ``user_order_stats``: the number and total amount of each
+    user's orders per status.
+
+    Order inserts, deletes and changes of ``user_id``, ``status`` or
+    ``total_amount`` become relative upserts in the same transaction, so
+    the order history summary never aggregates the orders table.
+    ``rebuild`` recomputes the rows from the orders.
+    """
+
+    def __init__(self):
+        subscribe_in_transaction(self._apply_changes, Order)
+
+    def get_summary(self, user_id: str) -> Dict[str, Any]:
+        """Order counts per status and lifetime spend (orders not cancelled)"""
+        counts = {status: 0 for status in ORDER_STATUSES}
+        spend = Decimal(0)
+        for row in UserOrderStats.query.filter(UserOrderStats.user_id == user_id):
+            counts[row.status] = row.order_count
+            if row.status != 'cancelled':
+                spend += row.amount
+        return {
+            'total_orders': sum(counts.values()),
+            'by_status': counts,
+            'lifetime_spend': float(spend)
+        }
+
+    def rebuild(self, batch_size: int = 1000) -> int:
+        """Recompute the rows of every user from the orders, batch of users by batch; returns the user count"""
+        db.session.execute(UserOrderStats.__table__.delete())
+        db.session.commit()
+        count, last_id = 0, None
+        while True:
+            query = db.session.query(Order.user_id).filter(Order.user_id.isnot(None))
+            if last_id is not None:
+                query = query.filter(Order.user_id > last_id)
+            user_ids = [row[0] for row in query.distinct().order_by(Order.user_id).limit(batch_size)]
+            if not user_ids:
+                return count
+            rows = db.session.query(
+                Order.user_id, db.func.coalesce(Order.status, 'pending'),
+                db.func.count(Order.id), db.func.coalesce(db.func.sum(Order.total_amount), 0)
+            ).filter(Order.user_id.in_(user_ids)).group_by(Order.user_id, db.func.coalesce(Order.status, 'pending'))
+            increment_rows(db.session, UserOrderStats, ('user_id', 'status'), ('order_count', 'amount'), [
+                {'user_id': user_id, 'status': status, 'order_count': orders, 'amount': amount}
+                for user_id, status, orders, amount in rows
+            ])
+            db.session.commit()
+            count += len(user_ids)
+            last_id = user_ids[-1]
+
+    def _apply_changes(self, session, changes) -> None:
+        # (user id, status) -> [count delta, amount delta]
+        deltas: Dict[Tuple[str, str], list] = {}
+
+        def add(values: Dict[str, Any], sign: int) -> None:
+            user_id = values.get('user_id')
+            if user_id:
+                delta = deltas.setdefault((user_id, values.get('status') or 'pending'), [0, Decimal(0)])
+                delta[0] += sign
+                delta[1] += sign * Decimal(str(values.get('total_amount') or 0))
+
+        changes = [change for change in changes if change.touches('user_id', 'status', 'total_amount')]
+        # Columns an updated order did not have loaded were not changed; read them from the row
+        unloaded = [change.id for change in changes if change.action == 'update'
+                    and not {'user_id', 'status', 'total_amount'} <= change.values.keys()]
+        stored = {}
+        if unloaded:
+            stored = {row.id: {'user_id': row.user_id, 'status': row.status, 'total_amount': row.total_amount}
+                      for row in session.query(Order.id, Order.user_id, Order.status, Order.total_amount)
+                      .filter(Order.id.in_(unloaded))}
+
+        for change in changes:
+            values = dict(stored.get(change.id, {}), **change.values)
+            if change.action != 'insert':
+                add(values if change.action == 'delete' else dict(values, **change.previous), -1)
+            if change.action != 'delete':
+                add(values, 1)
+
+        increment_rows(session, UserOrderStats, ('user_id', 'status'), ('order_count', 'amount'), [
+            {'user_id': user_id, 'status': status, 'order_count': count, 'amount': amount}
+            for (user_id, status), (count, amount) in deltas.items() if count or amount
+        ])
+
+
+user_order_stats_service = UserOrderStatsService()
@@ -0,0 +1,97 @@
+"""Read the rows of a bulk upload: a JSON array, NDJSON or CSV"""
+
+import csv
+import io
+import json
+from typing import Any, Dict, List
+
+from flask import request
+
+from .streaming import NDJSON_MIMETYPE
+
+CSV_MIMETYPES = ('text/csv', 'application/csv')
+
+
+def read_rows(max_rows: int) -> List[Dict[str, Any]]:
+    """
+    Parse the rows of the current request. The format is chosen by the
+    content type: ``application/json`` (an array of objects),
+    ``application/x-ndjson`` (one object per line) or ``text/csv`` (a header
+    row then one row per record), or a ``file`` field of a multipart upload
+    with a ``.csv``/``.ndjson``/``.json`` name. NDJSON and CSV are read line
+    by line from the request stream. Raises ``ValueError`` on malformed
+    input or more than ``max_rows`` rows.
+    """
+    upload = request.files.get('file')
+    if upload is not None:
+        mimetype = _upload_mimetype(upload.filename or '', upload.mimetype)
+        stream = upload.stream
+    else:
+        mimetype = request.mimetype
+        stream = request.stream
+
+    if mimetype == NDJSON_MIMETYPE:
+        rows = _read_ndjson(stream, max_rows)
+    elif mimetype in CSV_MIMETYPES:
+        rows = _read_csv(stream, max_rows)
+    elif mimetype == 'application/json':
+        rows = _read_json(stream, max_rows)
+    else:
+        raise ValueError('Upload a JSON array, NDJSON or CSV')
+
+    if not rows:
+        raise ValueError('No rows to import')
+    return rows
+
+
+def _upload_mimetype(filename: str, mimetype: str) -> str:
+    extension = filename.rsplit('.', 1)[-1].lower()
+    return {
+        'csv': 'text/csv',
+        'ndjson': NDJSON_MIMETYPE,
+        'jsonl': NDJSON_MIMETYPE,
+        'json': 'application/json'
+    }.get(extension, mimetype)
+
+
+def _read_json(stream, max_rows: int) -> List[Dict[str, Any]]:
+    try:
+        rows = json.load(io.TextIOWrapper(stream, encoding='utf-8'))
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid JSON')
+    if not isinstance(rows, list):
+        raise ValueError('Expected a JSON array of rows')
+    _check_size(len(rows), max_rows)
+    return rows
+
+
+def _read_ndjson(stream, max_rows: int) -> List[Dict[str, Any]]:
+    rows = []
+    for number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8'), start=1):
+        if not line.strip():
+            continue
+        try:
+            rows.append(json.loads(line))
+        except ValueError:
+            raise ValueError(f'Invalid JSON on line {number}')
+        _check_size(len(rows), max_rows)
+    return rows
+
+
+def _read_csv(stream, max_rows: int) -> List[Dict[str, Any]]:
+    rows = []
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+    try:
+        for row in reader:
+            # Empty cells mean "not given", like a missing JSON key
+            rows.append({key.strip(): value for key, value in row.items()
+                         if key and value not in (None, '')})
+            _check_size(len(rows), max_rows)
+    except (csv.Error, UnicodeDecodeError) as e:
+        raise ValueError(f'Invalid CSV: {e}')
+    return rows
+
+
+def _check_size(count: int, max_rows: int) -> None:
+    if count > max_rows:
+        raise ValueError(f'At most {max_rows} rows can be imported at once')
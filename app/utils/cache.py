@@ -0,0 +1,121 @@
+"""Small in-process caches"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire ``ttl`` seconds after being set"""
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Return the cached value for ``key``, computing and storing it on a miss"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = factory()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class MaterializedResult:
+    """
+    Precomputed, serialized results kept until invalidated.
+
+    ``build(key)`` returns ``(data, dependencies)``: the JSON-serializable
+    result for ``key`` and the ids of the rows it was built from. The JSON
+    bytes are stored so hits never touch the database or the serializer.
+    Entries are dropped by ``invalidate`` (by key or all) or by
+    ``invalidate_dependents`` when one of their rows changes. At most
+    ``maxsize`` keys are kept; the least recently used is evicted first.
+    """
+
+    _ALL = object()
+
+    def __init__(self, build: Callable[[Hashable], tuple], maxsize: int = 256):
+        self._build = build
+        self.maxsize = maxsize
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable = None, max_age: Optional[float] = None) -> bytes:
+        """Return the serialized result for ``key``, building it on a miss"""
+        from flask import current_app
+        from .db_routing import use_primary
+
+        entry = self._entries.get(key)
+        if entry is not None and (max_age is None or time.monotonic() - entry[0] < max_age):
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+            return entry[1]
+
+        generation = self._generation
+        # Shared by every client, so never build it from a lagging replica
+        with use_primary():
+            data, dependencies = self._build(key)
+        payload = current_app.json.dumps(data).encode('utf-8')
+        with self._lock:
+            # Don't store a result that an invalidation raced with
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic(), payload, frozenset(dependencies))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+        return payload
+
+    def invalidate(self, key: Hashable = _ALL) -> None:
+        with self._lock:
+            self._generation += 1
+            if key is self._ALL:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def invalidate_dependents(self, dependencies) -> None:
+        """Drop every entry built from one of ``dependencies``"""
+        dependencies = set(dependencies)
+        if not dependencies:
+            return
+        with self._lock:
+            self._generation += 1
+            for key in [key for key, entry in self._entries.items() if entry[2] & dependencies]:
+                del self._entries[key]
@@ -0,0 +1,132 @@
+"""Collect committed model changes and hand them to subscribers"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_PENDING = 'pending_changes'
+_APPLIED = 'applied_changes'
+
+# Model class -> callbacks receiving the list of committed changes for that model
+_subscribers: Dict[type, List[Callable[[List['Change']], None]]] = {}
+# Model class -> callbacks receiving the session and the changes before the commit
+_transaction_subscribers: Dict[type, List[Callable[[Session, List['Change']], None]]] = {}
+
+
+class Change:
+    """A committed insert, update or delete of a single row"""
+
+    __slots__ = ('model', 'action', 'id', 'values', 'previous')
+
+    def __init__(self, model: type, action: str, id: Any, values: Dict[str, Any],
+                 previous: Optional[Dict[str, Any]] = None):
+        self.model = model
+        self.action = action
+        self.id = id
+        self.values = values
+        self.previous = previous or {}
+
+    @property
+    def changed(self) -> Iterable[str]:
+        return self.previous.keys()
+
+    def touches(self, *fields: str) -> bool:
+        """Whether the change inserted/deleted the row or modified one of ``fields``"""
+        return self.action != 'update' or any(field in self.previous for field in fields)
+
+    def __repr__(self):
+        return f'<Change {self.model.__name__} {self.action} {self.id}>'
+
+
+def subscribe(callback: Callable[[List[Change]], None], *models: type) -> None:
+    """Call ``callback`` after every commit that changed rows of ``models``"""
+    for model in models:
+        _subscribers.setdefault(model, []).append(callback)
+
+
+def subscribe_in_transaction(callback: Callable[[Session, List[Change]], None], *models: type) -> None:
+    """
+    Call ``callback(session, changes)`` just before every commit that changed
+    rows of ``models``, inside the committing transaction, so it can keep
+    derived tables consistent with the same commit. Its own writes must be
+    Core statements; they are not tracked unless passed to ``record_change``.
+    """
+    for model in models:
+        _transaction_subscribers.setdefault(model, []).append(callback)
+
+
+def _tracked(model: type) -> bool:
+    return model in _subscribers or model in _transaction_subscribers
+
+
+def record_change(session: Session, model: type, action: str, id: Any,
+                  values: Optional[Dict[str, Any]] = None,
+                  previous: Optional[Dict[str, Any]] = None) -> None:
+    """Record a change made outside the unit of work (bulk or Core statements)"""
+    if _tracked(model):
+        session.info.setdefault(_PENDING, []).append(
+            Change(model, action, id, values or {}, previous)
+        )
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_changes(session, flush_context):
+    for action, objects in (('insert', session.new), ('update', session.dirty),
+                            ('delete', session.deleted)):
+        for obj in objects:
+            model = type(obj)
+            if not _tracked(model):
+                continue
+            state = inspect(obj)
+            columns = {attr.key for attr in state.mapper.column_attrs}
+            previous = None
+            if action == 'update':
+                previous = {}
+                for key in columns:
+                    history = state.attrs[key].history
+                    if history.has_changes():
+                        previous[key] = history.deleted[0] if history.deleted else None
+                if not previous:
+                    continue
+            values = {key: value for key, value in state.dict.items() if key in columns}
+            identity = state.mapper.primary_key_from_instance(obj)
+            record_change(session, model, action,
+                          identity[0] if len(identity) == 1 else tuple(identity), values, previous)
+
+
+@event.listens_for(Session, 'before_commit')
+def _dispatch_in_transaction(session):
+    if not _transaction_subscribers:
+        return
+    session.flush()
+    changes = session.info.get(_PENDING, [])
+    applied = session.info.get(_APPLIED, 0)
+    if applied == len(changes):
+        return
+    session.info[_APPLIED] = len(changes)
+    _dispatch(changes[applied:], _transaction_subscribers, session)
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_changes(session):
+    session.info.pop(_APPLIED, None)
+    changes = session.info.pop(_PENDING, None)
+    if not changes:
+        return
+    _dispatch(changes, _subscribers)
+
+
+def _dispatch(changes: List[Change], subscribers, *args) -> None:
+    by_callback: Dict[Callable, List[Change]] = {}
+    for change in changes:
+        for callback in subscribers.get(change.model, []):
+            by_callback.setdefault(callback, []).append(change)
+    for callback, callback_changes in by_callback.items():
+        callback(*args, callback_changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop(_APPLIED, None)
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,117 @@
+"""Read/write splitting: send reads of safe requests to read replicas"""
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List
+
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+
+REPLICA_BIND_PREFIX = 'replica_'
+
+
+def replica_binds(uris: List[str]) -> Dict[str, str]:
+    """``SQLALCHEMY_BINDS`` entries for the replica URIs"""
+    return {f'{REPLICA_BIND_PREFIX}{index}': uri for index, uri in enumerate(uris)}
+
+
+class ReplicaPool:
+    """
+    Round-robin choice among the healthy replicas of an app. A replica is
+    pinged at most every ``check_interval`` seconds; one that fails the
+    ping or drops a connection is skipped until its next successful check.
+    """
+
+    def __init__(self, keys: List[str], check_interval: float):
+        self.keys = keys
+        self.check_interval = check_interval
+        self._healthy: Dict[str, bool] = {}
+        self._checked_at: Dict[str, float] = {}
+        self._watched = set()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def choose(self, engines):
+        """A healthy replica engine, or ``None`` to fall back to the primary"""
+        healthy = [key for key in self.keys if self._is_healthy(key, engines[key])]
+        if not healthy:
+            return None
+        return engines[healthy[next(self._counter) % len(healthy)]]
+
+    def mark_down(self, key: str) -> None:
+        with self._lock:
+            self._healthy[key] = False
+            self._checked_at[key] = time.monotonic()
+
+    def _is_healthy(self, key: str, engine) -> bool:
+        if key not in self._watched:
+            self._watch(key, engine)
+        now = time.monotonic()
+        with self._lock:
+            due = now - self._checked_at.get(key, float('-inf')) >= self.check_interval
+            if due:
+                # Claim the check so concurrent requests don't ping too
+                self._checked_at[key] = now
+        if due:
+            try:
+                with engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                self._healthy[key] = True
+            except Exception:
+                current_app.logger.warning('Read replica %s is unavailable, reading from the primary', key)
+                self._healthy[key] = False
+        return self._healthy.get(key, False)
+
+    def _watch(self, key: str, engine) -> None:
+        @event.listens_for(engine, 'handle_error')
+        def _on_error(context):
+            if context.is_disconnect:
+                self.mark_down(key)
+        self._watched.add(key)
+
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica while the request allows it (see
+    ``configure_replicas``). Flushes, Core DML and every read after the
+    first write of a request use the primary, so a request always sees its
+    own writes.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        if bind is not None or not has_app_context():
+            return engine
+
+        if self._flushing or getattr(clause, 'is_dml', False) or (clause is not None and _is_locking(clause)):
+            g.db_wrote = True
+            return engine
+        if not g.get('db_read_only') or g.get('db_wrote') or g.get('db_use_primary'):
+            return engine
+
+        pool = current_app.extensions.get('db_replicas')
+        if pool is None or engine is not self._db.engines.get(None):
+            return engine
+        return pool.choose(self._db.engines) or engine
+
+
+def _is_locking(clause) -> bool:
+    # SELECT ... FOR UPDATE must run on the primary
+    return getattr(clause, '_for_update_arg', None) is not None
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. to build shared caches"""
+    if not has_app_context():
+        yield
+        return
+    previous = g.get('db_use_primary')
+    g.db_use_primary = True
+    try:
+        yield
+    finally:
+        g.db_use_primary = previous
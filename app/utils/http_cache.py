@@ -0,0 +1,68 @@
+"""HTTP conditional GET helpers (ETag / Last-Modified / 304)"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, Tuple
+
+from flask import current_app, make_response, request
+
+from .. import db
+
+
+def make_etag(*parts: Any) -> str:
+    """Build an ETag from the version parts of a resource"""
+    return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+
+def collection_version(*models) -> Tuple[str, Optional[datetime]]:
+    """
+    Version of the tables behind a listing: the latest ``updated_at`` and the
+    row count of every model (the count catches deletes), read in one query
+    from the ``updated_at`` indexes.
+    """
+    columns = []
+    for model in models:
+        columns.append(db.session.query(db.func.max(model.updated_at)).scalar_subquery())
+        columns.append(db.session.query(db.func.count(model.id)).scalar_subquery())
+    row = db.session.query(*columns).one()
+    timestamps = [value for value in row[::2] if value is not None]
+    return make_etag(*row), max(timestamps) if timestamps else None
+
+
+def request_etag(version: str) -> str:
+    """ETag of the requested representation: the resource version plus path and query string"""
+    return make_etag(version, request.path, sorted(request.args.items(multi=True)))
+
+
+def conditional_response(etag: str, last_modified: Optional[datetime],
+                         build: Callable[[], Any]):
+    """
+    Return 304 Not Modified when the request's ``If-None-Match`` or
+    ``If-Modified-Since`` validators match, without calling ``build``;
+    otherwise return ``build()`` with the validators attached.
+    """
+    if last_modified is not None and last_modified.tzinfo is None:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    if _is_fresh(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Clients may store the response but must revalidate it before reuse
+    response.cache_control.no_cache = True
+    return response
+
+
+def _is_fresh(etag: str, last_modified: Optional[datetime]) -> bool:
+    # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
@@ -0,0 +1,237 @@
+"""
+Idempotency keys for mutating endpoints.
+
+A client that may retry a POST sends an ``Idempotency-Key`` header with a
+value unique to the operation (e.g. a UUID). The first request with a key
+claims it by inserting an ``idempotency_keys`` row and runs; its response
+is then stored on the row. Repeats of the key get the stored response
+back without running the endpoint again, from an in-process cache or with
+one primary key lookup. A repeat arriving while the first request still
+runs waits for it to finish. Keys are scoped to the endpoint and the
+authenticated user; on endpoints without a user, to the client address and
+chosen fields of the JSON body (e.g. the email of a registration), so
+anonymous clients never share keys. Keys expire ``IDEMPOTENCY_TTL`` seconds after first use
+(``flask purge-idempotency-keys`` deletes expired rows).
+"""
+
+import hashlib
+import threading
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import current_app, g, jsonify, make_response, request
+from sqlalchemy.exc import IntegrityError
+
+from .cache import TTLCache
+from .. import db
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+class _Stored:
+    """A finished response, as stored for replay"""
+
+    __slots__ = ('fingerprint', 'status_code', 'content_type', 'body')
+
+    def __init__(self, fingerprint: str, status_code: int, content_type: Optional[str], body: bytes):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.content_type = content_type
+        self.body = body
+
+
+class IdempotencyStore:
+    """Claims keys and stores and replays responses (see module docstring)"""
+
+    def __init__(self):
+        # Finished responses never change until they expire, so every worker may cache them
+        self._responses = TTLCache(ttl=3600, maxsize=10000)
+        # Keys whose first request runs in this process -> set when it finishes
+        self._running: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+
+    def run(self, key_id: str, fingerprint: str, view: Callable[[], object]):
+        """Return the response of ``view`` for this key, calling it only for the first request"""
+        stored = self._responses.get(key_id)
+        if stored is not None:
+            return self._replay(stored, fingerprint)
+
+        deadline = time.monotonic() + current_app.config['IDEMPOTENCY_WAIT_TIMEOUT']
+        delay = 0.02
+        while True:
+            if self._claim(key_id, fingerprint):
+                return self._execute(key_id, fingerprint, view)
+            row = self._load(key_id)
+            if row is not None and row.status_code is not None:
+                stored = _Stored(row.fingerprint, row.status_code, row.content_type, row.body or b'')
+                self._cache(key_id, stored, row.expires_at)
+                return self._replay(stored, fingerprint)
+            if row is not None and row.fingerprint != fingerprint:
+                return self._mismatch()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return jsonify({'error': 'A request with this Idempotency-Key is still in progress'}), 409
+            # Woken as soon as a request running in this process finishes; polls for other processes
+            event = self._running.get(key_id)
+            if event is not None:
+                event.wait(min(delay, remaining))
+            else:
+                time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+    def purge(self, batch_size: int = 1000) -> int:
+        """Delete the expired keys batch by batch; returns how many were deleted"""
+        from ..models.idempotency import IdempotencyKey
+
+        table = IdempotencyKey.__table__
+        deleted = 0
+        while True:
+            ids = [row[0] for row in db.session.query(IdempotencyKey.id)
+                   .filter(IdempotencyKey.expires_at < datetime.utcnow()).limit(batch_size)]
+            if not ids:
+                return deleted
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+            db.session.commit()
+            deleted += len(ids)
+
+    def _claim(self, key_id: str, fingerprint: str) -> bool:
+        """Insert the key as running, or take over an expired or abandoned one; True if claimed"""
+        from ..models.idempotency import IdempotencyKey
+
+        table = IdempotencyKey.__table__
+        now = datetime.utcnow()
+        # Ends the request's transaction, so the lookups below see rows other requests committed
+        db.session.commit()
+        try:
+            db.session.execute(table.insert().values(
+                id=key_id, fingerprint=fingerprint, created_at=now,
+                expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+            ))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            # An expired key is free again; a running claim older than the lock timeout belongs
+            # to a request that died before storing its response
+            stale = now - timedelta(seconds=current_app.config['IDEMPOTENCY_LOCK_TIMEOUT'])
+            result = db.session.execute(table.update().where(
+                table.c.id == key_id,
+                db.or_(table.c.expires_at <= now, db.and_(table.c.status_code.is_(None),
+                                                          table.c.created_at < stale))
+            ).values(
+                fingerprint=fingerprint, status_code=None, content_type=None, body=None, created_at=now,
+                expires_at=now + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])
+            ))
+            db.session.commit()
+            if result.rowcount != 1:
+                return False
+        with self._lock:
+            self._running[key_id] = threading.Event()
+        return True
+
+    def _execute(self, key_id: str, fingerprint: str, view: Callable[[], object]):
+        from ..models.idempotency import IdempotencyKey
+
+        table = IdempotencyKey.__table__
+        stored = False
+        try:
+            response = make_response(view())
+            # Server errors and streams are not replayed; the key is released for a retry
+            if response.status_code < 500 and not response.is_streamed:
+                body = response.get_data()
+                db.session.rollback()
+                db.session.execute(table.update().where(table.c.id == key_id).values(
+                    status_code=response.status_code, content_type=response.content_type, body=body
+                ))
+                db.session.commit()
+                stored = True
+                self._cache(key_id, _Stored(fingerprint, response.status_code, response.content_type, body),
+                            datetime.utcnow() + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL']))
+            return response
+        finally:
+            try:
+                if not stored:
+                    db.session.rollback()
+                    db.session.execute(table.delete().where(table.c.id == key_id,
+                                                            table.c.status_code.is_(None)))
+                    db.session.commit()
+            finally:
+                with self._lock:
+                    event = self._running.pop(key_id, None)
+                if event is not None:
+                    event.set()
+
+    @staticmethod
+    def _load(key_id: str):
+        from ..models.idempotency import IdempotencyKey
+
+        table = IdempotencyKey.__table__
+        row = db.session.execute(table.select().where(table.c.id == key_id)).first()
+        db.session.commit()
+        if row is not None and row.expires_at <= datetime.utcnow():
+            return None
+        return row
+
+    def _cache(self, key_id: str, stored: _Stored, expires_at: datetime) -> None:
+        ttl = (expires_at - datetime.utcnow()).total_seconds()
+        if ttl > 0:
+            self._responses.set(key_id, stored, min(ttl, self._responses.ttl))
+
+    def _replay(self, stored: _Stored, fingerprint: str):
+        if stored.fingerprint != fingerprint:
+            return self._mismatch()
+        response = current_app.response_class(stored.body, status=stored.status_code,
+                                              content_type=stored.content_type)
+        response.headers['Idempotent-Replayed'] = 'true'
+        return response
+
+    @staticmethod
+    def _mismatch():
+        return jsonify({'error': 'This Idempotency-Key was already used for a different request'}), 422
+
+
+store = IdempotencyStore()
+
+
+def idempotent(endpoint: str, anonymous_scope: Tuple[str, ...] = ()):
+    """
+    Make a view replay its response for repeated ``Idempotency-Key``
+    headers. Put it below ``token_required`` so keys are scoped to the
+    user. Without a user, keys are scoped to the client address and the
+    JSON body fields named in ``anonymous_scope``. Requests without the
+    header run as usual.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = request.headers.get(HEADER)
+            if key is None:
+                return f(*args, **kwargs)
+            if not key or len(key) > MAX_KEY_LENGTH:
+                return jsonify({'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'}), 400
+
+            user = g.get('current_user')
+            if user is not None:
+                scope = (user.id,)
+            else:
+                body = request.get_json(silent=True)
+                body = body if isinstance(body, dict) else {}
+                scope = ('anonymous', request.remote_addr or '') + tuple(
+                    str(body.get(field) or '').strip().lower() for field in anonymous_scope
+                )
+            key_id = _digest(*scope, endpoint, key)
+            fingerprint = _digest(request.method, request.path, request.get_data())
+            return store.run(key_id, fingerprint, lambda: f(*args, **kwargs))
+        return decorated
+    return decorator
+
+
+def _digest(*parts) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else str(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
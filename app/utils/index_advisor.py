@@ -0,0 +1,125 @@
+"""Capture the SQL the app issues and flag query plans that scan or sort whole tables"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import event
+
+
+class CapturedQuery:
+    """A distinct SELECT statement, with the parameters of its first execution"""
+
+    __slots__ = ('statement', 'parameters', 'count', 'sources', 'findings')
+
+    def __init__(self, statement: str, parameters: Any):
+        self.statement = statement
+        self.parameters = parameters
+        self.count = 0
+        self.sources: List[str] = []
+        self.findings: List['Finding'] = []
+
+
+class Finding:
+    """A problem in the plan of a query: a full scan, a filesort or a temporary table"""
+
+    __slots__ = ('problem', 'table', 'detail')
+
+    def __init__(self, problem: str, table: Optional[str], detail: str):
+        self.problem = problem
+        self.table = table
+        self.detail = detail
+
+    def __repr__(self):
+        return f'<Finding {self.problem} {self.table}>'
+
+
+class QueryCapture:
+    """
+    Record the distinct SELECT statements run on ``engines`` while active.
+    Set ``source`` to label where the following queries come from (e.g.
+    the request path).
+    """
+
+    def __init__(self, engines: Iterable[Any]):
+        self.engines = list(engines)
+        self.queries: 'OrderedDict[str, CapturedQuery]' = OrderedDict()
+        self.source: Optional[str] = None
+
+    def __enter__(self) -> 'QueryCapture':
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if executemany or not statement.lstrip().upper().startswith('SELECT'):
+            return
+        key = ' '.join(statement.split())
+        query = self.queries.get(key)
+        if query is None:
+            query = self.queries[key] = CapturedQuery(statement, parameters)
+        query.count += 1
+        if self.source and self.source not in query.sources:
+            query.sources.append(self.source)
+
+
+def explain(connection, statement: str, parameters: Any = None) -> List[Finding]:
+    """Run EXPLAIN on ``statement`` and return the full scans, filesorts and temporary tables in its plan"""
+    dialect = connection.dialect.name
+    if dialect == 'mysql':
+        return _explain_mysql(connection, statement, parameters)
+    if dialect == 'sqlite':
+        return _explain_sqlite(connection, statement, parameters)
+    raise ValueError(f'EXPLAIN is not supported for {dialect}')
+
+
+def _explain_mysql(connection, statement: str, parameters: Any) -> List[Finding]:
+    findings = []
+    for row in connection.exec_driver_sql('EXPLAIN ' + statement, parameters or ()).mappings():
+        table, extra = row.get('table'), row.get('Extra') or ''
+        if row.get('type') == 'ALL':
+            findings.append(Finding('full scan', table, f"type=ALL, ~{row.get('rows')} rows"))
+        if 'Using filesort' in extra:
+            findings.append(Finding('filesort', table, extra))
+        if 'Using temporary' in extra:
+            findings.append(Finding('temporary table', table, extra))
+    return findings
+
+
+def _explain_sqlite(connection, statement: str, parameters: Any) -> List[Finding]:
+    findings = []
+    for row in connection.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters or ()):
+        detail = row[-1]
+        words = detail.split()
+        if words[:1] == ['SCAN'] and len(words) > 1 and words[1] != 'CONSTANT' \
+                and 'INDEX' not in words:
+            findings.append(Finding('full scan', words[1], detail))
+        elif 'TEMP B-TREE' in detail:
+            problem = 'filesort' if 'ORDER BY' in detail else 'temporary table'
+            findings.append(Finding(problem, None, detail))
+    return findings
+
+
+def advise(app, paths: Iterable[str], headers: Optional[Dict[str, str]] = None) -> List[CapturedQuery]:
+    """
+    Issue GET requests for ``paths`` against ``app``, capture every SELECT
+    they run and EXPLAIN it on the primary. Returns the captured queries
+    with their ``findings``.
+    """
+    from .. import db
+
+    client = app.test_client()
+    with QueryCapture(db.engines.values()) as capture:
+        for path in paths:
+            capture.source = f'GET {path}'
+            response = client.get(path, headers=headers or {})
+            if response.status_code >= 400:
+                app.logger.warning('%s returned %s', capture.source, response.status_code)
+
+    with db.engine.connect() as connection:
+        for query in capture.queries.values():
+            query.findings = explain(connection, query.statement, query.parameters)
+    return list(capture.queries.values())
@@ -0,0 +1,134 @@
+"""Content-addressed image storage and the resizing done in background worker processes"""
+
+import hashlib
+import os
+import re
+import tempfile
+from typing import Any, BinaryIO, Dict, Optional, Tuple
+
+# Uploaded images are served from here; the path is followed by the digest and the variant
+MEDIA_URL_PREFIX = '/api/media/images/'
+DIGEST_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+# Formats accepted for upload -> their content type
+UPLOAD_FORMATS = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp', 'GIF': 'image/gif'}
+VARIANT_FORMAT = 'WEBP'
+VARIANT_MIMETYPE = 'image/webp'
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ImageTooLarge(ValueError):
+    """An upload streamed past the size limit (bodies without a Content-Length)"""
+
+
+def upload_stream() -> BinaryIO:
+    """
+    The uploaded image of the current request: the raw body when sent as
+    ``image/*``, or the ``file`` part of a multipart form (which Werkzeug
+    spools to a temporary file rather than memory).
+    """
+    from flask import request
+
+    if request.mimetype == 'multipart/form-data':
+        upload = request.files.get('file')
+        if upload is None:
+            raise ValueError("Missing 'file' in multipart upload")
+        return upload.stream
+    if request.mimetype.startswith('image/'):
+        return request.stream
+    raise ValueError('Send the image as the request body (Content-Type: image/*) or as a multipart file')
+
+
+def media_url(digest: str, variant: str) -> str:
+    return f'{MEDIA_URL_PREFIX}{digest}/{variant}'
+
+
+def variant_url(url: Optional[str], variant: str) -> Optional[str]:
+    """The URL of another variant of an uploaded image; external URLs are returned unchanged"""
+    if not url or not url.startswith(MEDIA_URL_PREFIX):
+        return url
+    digest = url[len(MEDIA_URL_PREFIX):].split('/', 1)[0]
+    return media_url(digest, variant)
+
+
+def original_path(root: str, digest: str) -> str:
+    # Two levels of fan-out keep directories small
+    return os.path.join(root, 'images', digest[:2], digest[2:4], digest)
+
+
+def variant_path(root: str, digest: str, variant: str) -> str:
+    return f'{original_path(root, digest)}-{variant}.{VARIANT_FORMAT.lower()}'
+
+
+def store_stream(root: str, stream: BinaryIO, max_size: Optional[int] = None) -> Tuple[str, int, bool]:
+    """
+    Copy ``stream`` to the content-addressed store chunk by chunk, hashing
+    as it goes. Returns ``(sha256 digest, size, created)``; ``created`` is
+    false when the same bytes were already stored.
+    """
+    directory = os.path.join(root, 'images', 'tmp')
+    os.makedirs(directory, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    handle, temporary = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(handle, 'wb') as target:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise ImageTooLarge(f'Image is larger than {max_size} bytes')
+                digest.update(chunk)
+                target.write(chunk)
+        if size == 0:
+            raise ValueError('No image data received')
+
+        path = original_path(root, digest.hexdigest())
+        if os.path.exists(path):
+            os.remove(temporary)
+            return digest.hexdigest(), size, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temporary, path)
+        return digest.hexdigest(), size, True
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def inspect_image(path: str) -> Dict[str, Any]:
+    """Read the format and size from an image's header; raises ValueError if it is not an image"""
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(path) as image:
+            if image.format not in UPLOAD_FORMATS:
+                raise ValueError(f'Unsupported image format {image.format}')
+            return {'content_type': UPLOAD_FORMATS[image.format], 'width': image.width, 'height': image.height}
+    except (UnidentifiedImageError, Image.DecompressionBombError):
+        raise ValueError('Unsupported or invalid image')
+
+
+def render_variants(root: str, digest: str, sizes: Dict[str, int], quality: int = 82) -> Dict[str, Dict[str, int]]:
+    """
+    Write the resized variants of a stored original, each fitting in a
+    ``size`` × ``size`` box (never upscaled) and re-encoded as WebP. Runs in
+    a worker process, so it only touches files.
+    """
+    from PIL import Image, ImageOps
+
+    variants = {}
+    with Image.open(original_path(root, digest)) as source:
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA' if 'transparency' in source.info or 'A' in source.mode else 'RGB')
+        for variant, size in sizes.items():
+            image = source.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            path = variant_path(root, digest, variant)
+            temporary = path + '.tmp'
+            image.save(temporary, VARIANT_FORMAT, quality=quality, method=4)
+            os.replace(temporary, path)
+            variants[variant] = {'width': image.width, 'height': image.height, 'size': os.path.getsize(path)}
+    return variants
@@ -0,0 +1,176 @@
+"""Keyset (cursor) pagination helpers"""
+
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence, Tuple
+
+from .. import db
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+def parse_limit(value: Optional[str], default: int = DEFAULT_LIMIT, maximum: int = MAX_LIMIT) -> int:
+    """Parse a ``limit`` query parameter, clamping it to ``maximum``"""
+    if value in (None, ''):
+        return default
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('limit must be an integer')
+    if limit < 1:
+        raise ValueError('limit must be a positive integer')
+    return min(limit, maximum)
+
+
+def encode_cursor(sort: str, values: Sequence[Any]) -> str:
+    """Encode the sort key of the last row of a page into an opaque cursor"""
+    payload = json.dumps({'s': sort, 'v': [_dump_value(v) for v in values]}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    """Decode a cursor produced by ``encode_cursor`` for the given sort"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        values = payload['v']
+    except (ValueError, TypeError, KeyError):
+        raise ValueError('Invalid cursor')
+    if payload.get('s') != sort:
+        raise ValueError('Cursor does not match the requested sort order')
+    return values
+
+
+def paginate(query, sort: str, columns: Sequence[Tuple[Any, bool]],
+             cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> Tuple[list, Optional[str]]:
+    """
+    Apply keyset pagination to ``query``.
+
+    ``columns`` is a list of ``(column, descending)`` pairs and must end with a
+    unique column (usually the primary key) so the ordering is stable. Returns
+    the rows of the page and the cursor of the next page (``None`` on the last page).
+    """
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        if len(values) != len(columns):
+            raise ValueError('Invalid cursor')
+        values = [_load_value(column, value) for (column, _), value in zip(columns, values)]
+        query = query.filter(_after(columns, values))
+
+    query = query.order_by(*[column.desc() if descending else column.asc()
+                             for column, descending in columns])
+    rows = query.limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, [getattr(last, column.key) for column, _ in columns])
+    return rows, next_cursor
+
+
+def _after(columns, values):
+    """Build ``(c1, c2, ...) > (v1, v2, ...)`` honouring each column's direction"""
+    clauses = []
+    for i, (column, descending) in enumerate(columns):
+        equal = [col == value for (col, _), value in zip(columns[:i], values[:i])]
+        compare = column < values[i] if descending else column > values[i]
+        clauses.append(db.and_(*equal, compare))
+    return db.or_(*clauses)
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _load_value(column, value: Any) -> Any:
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is Decimal:
+            return Decimal(str(value))
+        return python_type(value)
+    except (TypeError, ValueError, ArithmeticError):
+        raise ValueError('Invalid cursor')
+
+
+def paginate_ranked(query, id_column, ranking: Sequence[Tuple[Any, float]],
+                    cursor: Optional[str] = None, limit: int = DEFAULT_LIMIT,
+                    sort: str = 'relevance') -> Tuple[list, Optional[str]]:
+    """
+    Paginate ``query`` in the order of an external ``ranking``.
+
+    ``ranking`` is a bounded list of ``(id, score)`` pairs sorted by
+    descending score then descending id, as returned by the search service.
+    Rows filtered out by ``query`` are skipped; the cursor is the
+    ``(score, id)`` of the last row of the page.
+    """
+    allowed = {row[0] for row in query.with_entities(id_column)}
+    ranked = [(doc_id, score) for doc_id, score in ranking if doc_id in allowed]
+
+    start = 0
+    if cursor:
+        values = decode_cursor(cursor, sort)
+        try:
+            last_score, last_id = float(values[0]), values[1]
+        except (IndexError, TypeError, ValueError):
+            raise ValueError('Invalid cursor')
+        while start < len(ranked) and (ranked[start][1], ranked[start][0]) >= (last_score, last_id):
+            start += 1
+
+    page = ranked[start:start + limit]
+    rows_by_id = {}
+    if page:
+        rows_by_id = {getattr(row, id_column.key): row
+                      for row in query.filter(id_column.in_([doc_id for doc_id, _ in page]))}
+    rows = [rows_by_id[doc_id] for doc_id, _ in page if doc_id in rows_by_id]
+
+    next_cursor = None
+    if start + limit < len(ranked):
+        last_id, last_score = page[-1]
+        next_cursor = encode_cursor(sort, [last_score, last_id])
+    return rows, next_cursor
+
+
+def iter_batches(query, columns: Sequence[Tuple[Any, bool]], batch_size: int = 500):
+    """
+    Yield the rows of ``query`` in keyset order as lists of at most
+    ``batch_size`` rows. Each batch is its own bounded query, so callers can
+    load related rows per batch; yielded rows are expunged from the session
+    afterwards to keep memory flat for arbitrarily large results.
+    """
+    ordered = query.order_by(*[column.desc() if descending else column.asc()
+                               for column, descending in columns])
+    values = None
+    while True:
+        batch_query = ordered if values is None else ordered.filter(_after(columns, values))
+        rows = batch_query.limit(batch_size).all()
+        if not rows:
+            return
+        yield rows
+        if len(rows) < batch_size:
+            return
+        values = [getattr(rows[-1], column.key) for column, _ in columns]
+        for row in rows:
+            ordered.session.expunge(row)
+
+
+def iter_ranked_batches(query, id_column, ranking: Sequence[Tuple[Any, float]], batch_size: int = 500):
+    """Yield the rows of ``query`` in the order of ``ranking``, ``batch_size`` ids at a time"""
+    for start in range(0, len(ranking), batch_size):
+        ids = [doc_id for doc_id, _ in ranking[start:start + batch_size]]
+        rows_by_id = {getattr(row, id_column.key): row for row in query.filter(id_column.in_(ids))}
+        rows = [rows_by_id[doc_id] for doc_id in ids if doc_id in rows_by_id]
+        if rows:
+            yield rows
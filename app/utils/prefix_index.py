@@ -0,0 +1,106 @@
+"""In-memory prefix index for autocomplete, a sorted array searched with bisect"""
+
+import heapq
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Dict, List, Optional, Tuple
+
+from .text_index import TOKEN_PATTERN
+
+
+def normalize(text: Optional[str]) -> str:
+    """Lowercase ``text`` and collapse it to single-space separated words"""
+    return ' '.join(TOKEN_PATTERN.findall((text or '').lower()))
+
+
+class PrefixIndex:
+    """
+    Sorted ``(key, entry_id)`` array where every entry is keyed by its
+    normalized text from each word onwards, so a query matches entries
+    having a word that starts with it ("bre" finds "Sourdough Bread").
+    Lookups are a bisect plus a scan of the matching range; matches are
+    ranked by the entry's score, with a bonus when the whole text starts
+    with the query.
+    """
+
+    PREFIX_BONUS = 1.0
+
+    def __init__(self):
+        self._keys: List[Tuple[str, str]] = []
+        # entry_id -> (text, score, payload, normalized text)
+        self._entries: Dict[str, Tuple[str, float, Dict[str, Any], str]] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, entry_id: str) -> bool:
+        return entry_id in self._entries
+
+    def get(self, entry_id: str) -> Optional[Tuple[str, float, Dict[str, Any]]]:
+        """The ``(text, score, payload)`` of an indexed entry"""
+        entry = self._entries.get(entry_id)
+        return entry[:3] if entry else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys = []
+            self._entries.clear()
+
+    def load(self, entries) -> None:
+        """Replace the contents with ``(entry_id, text, score, payload)`` entries, sorting once"""
+        keys, stored = [], {}
+        for entry_id, text, score, payload in entries:
+            stored[entry_id] = (text, score, payload, normalize(text))
+            keys.extend((key, entry_id) for key in self._entry_keys(text))
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._entries = stored
+
+    def add(self, entry_id: str, text: str, score: float, payload: Optional[Dict[str, Any]] = None) -> None:
+        """Index (or re-index) an entry"""
+        with self._lock:
+            self._remove(entry_id)
+            self._entries[entry_id] = (text, score, payload or {}, normalize(text))
+            for key in self._entry_keys(text):
+                insort(self._keys, (key, entry_id))
+
+    def remove(self, entry_id: str) -> None:
+        with self._lock:
+            self._remove(entry_id)
+
+    def _remove(self, entry_id: str) -> None:
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for key in self._entry_keys(entry[0]):
+            position = bisect_left(self._keys, (key, entry_id))
+            if position < len(self._keys) and self._keys[position] == (key, entry_id):
+                del self._keys[position]
+
+    @staticmethod
+    def _entry_keys(text: str) -> List[str]:
+        words = normalize(text).split(' ')
+        return sorted({' '.join(words[i:]) for i in range(len(words)) if words[i]})
+
+    def search(self, query: str, limit: int = 8) -> List[Tuple[str, float, str, Dict[str, Any]]]:
+        """Return up to ``limit`` ``(entry_id, score, text, payload)`` matches, best first"""
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            keys, entries = self._keys, self._entries
+            scores: Dict[str, float] = {}
+            position = bisect_left(keys, (prefix, ''))
+            while position < len(keys) and keys[position][0].startswith(prefix):
+                key, entry_id = keys[position]
+                score = entries[entry_id][1]
+                if key == entries[entry_id][3]:
+                    # Matched from the first word
+                    score += self.PREFIX_BONUS
+                if score > scores.get(entry_id, float('-inf')):
+                    scores[entry_id] = score
+                position += 1
+            best = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+            return [(entry_id, score, entries[entry_id][0], entries[entry_id][2]) for entry_id, score in best]
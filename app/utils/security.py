@@ -2,7 +2,7 @@ import jwt
 import bcrypt
 from datetime import datetime, timedelta
 from functools import wraps
-from flask import current_app, request, jsonify
+from flask import current_app, g, request, jsonify
 from ..models.user import User
 
 def generate_password_hash(password):
@@ -39,6 +39,7 @@ def token_required(f):
         except jwt.InvalidTokenError:
             return jsonify({'message': 'Invalid token'}), 401
             
+        g.current_user = current_user
         return f(current_user, *args, **kwargs)
         
     return decorated
\ No newline at end of file
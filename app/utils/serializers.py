@@ -0,0 +1,174 @@
+"""Batch loaders and field projection used when serializing lists of products and sellers"""
+
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ..models.product import ProductImage
+from ..models.seller import Seller
+from .media import variant_url
+from .. import db
+
+
+def load_sellers(seller_ids: Iterable[str]) -> Dict[str, Any]:
+    """Load the (id, store_name) of the sellers of a batch of products with a single IN query"""
+    ids = {seller_id for seller_id in seller_ids if seller_id}
+    if not ids:
+        return {}
+    rows = db.session.query(Seller.id, Seller.store_name).filter(Seller.id.in_(ids))
+    return {row.id: row for row in rows}
+
+
+def load_images(product_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """Load the image URLs of a batch of products with a single IN query"""
+    ids = {product_id for product_id in product_ids if product_id}
+    if not ids:
+        return {}
+    images: Dict[str, List[str]] = {}
+    rows = db.session.query(ProductImage.product_id, ProductImage.image_url).filter(
+        ProductImage.product_id.in_(ids)
+    )
+    for product_id, image_url in rows:
+        images.setdefault(product_id, []).append(image_url)
+    return images
+
+
+def load_primary_images(product_ids: Iterable[str]) -> Dict[str, str]:
+    """Load the primary image URL (or the first image) of a batch of products"""
+    ids = {product_id for product_id in product_ids if product_id}
+    if not ids:
+        return {}
+    primary: Dict[str, str] = {}
+    rows = db.session.query(ProductImage.product_id, ProductImage.image_url, ProductImage.is_primary) \
+        .filter(ProductImage.product_id.in_(ids))
+    for product_id, image_url, is_primary in rows:
+        if is_primary or product_id not in primary:
+            primary[product_id] = image_url
+    return primary
+
+
+def _number(value) -> float:
+    return float(value) if value is not None else 0
+
+
+# API field -> (product columns it reads, value getter taking the product and batch-loaded rows)
+PRODUCT_FIELDS = {
+    'id': (('id',), lambda p, related: p.id),
+    'name': (('name',), lambda p, related: p.name),
+    'description': (('description',), lambda p, related: p.description),
+    'price': (('price',), lambda p, related: _number(p.price)),
+    'stock': (('stock',), lambda p, related: p.stock or 0),
+    'category': (('category',), lambda p, related: p.category),
+    'type': (('type',), lambda p, related: p.type),
+    'rating': (('rating',), lambda p, related: _number(p.rating)),
+    'images': ((), lambda p, related: related['images'].get(p.id, [])),
+    'primaryImage': ((), lambda p, related: related['primary_images'].get(p.id)),
+    'thumbnail': ((), lambda p, related: variant_url(related['primary_images'].get(p.id), 'thumbnail')),
+    'sellerId': (('seller_id',), lambda p, related: p.seller_id),
+    'sellerName': (('seller_id',), lambda p, related: getattr(
+        related['sellers'].get(p.seller_id), 'store_name', None)),
+    'createdAt': (('created_at',), lambda p, related: p.created_at.isoformat() if p.created_at else None),
+}
+
+# Fields returned when the client does not ask for specific ones
+DEFAULT_PRODUCT_FIELDS = (
+    'id', 'name', 'description', 'price', 'stock', 'category', 'type', 'rating',
+    'images', 'sellerId', 'sellerName', 'createdAt'
+)
+
+# Listing pages show a small thumbnail of the primary image
+DEFAULT_LISTING_FIELDS = DEFAULT_PRODUCT_FIELDS + ('thumbnail',)
+
+
+# Product listing rows (see ProductListing) carry their seller, images and counters
+LISTING_FIELDS = {
+    **PRODUCT_FIELDS,
+    'images': (('image_urls',), lambda p, related: p.image_urls or []),
+    'primaryImage': (('primary_image_url',), lambda p, related: p.primary_image_url),
+    'thumbnail': (('primary_image_url',), lambda p, related: variant_url(p.primary_image_url, 'thumbnail')),
+    'sellerName': (('seller_store_name',), lambda p, related: p.seller_store_name),
+    'sellerProvince': (('seller_province',), lambda p, related: p.seller_province),
+    'reviewCount': (('review_count',), lambda p, related: p.review_count or 0),
+    'salesCount': (('sales_count',), lambda p, related: p.sales_count or 0),
+}
+
+# Seller API field -> (seller columns it reads, value getter taking the seller and batch-loaded rows)
+SELLER_FIELDS = {
+    'id': (('id',), lambda s, related: s.id),
+    'user_id': (('user_id',), lambda s, related: s.user_id),
+    'store_name': (('store_name',), lambda s, related: s.store_name),
+    'description': (('description',), lambda s, related: s.description),
+    'image_url': (('image_url',), lambda s, related: s.image_url),
+    'location': (('location',), lambda s, related: s.location),
+    'province': (('province',), lambda s, related: s.province),
+    'rating': (('rating',), lambda s, related: _number(s.rating)),
+    'category': (('category',), lambda s, related: s.category),
+    'joined_date': (('joined_date',), lambda s, related: s.joined_date.isoformat() if s.joined_date else None),
+    'total_products': (('total_products',), lambda s, related: s.total_products or 0),
+    'in_stock_products': (('in_stock_products',), lambda s, related: s.in_stock_products or 0),
+}
+
+DEFAULT_SELLER_FIELDS = tuple(SELLER_FIELDS)
+
+
+def parse_fields(value: Optional[str], available: Iterable[str]) -> Optional[Tuple[str, ...]]:
+    """Parse a ``?fields=a,b,c`` sparse fieldset; ``None`` when not given"""
+    if not value:
+        return None
+    fields = tuple(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in available]
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+    return fields
+
+
+def product_columns(fields: Sequence[str]) -> List[str]:
+    """Product columns needed to render ``fields`` (always including the id)"""
+    return _columns(PRODUCT_FIELDS, fields)
+
+
+def listing_columns(fields: Sequence[str]) -> List[str]:
+    """Listing columns needed to render ``fields`` (always including the id)"""
+    return _columns(LISTING_FIELDS, fields)
+
+
+def seller_columns(fields: Sequence[str]) -> List[str]:
+    """Seller columns needed to render ``fields`` (always including the id)"""
+    return _columns(SELLER_FIELDS, fields)
+
+
+def _columns(available, fields: Sequence[str]) -> List[str]:
+    columns = {'id'}
+    for field in fields:
+        columns.update(available[field][0])
+    return sorted(columns)
+
+
+def serialize_products(products: Sequence[Any], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Serialize a batch of products to the requested API fields. Sellers and
+    images are loaded with one IN query each, and only when a requested
+    field needs them.
+    """
+    related: Dict[str, Dict[str, Any]] = {}
+    if 'sellerName' in fields:
+        related['sellers'] = load_sellers(p.seller_id for p in products)
+    if 'images' in fields:
+        related['images'] = load_images(p.id for p in products)
+    if 'primaryImage' in fields or 'thumbnail' in fields:
+        related['primary_images'] = load_primary_images(p.id for p in products)
+    return _serialize(PRODUCT_FIELDS, products, fields, related)
+
+
+def serialize_listings(listings: Sequence[Any], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Serialize product listing rows; everything is on the row, so no extra queries"""
+    return _serialize(LISTING_FIELDS, listings, fields, {})
+
+
+def serialize_sellers(sellers: Sequence[Any], fields: Sequence[str]) -> List[Dict[str, Any]]:
+    """Serialize a batch of sellers; everything is on the row, so no extra queries"""
+    return _serialize(SELLER_FIELDS, sellers, fields, {})
+
+
+def _serialize(available, rows: Sequence[Any], fields: Sequence[str],
+               related: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    getters = [(field, available[field][1]) for field in fields]
+    return [{field: getter(row, related) for field, getter in getters} for row in rows]
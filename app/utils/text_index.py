@@ -0,0 +1,155 @@
+"""In-memory inverted index with BM25 relevance ranking"""
+
+import math
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+# Common English and Indonesian words that carry no meaning for catalog search
+STOPWORDS = frozenset({
+    'a', 'an', 'and', 'are', 'as', 'at', 'by', 'for', 'from', 'in', 'is', 'it',
+    'of', 'on', 'or', 'the', 'to', 'with',
+    'dan', 'atau', 'dari', 'di', 'ke', 'yang', 'untuk', 'dengan', 'ini', 'itu',
+})
+
+# Maximum number of vocabulary terms a trailing prefix may expand to
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Split text into lowercase word tokens, dropping stopwords"""
+    if not text:
+        return []
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    Term -> postings index over weighted text fields.
+
+    Documents are added with ``(text, weight)`` pairs; a field's term
+    frequencies are multiplied by its weight so e.g. matches in a name rank
+    above matches in a description. Queries are scored with Okapi BM25 and
+    the last query token also matches as a prefix, so partially typed words
+    find results.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._documents: Dict[str, Counter] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._vocabulary: List[str] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._documents
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._documents.clear()
+            self._lengths.clear()
+            self._total_length = 0
+            self._vocabulary = []
+
+    def add(self, doc_id: str, fields: Iterable[Tuple[Optional[str], int]]) -> None:
+        """Index (or re-index) a document"""
+        terms: Counter = Counter()
+        for text, weight in fields:
+            for token in tokenize(text):
+                terms[token] += weight
+
+        with self._lock:
+            self._remove(doc_id)
+            if not terms:
+                return
+            self._documents[doc_id] = terms
+            length = sum(terms.values())
+            self._lengths[doc_id] = length
+            self._total_length += length
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    insort(self._vocabulary, term)
+                postings[doc_id] = frequency
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id: str) -> None:
+        terms = self._documents.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Return ``(doc_id, score)`` pairs sorted by descending score (ties by
+        descending id), matching any of the query terms.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+
+        with self._lock:
+            if not self._documents:
+                return []
+            scores: Dict[str, float] = {}
+            for position, token in enumerate(tokens):
+                terms = [token]
+                if position == len(tokens) - 1:
+                    terms = self._expand_prefix(token)
+                # A query token matching several expansions counts only its best one
+                best: Dict[str, float] = {}
+                for term in terms:
+                    for doc_id, score in self._score_term(term):
+                        if score > best.get(doc_id, 0.0):
+                            best[doc_id] = score
+                for doc_id, score in best.items():
+                    scores[doc_id] = scores.get(doc_id, 0.0) + score
+
+        ranked = sorted(scores.items(), key=lambda item: (item[1], item[0]), reverse=True)
+        return ranked[:limit] if limit else ranked
+
+    def _expand_prefix(self, prefix: str) -> Sequence[str]:
+        start = bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        if prefix not in terms:
+            terms.append(prefix)
+        return terms
+
+    def _score_term(self, term: str) -> Iterable[Tuple[str, float]]:
+        postings = self._postings.get(term)
+        if not postings:
+            return []
+        count = len(self._documents)
+        average_length = self._total_length / count
+        idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+        return [
+            (doc_id, idf * frequency * (self.k1 + 1) / (
+                frequency + self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / average_length)
+            ))
+            for doc_id, frequency in postings.items()
+        ]
@@ -0,0 +1,34 @@
+"""Relative upserts for counter rows maintained alongside the source tables"""
+
+from typing import Any, Dict, List, Sequence
+
+
+def increment_rows(session, model, keys: Sequence[str], increments: Sequence[str],
+                   rows: List[Dict[str, Any]]) -> None:
+    """
+    Insert ``rows`` into ``model``'s table, or for rows whose ``keys``
+    already exist add their ``increments`` columns to the stored values
+    (other columns keep their stored value). Rows are written in key
+    order, so concurrent writers lock them in the same order.
+    """
+    if not rows:
+        return
+    rows = sorted(rows, key=lambda row: tuple(row[key] for key in keys))
+    table = model.__table__
+    dialect = session.get_bind(mapper=model.__mapper__).dialect.name
+    if dialect == 'mysql':
+        from sqlalchemy.dialects.mysql import insert
+        statement = insert(table)
+        statement = statement.on_duplicate_key_update(
+            {column: table.c[column] + statement.inserted[column] for column in increments}
+        )
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: table.c[column] + statement.excluded[column] for column in increments}
+        )
+    else:
+        raise ValueError(f'Counter upserts are not supported on {dialect}')
+    session.execute(statement, rows)
@@ -1,4 +1,5 @@
 import re
+from decimal import Decimal, InvalidOperation
 from typing import Dict, Any
 
 def validate_email(email: str) -> bool:
@@ -23,4 +24,69 @@ def validate_password(password: str) -> Dict[str, Any]:
 
 def validate_phone(phone: str) -> bool:
     pattern = r'^\+?[\d\s-]{10,}$'
-    return bool(re.match(pattern, phone))
\ No newline at end of file
+    return bool(re.match(pattern, phone))
+PRODUCT_TYPES = ('standard', 'premium')
+PRODUCT_REQUIRED_FIELDS = ('name', 'description', 'price', 'stock', 'category', 'type')
+
+def validate_product(data: Dict[str, Any], partial: bool = False) -> Dict[str, Any]:
+    """
+    Validate and normalize a product payload (as sent by clients or read
+    from a CSV upload, where every value is a string). With ``partial``
+    only the fields present are checked.
+    """
+    errors = []
+    values: Dict[str, Any] = {}
+    if not isinstance(data, dict):
+        return {'valid': False, 'errors': ["Row must be an object"], 'values': values}
+
+    if not partial:
+        missing = [field for field in PRODUCT_REQUIRED_FIELDS if data.get(field) in (None, '')]
+        if missing:
+            errors.append(f"Missing required field(s): {', '.join(missing)}")
+
+    for field, max_length in (('name', 100), ('category', 50)):
+        if data.get(field) not in (None, ''):
+            value = str(data[field]).strip()
+            if len(value) > max_length:
+                errors.append(f"{field} must be at most {max_length} characters")
+            values[field] = value
+    if 'description' in data:
+        values['description'] = data['description']
+
+    if data.get('price') not in (None, ''):
+        try:
+            values['price'] = Decimal(str(data['price']))
+            if not values['price'].is_finite() or values['price'] <= 0:
+                errors.append("Price must be positive")
+        except InvalidOperation:
+            errors.append("Price must be a number")
+    if data.get('stock') not in (None, ''):
+        # Whole numbers only: int() would truncate 1.9 and accept booleans
+        stock = data['stock']
+        if isinstance(stock, int) and not isinstance(stock, bool):
+            values['stock'] = stock
+            if stock < 0:
+                errors.append("Stock cannot be negative")
+        elif isinstance(stock, str) and re.fullmatch(r'\d+', stock.strip()):
+            values['stock'] = int(stock.strip())
+        else:
+            errors.append("Stock must be a non-negative integer")
+    if data.get('type') not in (None, ''):
+        if data['type'] not in PRODUCT_TYPES:
+            errors.append(f"type must be one of: {', '.join(PRODUCT_TYPES)}")
+        values['type'] = data['type']
+
+    if data.get('images') is not None:
+        images = data['images']
+        if isinstance(images, str):
+            # CSV cells list their image URLs separated by '|'
+            images = [url.strip() for url in images.split('|') if url.strip()]
+        if not isinstance(images, list) or not all(isinstance(url, str) and len(url) <= 255 for url in images):
+            errors.append("images must be a list of URLs of at most 255 characters")
+        values['images'] = images
+
+    return {
+        'valid': len(errors) == 0,
+        'errors': errors,
+        'values': values
+    }
@@ -0,0 +1,6 @@
+-- Full-text indexes used by product and seller search (SearchService).
+-- Apply to databases created before these indexes were added to schema.sql.
+USE local_food_market;
+
+CREATE FULLTEXT INDEX ft_products_search ON products(name, category, description);
+CREATE FULLTEXT INDEX ft_sellers_search ON sellers(store_name, category, location, description);
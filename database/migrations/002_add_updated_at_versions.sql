@@ -0,0 +1,11 @@
+-- Version columns backing HTTP conditional GET (ETag / Last-Modified)
+-- for products and sellers.
+USE local_food_market;
+
+ALTER TABLE products
+    ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+ALTER TABLE sellers
+    ADD COLUMN updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6);
+
+CREATE INDEX idx_products_updated_at ON products(updated_at);
+CREATE INDEX idx_sellers_updated_at ON sellers(updated_at);
@@ -0,0 +1,31 @@
+-- Denormalized read model behind the product listings (see ProductListing).
+-- Populate it after migrating with: flask rebuild-product-listing
+USE local_food_market;
+
+CREATE TABLE product_listing (
+    id VARCHAR(36) PRIMARY KEY,
+    seller_id VARCHAR(36),
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    price DECIMAL(12,2) NOT NULL,
+    stock INT DEFAULT 0,
+    category VARCHAR(50),
+    type ENUM('standard', 'premium') DEFAULT 'standard',
+    rating DECIMAL(3,2) DEFAULT 0,
+    created_at TIMESTAMP NULL,
+    seller_store_name VARCHAR(100),
+    seller_province VARCHAR(50),
+    primary_image_url VARCHAR(255),
+    image_urls JSON,
+    review_count INT NOT NULL DEFAULT 0,
+    sales_count INT NOT NULL DEFAULT 0,
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    FOREIGN KEY (id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_product_listing_newest ON product_listing(created_at, id);
+CREATE INDEX idx_product_listing_rating ON product_listing(rating, id);
+CREATE INDEX idx_product_listing_price ON product_listing(price, id);
+CREATE INDEX idx_product_listing_seller ON product_listing(seller_id, created_at, id);
+CREATE INDEX idx_product_listing_category ON product_listing(category, created_at, id);
+CREATE INDEX idx_product_listing_updated_at ON product_listing(updated_at);
@@ -0,0 +1,27 @@
+-- Composite indexes for the hot listing, seller and order history queries,
+-- found with `flask advise-indexes` (EXPLAIN of the captured queries).
+-- The single-column indexes they make redundant are dropped afterwards.
+USE local_food_market;
+
+-- Category pages filtered by price range; seller pages and featured products by rating
+CREATE INDEX idx_products_category_price ON products(category, price);
+CREATE INDEX idx_products_seller_rating ON products(seller_id, rating);
+CREATE INDEX idx_products_rating ON products(rating, id);
+
+-- Seller filters by province or category, ranked by rating
+CREATE INDEX idx_sellers_province_rating ON sellers(province, rating, id);
+CREATE INDEX idx_sellers_category_rating ON sellers(category, rating, id);
+
+-- A user's order history, newest first
+CREATE INDEX idx_orders_user_created ON orders(user_id, created_at);
+
+-- Listing read model: price ranges within a category or seller, ratings within a category or seller
+CREATE INDEX idx_product_listing_category_price ON product_listing(category, price, id);
+CREATE INDEX idx_product_listing_category_rating ON product_listing(category, rating, id);
+CREATE INDEX idx_product_listing_seller_price ON product_listing(seller_id, price, id);
+CREATE INDEX idx_product_listing_seller_rating ON product_listing(seller_id, rating, id);
+
+-- Prefixes of the indexes above
+DROP INDEX idx_products_category ON products;
+DROP INDEX idx_products_seller ON products;
+DROP INDEX idx_orders_user ON orders;
@@ -0,0 +1,10 @@
+-- "Frequently bought together" neighbours per product, written by
+-- `flask build-recommendations` (see RecommendationService).
+USE local_food_market;
+
+CREATE TABLE product_recommendations (
+    product_id VARCHAR(36) PRIMARY KEY,
+    neighbours JSON NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
@@ -0,0 +1,17 @@
+-- Uploaded images, stored once per distinct content under their SHA-256
+-- digest, with the resized variants made in the background (see MediaService).
+USE local_food_market;
+
+CREATE TABLE media_assets (
+    id CHAR(64) PRIMARY KEY,
+    uploaded_by VARCHAR(36),
+    content_type VARCHAR(50) NOT NULL,
+    size INT NOT NULL,
+    width INT,
+    height INT,
+    status ENUM('pending', 'ready', 'failed') NOT NULL DEFAULT 'pending',
+    variants JSON,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (uploaded_by) REFERENCES users(id)
+);
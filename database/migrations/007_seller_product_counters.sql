@@ -0,0 +1,17 @@
+-- Product counters maintained on sellers (see SellerCounterService), so
+-- seller listings no longer count the products table. Run
+-- `flask reconcile-seller-counters` to repair drift later on.
+USE local_food_market;
+
+ALTER TABLE sellers
+    ADD COLUMN total_products INT NOT NULL DEFAULT 0 AFTER joined_date,
+    ADD COLUMN in_stock_products INT NOT NULL DEFAULT 0 AFTER total_products;
+
+UPDATE sellers s
+LEFT JOIN (
+    SELECT seller_id, COUNT(*) AS total, SUM(stock > 0) AS in_stock
+    FROM products
+    GROUP BY seller_id
+) p ON p.seller_id = s.id
+SET s.total_products = COALESCE(p.total, 0),
+    s.in_stock_products = COALESCE(p.in_stock, 0);
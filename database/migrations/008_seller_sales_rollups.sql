@@ -0,0 +1,25 @@
+-- Daily sales rollups per seller and per seller product, maintained as
+-- orders are placed or cancelled (see AnalyticsService). Fill them from
+-- the existing orders with `flask backfill-seller-analytics`.
+USE local_food_market;
+
+CREATE TABLE seller_daily_sales (
+    seller_id VARCHAR(36) NOT NULL,
+    day DATE NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_id, day),
+    FOREIGN KEY (seller_id) REFERENCES sellers(id) ON DELETE CASCADE
+);
+
+CREATE TABLE seller_product_daily_sales (
+    seller_id VARCHAR(36) NOT NULL,
+    day DATE NOT NULL,
+    product_id VARCHAR(36) NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_id, day, product_id),
+    FOREIGN KEY (seller_id) REFERENCES sellers(id) ON DELETE CASCADE
+);
@@ -0,0 +1,40 @@
+-- Seller dimension of orders: the seller of each order item and one
+-- seller_orders row per seller and order, so a seller's inbox is one
+-- index range scan (see SellerOrderService). `flask rebuild-seller-orders`
+-- recomputes the rows.
+USE local_food_market;
+
+ALTER TABLE order_items
+    ADD COLUMN seller_id VARCHAR(36) AFTER product_id,
+    ADD FOREIGN KEY (seller_id) REFERENCES sellers(id);
+
+UPDATE order_items oi
+JOIN products p ON p.id = oi.product_id
+SET oi.seller_id = p.seller_id;
+
+CREATE INDEX idx_order_items_seller_order ON order_items(seller_id, order_id);
+
+CREATE TABLE seller_orders (
+    seller_id VARCHAR(36) NOT NULL,
+    order_id VARCHAR(36) NOT NULL,
+    status ENUM('pending', 'processing', 'shipped', 'delivered', 'cancelled'),
+    is_open BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at DATETIME NOT NULL,
+    item_count INT NOT NULL DEFAULT 0,
+    subtotal DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_id, order_id),
+    FOREIGN KEY (seller_id) REFERENCES sellers(id) ON DELETE CASCADE,
+    FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE
+);
+
+INSERT INTO seller_orders (seller_id, order_id, status, is_open, created_at, item_count, subtotal)
+SELECT oi.seller_id, o.id, o.status, o.status IS NULL OR o.status IN ('pending', 'processing', 'shipped'),
+       o.created_at, COUNT(*), SUM(oi.price_at_time * oi.quantity)
+FROM order_items oi
+JOIN orders o ON o.id = oi.order_id
+WHERE oi.seller_id IS NOT NULL
+GROUP BY oi.seller_id, o.id, o.status, o.created_at;
+
+CREATE INDEX idx_seller_orders_created ON seller_orders(seller_id, created_at, order_id);
+CREATE INDEX idx_seller_orders_status ON seller_orders(seller_id, status, created_at, order_id);
+CREATE INDEX idx_seller_orders_open ON seller_orders(seller_id, is_open, created_at, order_id);
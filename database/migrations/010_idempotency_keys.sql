@@ -0,0 +1,16 @@
+-- Requests made with an Idempotency-Key header and their stored responses,
+-- replayed for retries of the same key (see utils/idempotency.py). Run
+-- `flask purge-idempotency-keys` periodically to delete expired keys.
+USE local_food_market;
+
+CREATE TABLE idempotency_keys (
+    id CHAR(64) PRIMARY KEY,
+    fingerprint CHAR(64) NOT NULL,
+    status_code SMALLINT,
+    content_type VARCHAR(100),
+    body MEDIUMBLOB,
+    created_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL
+);
+
+CREATE INDEX idx_idempotency_keys_expires ON idempotency_keys(expires_at);
@@ -0,0 +1,20 @@
+-- Transactional outbox: events written in the same transaction as the
+-- change they describe and handled afterwards by the outbox workers (see
+-- OutboxService, `flask outbox-worker`).
+USE local_food_market;
+
+CREATE TABLE outbox_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    topic VARCHAR(100) NOT NULL,
+    aggregate_id VARCHAR(36),
+    payload JSON NOT NULL,
+    status ENUM('pending', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    available_at DATETIME NOT NULL,
+    claimed_by VARCHAR(36),
+    last_error TEXT,
+    created_at DATETIME NOT NULL
+);
+
+CREATE INDEX idx_outbox_events_due ON outbox_events(status, available_at, id);
+CREATE INDEX idx_outbox_events_claimed ON outbox_events(claimed_by);
@@ -0,0 +1,17 @@
+-- Order status timeline: order_status_history becomes an append-only log
+-- written on every status change (see OrderService.update_order_status),
+-- read per order from one index range.
+USE local_food_market;
+
+-- Microseconds keep the changes of one second in order
+ALTER TABLE order_status_history
+    MODIFY created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6);
+
+CREATE INDEX idx_order_status_history_order ON order_status_history(order_id, created_at, id);
+
+-- Orders placed before the history was written start with their current status
+INSERT INTO order_status_history (id, order_id, status, created_at, updated_by)
+SELECT UUID(), o.id, COALESCE(o.status, 'pending'), COALESCE(o.created_at, NOW(6)), o.user_id
+FROM orders o
+WHERE o.user_id IS NOT NULL
+  AND NOT EXISTS (SELECT 1 FROM order_status_history h WHERE h.order_id = o.id);
@@ -0,0 +1,22 @@
+-- Order history summary: per-user, per-status order counts and amounts
+-- maintained with the orders (see UserOrderStatsService), and an index for
+-- a user's orders in one status. `flask rebuild-user-order-stats`
+-- recomputes the counters.
+USE local_food_market;
+
+CREATE TABLE user_order_stats (
+    user_id VARCHAR(36) NOT NULL,
+    status ENUM('pending', 'processing', 'shipped', 'delivered', 'cancelled') NOT NULL,
+    order_count INT NOT NULL DEFAULT 0,
+    amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, status),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+INSERT INTO user_order_stats (user_id, status, order_count, amount)
+SELECT user_id, COALESCE(status, 'pending'), COUNT(*), SUM(total_amount)
+FROM orders
+WHERE user_id IS NOT NULL
+GROUP BY user_id, COALESCE(status, 'pending');
+
+CREATE INDEX idx_orders_user_status_created ON orders(user_id, status, created_at);
@@ -26,6 +26,9 @@ CREATE TABLE sellers (
     rating DECIMAL(3,2) DEFAULT 0,
     category VARCHAR(50),
     joined_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    total_products INT NOT NULL DEFAULT 0,
+    in_stock_products INT NOT NULL DEFAULT 0,
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
@@ -41,6 +44,7 @@ CREATE TABLE products (
     type ENUM('standard', 'premium') DEFAULT 'standard',
     rating DECIMAL(3,2) DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
     FOREIGN KEY (seller_id) REFERENCES sellers(id) ON DELETE CASCADE
 );
 
@@ -86,10 +90,12 @@ CREATE TABLE order_items (
     id VARCHAR(36) PRIMARY KEY,
     order_id VARCHAR(36) NOT NULL,
     product_id VARCHAR(36) NOT NULL,
+    seller_id VARCHAR(36),
     quantity INT NOT NULL,
     price_at_time DECIMAL(12,2) NOT NULL,
     FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
-    FOREIGN KEY (product_id) REFERENCES products(id)
+    FOREIGN KEY (product_id) REFERENCES products(id),
+    FOREIGN KEY (seller_id) REFERENCES sellers(id)
 );
 
 -- Order status history
@@ -98,7 +104,7 @@ CREATE TABLE order_status_history (
     order_id VARCHAR(36) NOT NULL,
     status ENUM('pending', 'processing', 'shipped', 'delivered', 'cancelled') NOT NULL,
     note TEXT,
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    created_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6),
     updated_by VARCHAR(36) NOT NULL,
     FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE,
     FOREIGN KEY (updated_by) REFERENCES users(id)
@@ -127,11 +133,149 @@ CREATE TABLE reviews (
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
+-- Denormalized product listing read model (maintained by the application)
+CREATE TABLE product_listing (
+    id VARCHAR(36) PRIMARY KEY,
+    seller_id VARCHAR(36),
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    price DECIMAL(12,2) NOT NULL,
+    stock INT DEFAULT 0,
+    category VARCHAR(50),
+    type ENUM('standard', 'premium') DEFAULT 'standard',
+    rating DECIMAL(3,2) DEFAULT 0,
+    created_at TIMESTAMP NULL,
+    seller_store_name VARCHAR(100),
+    seller_province VARCHAR(50),
+    primary_image_url VARCHAR(255),
+    image_urls JSON,
+    review_count INT NOT NULL DEFAULT 0,
+    sales_count INT NOT NULL DEFAULT 0,
+    updated_at DATETIME(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+    FOREIGN KEY (id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- "Frequently bought together" neighbours per product (built offline)
+CREATE TABLE product_recommendations (
+    product_id VARCHAR(36) PRIMARY KEY,
+    neighbours JSON NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+CREATE TABLE media_assets (
+    id CHAR(64) PRIMARY KEY,
+    uploaded_by VARCHAR(36),
+    content_type VARCHAR(50) NOT NULL,
+    size INT NOT NULL,
+    width INT,
+    height INT,
+    status ENUM('pending', 'ready', 'failed') NOT NULL DEFAULT 'pending',
+    variants JSON,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (uploaded_by) REFERENCES users(id)
+);
+
+CREATE TABLE seller_daily_sales (
+    seller_id VARCHAR(36) NOT NULL,
+    day DATE NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_id, day),
+    FOREIGN KEY (seller_id) REFERENCES sellers(id) ON DELETE CASCADE
+);
+
+CREATE TABLE seller_product_daily_sales (
+    seller_id VARCHAR(36) NOT NULL,
+    day DATE NOT NULL,
+    product_id VARCHAR(36) NOT NULL,
+    units INT NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_id, day, product_id),
+    FOREIGN KEY (seller_id) REFERENCES sellers(id) ON DELETE CASCADE
+);
+
+CREATE TABLE seller_orders (
+    seller_id VARCHAR(36) NOT NULL,
+    order_id VARCHAR(36) NOT NULL,
+    status ENUM('pending', 'processing', 'shipped', 'delivered', 'cancelled'),
+    is_open BOOLEAN NOT NULL DEFAULT TRUE,
+    created_at DATETIME NOT NULL,
+    item_count INT NOT NULL DEFAULT 0,
+    subtotal DECIMAL(12,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (seller_id, order_id),
+    FOREIGN KEY (seller_id) REFERENCES sellers(id) ON DELETE CASCADE,
+    FOREIGN KEY (order_id) REFERENCES orders(id) ON DELETE CASCADE
+);
+
+CREATE TABLE idempotency_keys (
+    id CHAR(64) PRIMARY KEY,
+    fingerprint CHAR(64) NOT NULL,
+    status_code SMALLINT,
+    content_type VARCHAR(100),
+    body MEDIUMBLOB,
+    created_at DATETIME NOT NULL,
+    expires_at DATETIME NOT NULL
+);
+
+CREATE TABLE outbox_events (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    topic VARCHAR(100) NOT NULL,
+    aggregate_id VARCHAR(36),
+    payload JSON NOT NULL,
+    status ENUM('pending', 'failed') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    available_at DATETIME NOT NULL,
+    claimed_by VARCHAR(36),
+    last_error TEXT,
+    created_at DATETIME NOT NULL
+);
+
+CREATE TABLE user_order_stats (
+    user_id VARCHAR(36) NOT NULL,
+    status ENUM('pending', 'processing', 'shipped', 'delivered', 'cancelled') NOT NULL,
+    order_count INT NOT NULL DEFAULT 0,
+    amount DECIMAL(14,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, status),
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
 -- Indexes for better query performance
-CREATE INDEX idx_products_seller ON products(seller_id);
-CREATE INDEX idx_products_category ON products(category);
-CREATE INDEX idx_orders_user ON orders(user_id);
+CREATE INDEX idx_products_category_price ON products(category, price);
+CREATE INDEX idx_products_seller_rating ON products(seller_id, rating);
+CREATE INDEX idx_products_rating ON products(rating, id);
+CREATE INDEX idx_sellers_province_rating ON sellers(province, rating, id);
+CREATE INDEX idx_sellers_category_rating ON sellers(category, rating, id);
+CREATE INDEX idx_orders_user_created ON orders(user_id, created_at);
 CREATE INDEX idx_orders_status ON orders(status);
+CREATE INDEX idx_orders_user_status_created ON orders(user_id, status, created_at);
+CREATE INDEX idx_order_status_history_order ON order_status_history(order_id, created_at, id);
+CREATE INDEX idx_order_items_seller_order ON order_items(seller_id, order_id);
+CREATE INDEX idx_seller_orders_created ON seller_orders(seller_id, created_at, order_id);
+CREATE INDEX idx_seller_orders_status ON seller_orders(seller_id, status, created_at, order_id);
+CREATE INDEX idx_seller_orders_open ON seller_orders(seller_id, is_open, created_at, order_id);
 CREATE INDEX idx_reviews_product ON reviews(product_id);
+CREATE INDEX idx_idempotency_keys_expires ON idempotency_keys(expires_at);
+CREATE INDEX idx_outbox_events_due ON outbox_events(status, available_at, id);
+CREATE INDEX idx_outbox_events_claimed ON outbox_events(claimed_by);
 CREATE INDEX idx_wishlist_user ON wishlist_items(user_id);
+CREATE INDEX idx_products_updated_at ON products(updated_at);
+CREATE INDEX idx_sellers_updated_at ON sellers(updated_at);
+CREATE INDEX idx_product_listing_newest ON product_listing(created_at, id);
+CREATE INDEX idx_product_listing_rating ON product_listing(rating, id);
+CREATE INDEX idx_product_listing_price ON product_listing(price, id);
+CREATE INDEX idx_product_listing_seller ON product_listing(seller_id, created_at, id);
+CREATE INDEX idx_product_listing_category ON product_listing(category, created_at, id);
+CREATE INDEX idx_product_listing_category_price ON product_listing(category, price, id);
+CREATE INDEX idx_product_listing_category_rating ON product_listing(category, rating, id);
+CREATE INDEX idx_product_listing_seller_price ON product_listing(seller_id, price, id);
+CREATE INDEX idx_product_listing_seller_rating ON product_listing(seller_id, rating, id);
+CREATE INDEX idx_product_listing_updated_at ON product_listing(updated_at);
+
+-- Full-text indexes for product and seller search
+CREATE FULLTEXT INDEX ft_products_search ON products(name, category, description);
+CREATE FULLTEXT INDEX ft_sellers_search ON sellers(store_name, category, location, description);
 ```
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+import sys
+import uuid
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import Config  # noqa: E402
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """The application config, pointed at a fresh SQLite database"""
+    monkeypatch.setattr(Config, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setattr(Config, 'SQLALCHEMY_REPLICA_URIS', [])
+    monkeypatch.setattr(Config, 'JWT_SECRET_KEY', 'test-secret-key-of-at-least-32-bytes')
+    monkeypatch.setattr(Config, 'UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setattr(Config, 'IMAGE_WORKERS', 0)
+    monkeypatch.setattr(Config, 'OUTBOX_MODE', 'inline')
+    return Config
+
+
+@pytest.fixture
+def app(config):
+    """An application on a fresh SQLite database"""
+    from app import create_app, db
+    from app.services.search_service import search_service
+    from app.services.suggest_service import suggest_service
+
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        # The in-process search indexes outlive the app; start them from this database
+        search_service.rebuild()
+        suggest_service.rebuild()
+        yield app
+        db.session.remove()
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+@pytest.fixture
+def store(app):
+    """A seller with three products and a buyer with an address"""
+    from app import db
+    from app.models import Address, Product, Seller, User
+
+    seller_user = User(id=str(uuid.uuid4()), name='Seller', email='seller@example.com', password_hash='x',
+                       role='seller')
+    buyer = User(id=str(uuid.uuid4()), name='Buyer', email='buyer@example.com', password_hash='x',
+                 role='consumer')
+    db.session.add_all([seller_user, buyer])
+    db.session.flush()
+    seller = Seller(id=str(uuid.uuid4()), user_id=seller_user.id, store_name='Green Valley Farm')
+    address = Address(id=str(uuid.uuid4()), user_id=buyer.id, label='Home', name='Buyer', phone='0812345678',
+                      address='Jl. Merdeka 1', city='Bandung', province='Jawa Barat', postal_code='40111')
+    db.session.add_all([seller, address])
+    db.session.flush()
+    products = {
+        name: Product(id=str(uuid.uuid4()), seller_id=seller.id, name=name, price=price, stock=stock,
+                      category='Fresh Produce', type='standard')
+        for name, price, stock in (('carrots', 1000, 5), ('spinach', 2000, 2), ('honey', 5000, 1))
+    }
+    db.session.add_all(products.values())
+    db.session.commit()
+    return {
+        'seller_user_id': seller_user.id,
+        'seller_id': seller.id,
+        'buyer_id': buyer.id,
+        'address_id': address.id,
+        'products': {name: product.id for name, product in products.items()},
+    }
@@ -0,0 +1,92 @@
+import pytest
+from flask import jsonify
+
+from app.config.database import PRIMARY_PIN_COOKIE
+
+USER_ID = 'u-routing'
+
+
+@pytest.fixture
+def make_app(config, tmp_path, monkeypatch):
+    """
+    Build an application with one read replica, by default a second SQLite
+    file holding the same user under another name than the primary
+    """
+    from app import create_app, db
+    from app.models import User
+
+    apps = []
+
+    def make(replica_uri=None):
+        monkeypatch.setattr(config, 'SQLALCHEMY_REPLICA_URIS',
+                            [replica_uri or f"sqlite:///{tmp_path / 'replica.db'}"])
+        app = create_app()
+        app.config['TESTING'] = True
+        apps.append(app)
+
+        @app.route('/_routing/name', methods=['GET'])
+        def read_name():
+            return jsonify({'name': db.session.get(User, USER_ID).name})
+
+        @app.route('/_routing/name-after-flush', methods=['GET'])
+        def read_name_after_flush():
+            db.session.get(User, USER_ID).phone = '0800'
+            db.session.flush()
+            name = db.session.query(User.name).filter(User.id == USER_ID).scalar()
+            db.session.rollback()
+            return jsonify({'name': name})
+
+        @app.route('/_routing/name', methods=['POST'])
+        def rename():
+            db.session.get(User, USER_ID).name = 'renamed'
+            db.session.commit()
+            return jsonify({'name': 'renamed'})
+
+        row = {'id': USER_ID, 'email': 'routing@example.com', 'password_hash': 'x', 'role': 'consumer'}
+        with app.app_context():
+            with db.engine.begin() as connection:
+                connection.execute(User.__table__.insert().values(dict(row, name='primary')))
+            if replica_uri is None:
+                db.metadata.create_all(db.engines['replica_0'])
+                with db.engines['replica_0'].begin() as connection:
+                    connection.execute(User.__table__.insert().values(dict(row, name='replica')))
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+
+def name(client, path='/_routing/name'):
+    response = client.get(path)
+    assert response.status_code == 200
+    return response.get_json()['name']
+
+
+def test_get_reads_from_the_replica(make_app):
+    assert name(make_app().test_client()) == 'replica'
+
+
+def test_reads_after_a_flush_go_to_the_primary(make_app):
+    assert name(make_app().test_client(), '/_routing/name-after-flush') == 'primary'
+
+
+def test_write_pins_the_client_to_the_primary(make_app):
+    app = make_app()
+    client = app.test_client()
+
+    response = client.post('/_routing/name')
+    assert response.status_code == 200
+    assert client.get_cookie(PRIMARY_PIN_COOKIE) is not None
+
+    assert name(client) == 'renamed'
+    # Other clients still read the (lagging) replica
+    assert name(app.test_client()) == 'replica'
+
+
+def test_unreachable_replica_falls_back_to_the_primary(make_app, tmp_path):
+    app = make_app(f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+
+    assert name(app.test_client()) == 'primary'
@@ -0,0 +1,31 @@
+import uuid
+
+
+def register(client, email, key, address='10.0.0.1'):
+    return client.post('/api/auth/register', json={
+        'name': 'Ana', 'email': email, 'password': 'Password123', 'role': 'consumer'
+    }, headers={'Idempotency-Key': key}, environ_base={'REMOTE_ADDR': address})
+
+
+def test_repeated_registration_is_replayed(app):
+    client = app.test_client()
+    key = str(uuid.uuid4())
+    first = register(client, 'ana@example.com', key)
+    again = register(client, 'ana@example.com', key)
+
+    assert first.status_code == again.status_code == 201
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json() == first.get_json()
+
+
+def test_anonymous_keys_are_not_shared_between_clients(app):
+    client = app.test_client()
+    key = str(uuid.uuid4())
+    first = register(client, 'ana@example.com', key)
+    other_email = register(client, 'budi@example.com', key)
+    other_address = register(client, 'citra@example.com', key, address='10.0.0.2')
+
+    assert first.status_code == other_email.status_code == other_address.status_code == 201
+    assert 'Idempotent-Replayed' not in other_email.headers
+    assert 'Idempotent-Replayed' not in other_address.headers
+    assert len({response.get_json()['user']['id'] for response in (first, other_email, other_address)}) == 3
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+from app.utils.auth import generate_token
+from app.utils.media import ImageTooLarge, store_stream
+
+
+def upload(app, store, data, **kwargs):
+    return app.test_client().post(
+        f"/api/products/{store['products']['carrots']}/images", data=data,
+        headers={'Authorization': f"Bearer {generate_token(store['seller_user_id'])}",
+                 'Content-Type': 'image/jpeg'}, **kwargs
+    )
+
+
+def test_upload_over_the_size_limit_is_413(app, store):
+    app.config['MAX_CONTENT_LENGTH'] = 1000
+
+    response = upload(app, store, b'x' * 5000)
+
+    assert response.status_code == 413
+    assert response.get_json() == {'error': 'Image is larger than 1000 bytes'}
+
+
+def test_streamed_upload_over_the_size_limit_is_413(app, store):
+    app.config['MAX_CONTENT_LENGTH'] = 1000
+
+    # No Content-Length: the size is only known while reading the body
+    response = upload(app, store, None, input_stream=io.BytesIO(b'x' * 5000),
+                      environ_overrides={'wsgi.input_terminated': True})
+
+    assert response.status_code == 413
+    assert response.get_json() == {'error': 'Image is larger than 1000 bytes'}
+
+
+def test_store_stream_stops_at_the_size_limit(tmp_path):
+    with pytest.raises(ImageTooLarge):
+        store_stream(str(tmp_path), io.BytesIO(b'x' * 5000), max_size=1000)
+
+    assert not list((tmp_path / 'images' / 'tmp').iterdir())
+
+
+def test_upload_of_a_failed_image_renders_it_again(app, store):
+    from PIL import Image
+    from app import db
+    from app.models import MediaAsset
+
+    image = io.BytesIO()
+    Image.new('RGB', (64, 48), (40, 120, 40)).save(image, 'JPEG')
+    assert upload(app, store, image.getvalue()).status_code == 201
+    asset = MediaAsset.query.one()
+    asset.status, asset.variants = 'failed', None
+    db.session.commit()
+
+    assert upload(app, store, image.getvalue()).status_code == 201
+
+    db.session.refresh(asset)
+    assert asset.status == 'ready'
+    assert asset.variants
@@ -0,0 +1,101 @@
+import pytest
+
+from app import db
+from app.models import Product, Seller, SellerDailySales, SellerProductDailySales
+from app.services.order_service import OrderService
+from app.services.user_order_stats_service import user_order_stats_service
+
+
+def place(store, *lines):
+    return OrderService().create_order(store['buyer_id'], {
+        'items': [{'product_id': store['products'][name], 'quantity': quantity} for name, quantity in lines],
+        'shipping_address_id': store['address_id'],
+        'payment_method': 'bank_transfer',
+    })
+
+
+def stock(store):
+    rows = db.session.query(Product.id, Product.stock).filter(Product.id.in_(store['products'].values()))
+    by_id = dict(rows)
+    return {name: by_id[product_id] for name, product_id in store['products'].items()}
+
+
+def seller_counters(store):
+    seller = db.session.get(Seller, store['seller_id'])
+    db.session.refresh(seller)
+    return seller.total_products, seller.in_stock_products
+
+
+def rollup(store):
+    row = db.session.query(
+        db.func.coalesce(db.func.sum(SellerDailySales.units), 0),
+        db.func.coalesce(db.func.sum(SellerDailySales.revenue), 0),
+        db.func.coalesce(db.func.sum(SellerDailySales.order_count), 0)
+    ).filter(SellerDailySales.seller_id == store['seller_id']).one()
+    products = dict(db.session.query(SellerProductDailySales.product_id, SellerProductDailySales.units)
+                    .filter(SellerProductDailySales.seller_id == store['seller_id']))
+    return int(row[0]), float(row[1]), int(row[2]), products
+
+
+def test_order_takes_stock_of_every_line(store):
+    order = place(store, ('carrots', 2), ('spinach', 1))
+
+    assert stock(store) == {'carrots': 3, 'spinach': 1, 'honey': 1}
+    assert order['total_amount'] == 4000
+    assert sorted(item['quantity'] for item in order['items']) == [1, 2]
+
+
+def test_oversold_line_fails_the_order_and_leaves_all_stock_unchanged(store):
+    before = stock(store)
+
+    with pytest.raises(ValueError, match='Insufficient stock for spinach'):
+        place(store, ('carrots', 2), ('spinach', 3), ('honey', 1))
+
+    assert stock(store) == before
+    assert seller_counters(store) == (3, 3)
+    assert rollup(store)[:3] == (0, 0, 0)
+
+
+def test_same_product_twice_is_one_line_with_the_summed_quantity(store):
+    order = place(store, ('carrots', 2), ('carrots', 3))
+
+    assert [(item['product_id'], item['quantity']) for item in order['items']] == [(store['products']['carrots'], 5)]
+    assert stock(store)['carrots'] == 0
+    assert seller_counters(store) == (3, 2)
+
+
+def test_same_product_twice_is_checked_against_the_summed_quantity(store):
+    with pytest.raises(ValueError, match='Insufficient stock for carrots'):
+        place(store, ('carrots', 3), ('carrots', 3))
+
+    assert stock(store)['carrots'] == 5
+
+
+def test_cancellation_restores_stock_counters_and_rollups(store):
+    order = place(store, ('spinach', 2), ('honey', 1))
+    assert stock(store) == {'carrots': 5, 'spinach': 0, 'honey': 0}
+    assert seller_counters(store) == (3, 1)
+    assert rollup(store) == (3, 9000, 1, {store['products']['spinach']: 2, store['products']['honey']: 1})
+    assert user_order_stats_service.get_summary(store['buyer_id'])['by_status']['pending'] == 1
+
+    OrderService().update_order_status(order['id'], store['seller_user_id'], 'cancelled')
+
+    assert stock(store) == {'carrots': 5, 'spinach': 2, 'honey': 1}
+    assert seller_counters(store) == (3, 3)
+    units, revenue, orders, products = rollup(store)
+    assert (units, revenue, orders) == (0, 0, 0)
+    assert not any(products.values())
+    summary = user_order_stats_service.get_summary(store['buyer_id'])
+    assert summary['by_status']['pending'] == 0
+    assert summary['by_status']['cancelled'] == 1
+    assert summary['lifetime_spend'] == 0
+
+
+def test_cancelled_order_cannot_be_cancelled_again(store):
+    order = place(store, ('honey', 1))
+    service = OrderService()
+    service.update_order_status(order['id'], store['seller_user_id'], 'cancelled')
+
+    with pytest.raises(ValueError, match='Cannot change the status of a cancelled order'):
+        service.update_order_status(order['id'], store['seller_user_id'], 'cancelled')
+    assert stock(store)['honey'] == 1
@@ -0,0 +1,117 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import db
+from app.models import OutboxEvent
+from app.services.order_service import OrderService
+from app.services.outbox_service import outbox_service
+from app.utils.auth import generate_token
+
+
+@pytest.fixture
+def handled(app, monkeypatch):
+    """Events handled for 'order.created' and 'order.status_changed', by topic"""
+    monkeypatch.setattr(outbox_service, '_handlers', {})
+    app.config['OUTBOX_MODE'] = 'external'
+    events = {'order.created': [], 'order.status_changed': []}
+    for topic, seen in events.items():
+        outbox_service.register(topic, lambda event, seen=seen: seen.append(event.payload))
+    return events
+
+
+def place(store, name='carrots', quantity=1):
+    return OrderService().create_order(store['buyer_id'], {
+        'items': [{'product_id': store['products'][name], 'quantity': quantity}],
+        'shipping_address_id': store['address_id'],
+        'payment_method': 'bank_transfer',
+    })
+
+
+def test_topics_without_handlers_are_not_written(app, store, monkeypatch):
+    monkeypatch.setattr(outbox_service, '_handlers', {})
+
+    place(store)
+
+    assert OutboxEvent.query.count() == 0
+
+
+def test_event_is_committed_with_the_write(store, handled):
+    order = place(store)
+
+    event = OutboxEvent.query.one()
+    assert (event.topic, event.aggregate_id, event.status) == ('order.created', order['id'], 'pending')
+    assert event.payload['order_id'] == order['id']
+    assert handled['order.created'] == []
+
+
+def test_event_is_rolled_back_with_the_write(store, handled):
+    with pytest.raises(ValueError):
+        place(store, 'honey', 2)
+    assert OutboxEvent.query.count() == 0
+
+    outbox_service.publish(db.session, 'order.created', {'order_id': 'o1'})
+    db.session.rollback()
+    assert OutboxEvent.query.count() == 0
+
+
+def test_drain_handles_and_deletes_the_events(store, handled):
+    order = place(store)
+    OrderService().update_order_status(order['id'], store['seller_user_id'], 'processing')
+
+    assert outbox_service.drain() == 2
+
+    assert [payload['order_id'] for payload in handled['order.created']] == [order['id']]
+    assert [(payload['from'], payload['to']) for payload in handled['order.status_changed']] == \
+        [('pending', 'processing')]
+    assert OutboxEvent.query.count() == 0
+    assert outbox_service.drain() == 0
+
+
+def test_failing_handler_is_retried_with_backoff_then_marked_failed(app, store, handled):
+    app.config.update(OUTBOX_MAX_ATTEMPTS=2, OUTBOX_RETRY_BASE=60)
+    calls = []
+
+    @outbox_service.register('order.created')
+    def fail(event):
+        calls.append(event.id)
+        raise RuntimeError('downstream unavailable')
+
+    place(store)
+    started = datetime.utcnow()
+    assert outbox_service.drain() == 1
+
+    event = OutboxEvent.query.one()
+    assert (event.status, event.attempts, event.claimed_by) == ('pending', 1, None)
+    assert event.available_at >= started + timedelta(seconds=60)
+    assert event.last_error == 'RuntimeError: downstream unavailable'
+    # Not due again before its backoff
+    assert outbox_service.drain() == 0
+
+    event.available_at = datetime.utcnow() - timedelta(seconds=1)
+    db.session.commit()
+    assert outbox_service.drain() == 1
+
+    db.session.refresh(event)
+    assert (event.status, event.attempts) == ('failed', 2)
+    assert len(calls) == 2
+    assert outbox_service.drain() == 0
+
+    assert outbox_service.retry_failed() == 1
+    db.session.refresh(event)
+    assert (event.status, event.attempts) == ('pending', 0)
+
+
+def test_inline_mode_handles_events_at_the_end_of_the_request(app, store, handled):
+    app.config['OUTBOX_MODE'] = 'inline'
+    order = place(store)
+    outbox_service.drain()
+
+    response = app.test_client().put(
+        f"/api/orders/{order['id']}/status", json={'status': 'cancelled'},
+        headers={'Authorization': f"Bearer {generate_token(store['seller_user_id'])}"}
+    )
+
+    assert response.status_code == 200
+    assert [payload['to'] for payload in handled['order.status_changed']] == ['cancelled']
+    assert OutboxEvent.query.count() == 0
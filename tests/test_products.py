@@ -0,0 +1,28 @@
+import warnings
+
+import pytest
+from sqlalchemy.exc import SAWarning
+
+
+@pytest.mark.parametrize('sort', ['newest', 'rating', 'price_asc', 'price_desc'])
+def test_search_with_another_sort_returns_only_matches(app, store, sort):
+    client = app.test_client()
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', SAWarning)
+        response = client.get('/api/products', query_string={'search': 'spinach', 'sort': sort})
+        streamed = client.get('/api/products', query_string={'search': 'spinach', 'sort': sort, 'stream': 'true'})
+
+    assert response.status_code == 200
+    assert [item['id'] for item in response.get_json()['items']] == [store['products']['spinach']]
+    assert streamed.status_code == 200
+    assert streamed.get_data(as_text=True).count(store['products']['spinach']) == 1
+    assert store['products']['carrots'] not in streamed.get_data(as_text=True)
+
+
+def test_seller_products_search_with_another_sort_returns_only_matches(app, store):
+    response = app.test_client().get(f"/api/sellers/{store['seller_id']}/products",
+                                     query_string={'search': 'honey', 'sort': 'price_desc'})
+
+    assert response.status_code == 200
+    assert [item['id'] for item in response.get_json()['items']] == [store['products']['honey']]
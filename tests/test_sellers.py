@@ -0,0 +1,21 @@
+import pytest
+
+
+@pytest.mark.parametrize('min_rating', ['abc', 'nan', 'inf'])
+def test_invalid_min_rating_is_a_bad_request(app, min_rating):
+    response = app.test_client().get('/api/sellers', query_string={'min_rating': min_rating})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'error': 'min_rating must be a number'}
+
+
+def test_min_rating_filters_sellers(app, store):
+    from app import db
+    from app.models import Seller
+
+    db.session.get(Seller, store['seller_id']).rating = 4.5
+    db.session.commit()
+    client = app.test_client()
+
+    assert [seller['id'] for seller in client.get('/api/sellers?min_rating=4').get_json()] == [store['seller_id']]
+    assert client.get('/api/sellers?min_rating=4.8').get_json() == []
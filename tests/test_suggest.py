@@ -0,0 +1,39 @@
+from datetime import datetime
+
+from app import db
+from app.models import ProductListing
+
+
+def suggested(app, query):
+    response = app.test_client().get('/api/search/suggest', query_string={'q': query})
+    return [(suggestion['type'], suggestion['text']) for suggestion in response.get_json()['suggestions']]
+
+
+def change_elsewhere(statement):
+    """Write the way another worker would: committed, but without notifying this process"""
+    db.session.execute(statement)
+    db.session.commit()
+
+
+def test_changes_from_other_workers_are_synced_by_updated_at(app, store):
+    assert ('product', 'honey') in suggested(app, 'hon')
+    table = ProductListing.__table__
+    change_elsewhere(table.update().where(table.c.id == store['products']['honey'])
+                     .values(name='wildflower honey', updated_at=datetime.utcnow()))
+
+    app.config['SUGGEST_SYNC_INTERVAL'] = 3600
+    assert suggested(app, 'wild') == []
+
+    app.config['SUGGEST_SYNC_INTERVAL'] = 0
+    assert suggested(app, 'wild') == [('product', 'wildflower honey')]
+
+
+def test_rows_deleted_by_other_workers_go_at_the_next_rebuild(app, store):
+    assert ('product', 'spinach') in suggested(app, 'spin')
+    table = ProductListing.__table__
+    change_elsewhere(table.delete().where(table.c.id == store['products']['spinach']))
+    app.config['SUGGEST_SYNC_INTERVAL'] = 0
+    assert ('product', 'spinach') in suggested(app, 'spin')
+
+    app.config['SUGGEST_MAX_AGE'] = 0
+    assert ('product', 'spinach') not in suggested(app, 'spin')
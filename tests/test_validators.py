@@ -0,0 +1,26 @@
+import pytest
+
+from app.utils.validators import validate_product
+
+
+@pytest.mark.parametrize('stock, expected', [(0, 0), (12, 12), ('7', 7), (' 40 ', 40)])
+def test_stock_accepts_whole_numbers(stock, expected):
+    result = validate_product({'stock': stock}, partial=True)
+
+    assert result['valid']
+    assert result['values']['stock'] == expected
+
+
+@pytest.mark.parametrize('stock', [1.9, 2.0, True, False, '1.5', '-3', '1e3', 'ten', [1]])
+def test_stock_rejects_anything_else(stock):
+    result = validate_product({'stock': stock}, partial=True)
+
+    assert not result['valid']
+    assert result['errors'] == ['Stock must be a non-negative integer']
+    assert 'stock' not in result['values']
+
+
+def test_negative_stock_is_rejected():
+    result = validate_product({'stock': -1}, partial=True)
+
+    assert result['errors'] == ['Stock cannot be negative']